@@ -0,0 +1,112 @@
+# api/attendance.py
+"""
+Attendance check-in.
+
+At shift start hundreds of employees time in within the same minute, so a
+check-in is one statement:
+
+    INSERT ... ON CONFLICT (employee_id, date)
+        DO UPDATE SET time_in = ..., ... WHERE api_attendance.time_in IS NULL
+    RETURNING *
+
+It creates today's row, or fills in a row that exists without a time-in
+(e.g. one HR created as Absent), and returns nothing when the employee has
+already timed in. There is no read-then-write window, so concurrent or
+retried requests cannot create a second row or fail with
+MultipleObjectsReturned. `status` and `late_minutes` are computed from the
+employee's shift (api/schedules.py) and written by the same statement, so
+payroll never sees a check-in without its lateness. The geofence verdict
+(api/geofence.py) is written the same way.
+
+PostgreSQL and SQLite (>= 3.35) run the upsert natively; other backends
+fall back to INSERT, then a conditional UPDATE, inside a transaction.
+"""
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from typing import Optional
+
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+
+from .geofence import UNCHECKED, GeofenceCheck
+from .models import Attendance
+from .schedules import lateness, shift_for
+
+__all__ = ["check_in", "parse_coordinate"]
+
+UPSERT_VENDORS = {"postgresql", "sqlite"}
+
+
+# ---- Input ----
+def parse_coordinate(value, limit: int) -> Optional[Decimal]:
+    """A latitude (limit=90) or longitude (limit=180) rounded to the column's 6 places; ValueError if invalid."""
+    if value in (None, ""):
+        return None
+    try:
+        coord = Decimal(str(value)).quantize(Decimal("0.000001"))
+    except InvalidOperation:
+        raise ValueError(f"Invalid coordinate: {value!r}")
+    if not coord.is_finite() or abs(coord) > limit:
+        raise ValueError(f"Coordinate out of range: {value!r}")
+    return coord
+
+
+# ---- Check-in ----
+def check_in(
+    employee_id: int,
+    when: Optional[datetime] = None,
+    *,
+    latitude: Optional[Decimal] = None,
+    longitude: Optional[Decimal] = None,
+    geofence: GeofenceCheck = UNCHECKED,
+) -> Optional[Attendance]:
+    """
+    Record the employee's time-in for the local day of `when` (default: now).
+
+    Returns the attendance row, or None when the employee had already timed in.
+    """
+    local = timezone.localtime(when)
+    day, clock = local.date(), local.time().replace(microsecond=0)
+    status, late_minutes = lateness(clock, shift_for(employee_id, day))
+    values = {
+        "employee_id": employee_id, "date": day, "time_in": clock,
+        "latitude": latitude, "longitude": longitude,
+        "status": status, "late_minutes": late_minutes,
+        "site_id": geofence.site_id, "within_geofence": geofence.within,
+    }
+    if connection.vendor in UPSERT_VENDORS:
+        return _upsert(values)
+    return _insert_or_update(values)
+
+
+def _upsert(values) -> Optional[Attendance]:
+    meta = Attendance._meta
+    qn = connection.ops.quote_name
+    fields = [f for f in meta.concrete_fields if not f.primary_key]
+    fill = [qn(meta.get_field(name).column) for name in values if name not in ("employee_id", "date")]
+    table = qn(meta.db_table)
+    sql = (
+        f"INSERT INTO {table} ({', '.join(qn(f.column) for f in fields)}) "
+        f"VALUES ({', '.join(['%s'] * len(fields))}) "
+        f"ON CONFLICT ({qn(meta.get_field('employee').column)}, {qn(meta.get_field('date').column)}) "
+        f"DO UPDATE SET {', '.join(f'{c} = EXCLUDED.{c}' for c in fill)} "
+        f"WHERE {table}.{qn(meta.get_field('time_in').column)} IS NULL "
+        f"RETURNING {', '.join(qn(f.column) for f in meta.concrete_fields)}"
+    )
+    params = [f.get_db_prep_save(values.get(f.attname, f.get_default()), connection) for f in fields]
+    rows = list(Attendance.objects.raw(sql, params))  # raw() applies the field converters
+    return rows[0] if rows else None
+
+
+def _insert_or_update(values) -> Optional[Attendance]:
+    key = {"employee_id": values["employee_id"], "date": values["date"]}
+    with transaction.atomic():
+        try:
+            with transaction.atomic():
+                return Attendance.objects.create(**values)
+        except IntegrityError:
+            pass
+        fill = {k: v for k, v in values.items() if k not in key}
+        if not Attendance.objects.filter(time_in__isnull=True, **key).update(**fill):
+            return None
+        return Attendance.objects.get(**key)
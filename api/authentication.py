@@ -0,0 +1,100 @@
+# api/authentication.py
+"""
+JWT access tokens that carry the caller's identity.
+
+Tokens issued by /api/token/ (and re-issued by /api/token/refresh/) hold
+`username`, `is_staff`, `is_superuser`, `employee_id`, `role` and `groups`.
+ClaimsJWTAuthentication still loads the User row by primary key (one
+indexed lookup), so a deactivated or deleted account, or a token revoked by
+a password change, is refused at once and is_staff is always the current
+value. Group names and the employee id come from the token instead of their
+own queries, so has_role() and employee_id_for() cost nothing on the hot
+paths.
+
+Tokens without these claims (issued before this change) fall back to the
+regular lookups. Group and employee claims can be up to
+ACCESS_TOKEN_LIFETIME stale; refresh re-reads them from the database and
+re-checks that the account is active.
+"""
+from typing import Optional
+
+from django.contrib.auth import get_user_model
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+
+from .models import Employee
+from .roles import group_names
+
+__all__ = [
+    "add_identity_claims", "employee_id_for", "ClaimsJWTAuthentication",
+    "ClaimsTokenObtainPairSerializer", "ClaimsTokenRefreshSerializer",
+]
+
+USER_CLAIM_FIELDS = ("username", "is_staff", "is_superuser")
+
+
+def add_identity_claims(token, user) -> None:
+    employee = Employee.objects.filter(user=user).values_list("id", "role").first()
+    for field in USER_CLAIM_FIELDS:
+        token[field] = getattr(user, field)
+    token["employee_id"], token["role"] = employee if employee else (None, None)
+    token["groups"] = sorted(group_names(user))
+
+
+def employee_id_for(user) -> Optional[int]:
+    """The user's Employee id, from the token claims when present."""
+    claims = getattr(user, "_employee_claims", None)
+    if claims is not None:
+        return claims["employee_id"]
+    return Employee.objects.filter(user=user).values_list("id", flat=True).first()
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        # simplejwt's lookup: raises for unknown, inactive or revoked users
+        user = super().get_user(validated_token)
+        if "groups" in validated_token:
+            user._group_names = frozenset(validated_token["groups"])
+            user._employee_claims = {"employee_id": validated_token.get("employee_id"),
+                                     "role": validated_token.get("role")}
+        return user
+
+
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        add_identity_claims(token, user)  # copied into the access token
+        return token
+
+
+class ClaimsTokenRefreshSerializer(TokenRefreshSerializer):
+    """Re-reads the claims on refresh so role changes reach the next access token."""
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs["refresh"])
+        user = get_user_model().objects.filter(
+            **{api_settings.USER_ID_FIELD: refresh.payload.get(api_settings.USER_ID_CLAIM)}
+        ).first()
+        if user is None or not api_settings.USER_AUTHENTICATION_RULE(user):
+            raise AuthenticationFailed(self.error_messages["no_active_account"], "no_active_account")
+        add_identity_claims(refresh, user)
+
+        data = {"access": str(refresh.access_token)}
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            if api_settings.BLACKLIST_AFTER_ROTATION:
+                try:
+                    refresh.blacklist()
+                except AttributeError:  # token_blacklist app not installed
+                    pass
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            try:
+                refresh.outstand()
+            except AttributeError:  # same: no OutstandingToken model to record it in
+                pass
+            data["refresh"] = str(refresh)
+        return data
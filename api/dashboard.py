@@ -0,0 +1,76 @@
+# api/dashboard.py
+import logging
+from typing import Dict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count, Q, Value
+from django.utils import timezone
+
+from .models import Attendance, Employee, LeaveRequest, Payslip
+
+logger = logging.getLogger(__name__)
+
+__all__ = ["get_dashboard_stats", "invalidate_dashboard_stats"]
+
+CACHE_KEY = "dashboard_stats:{date}"
+CACHE_TTL = getattr(settings, "DASHBOARD_STATS_CACHE_TTL", 60)  # seconds
+
+
+def _one_row(qs, **aggregates):
+    """
+    (sql, params) for a single-row conditional aggregate over qs, i.e. what
+    qs.aggregate(**aggregates) would run, without executing it.
+    """
+    q = qs.order_by().annotate(_one=Value(1)).values("_one").annotate(**aggregates).values(*aggregates)
+    return q.query.sql_with_params()
+
+
+def _compute(today) -> Dict[str, int]:
+    parts = [
+        _one_row(Employee.objects.all(), employee_count=Count("id")),
+        _one_row(
+            Attendance.objects.filter(date=today),
+            present_today=Count("id", filter=Q(status__iexact="Present")),
+        ),
+        _one_row(
+            LeaveRequest.objects.all(),
+            on_leave_today=Count("id", filter=Q(status__iexact="Approved", start_date__lte=today, end_date__gte=today)),
+            pending_leaves=Count("id", filter=Q(status__iexact="Pending")),
+        ),
+        _one_row(Payslip.objects.all(), payroll_count=Count("id")),
+    ]
+    # Each derived table yields exactly one row, so the cross join is one row
+    # holding every counter: a single round trip for the whole dashboard.
+    sql = "SELECT * FROM " + " CROSS JOIN ".join(f"({s}) t{i}" for i, (s, _) in enumerate(parts))
+    params = [p for _, ps in parts for p in ps]
+    with connection.cursor() as cur:
+        cur.execute(sql, params)
+        row = cur.fetchone()
+        cols = [c[0] for c in cur.description]
+    return {c: int(v or 0) for c, v in zip(cols, row)}
+
+
+def get_dashboard_stats() -> Dict[str, int]:
+    """
+    Counters for the admin dashboard, cached for CACHE_TTL seconds:
+        employee_count, present_today, on_leave_today, pending_leaves, payroll_count
+
+    Writes drop the entry (api/signals.py, and bulk writers call
+    invalidate_dashboard_stats directly). That reaches other processes only
+    through a shared cache (REDIS_URL); with the per-process default they
+    serve their copy for up to CACHE_TTL seconds.
+    """
+    today = timezone.localdate()
+    key = CACHE_KEY.format(date=today.isoformat())
+    stats = cache.get(key)
+    if stats is None:
+        stats = _compute(today)
+        cache.set(key, stats, CACHE_TTL)
+    return stats
+
+
+def invalidate_dashboard_stats(**kwargs) -> None:
+    """Signal receiver: drop today's cached counters."""
+    cache.delete(CACHE_KEY.format(date=timezone.localdate().isoformat()))
@@ -0,0 +1,199 @@
+# api/exports.py
+import csv
+import io
+import tempfile
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Sequence
+
+import openpyxl
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils.dateparse import parse_date
+from openpyxl.cell import WriteOnlyCell
+
+from .models import Attendance, Employee, Payslip
+
+__all__ = [
+    "ExportFilterError", "parse_export_filters", "EXPORT_FILTER_KEYS",
+    "attendance_export_rows", "payslip_export_rows",
+    "ATTENDANCE_HEADER", "PAYSLIP_HEADER",
+    "iter_csv", "csv_streaming_response",
+    "ATTENDANCE_XLSX_FORMATS", "PAYSLIP_XLSX_FORMATS",
+    "write_xlsx", "xlsx_response", "spooled_response",
+]
+
+CHUNK_SIZE = 2000          # rows fetched per DB round trip
+ROWS_PER_YIELD = 500       # rows encoded per chunk sent to the client
+
+ATTENDANCE_HEADER = ["Employee", "Date", "Time In", "Time Out", "Status", "Latitude", "Longitude"]
+PAYSLIP_HEADER = ["Employee Name", "Period From", "Period To", "Gross Pay", "Net Pay"]
+
+XLSX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+DATE_FORMAT = "yyyy-mm-dd"
+TIME_FORMAT = "hh:mm:ss"
+MONEY_FORMAT = "#,##0.00"
+COORD_FORMAT = "0.000000"
+
+# Per-column number formats, aligned with the headers above (None = general)
+ATTENDANCE_XLSX_FORMATS = [None, DATE_FORMAT, TIME_FORMAT, TIME_FORMAT, None, COORD_FORMAT, COORD_FORMAT]
+PAYSLIP_XLSX_FORMATS = [None, DATE_FORMAT, DATE_FORMAT, MONEY_FORMAT, MONEY_FORMAT]
+
+
+EXPORT_FILTER_KEYS = ("date_from", "date_to", "department", "employee")
+
+
+class ExportFilterError(ValueError):
+    pass
+
+
+def _date(params, name):
+    raw = params.get(name)
+    if not raw:
+        return None
+    try:
+        value = parse_date(raw)
+    except ValueError:  # well formed but impossible, e.g. 2025-02-30
+        value = None
+    if value is None:
+        raise ExportFilterError(f"{name} must be YYYY-MM-DD")
+    return value
+
+
+def _int(params, name):
+    raw = params.get(name)
+    if not raw:
+        return None
+    if not str(raw).isdigit():
+        raise ExportFilterError(f"{name} must be an id")
+    return int(raw)
+
+
+def parse_export_filters(params) -> Dict[str, Any]:
+    """
+    Read ?date_from=&date_to=&department=&employee= from query params.
+    Raises ExportFilterError on malformed values.
+    """
+    filters = {
+        "date_from": _date(params, "date_from"),
+        "date_to": _date(params, "date_to"),
+        "department": _int(params, "department"),
+        "employee": _int(params, "employee"),
+    }
+    if filters["date_from"] and filters["date_to"] and filters["date_from"] > filters["date_to"]:
+        raise ExportFilterError("date_from must be on or before date_to")
+    return filters
+
+
+def _scope(qs, employee: Optional[Employee], filters: Dict[str, Any]):
+    # employee set -> own rows only; None -> admin scope, narrowed by filters
+    if employee is not None:
+        return qs.filter(employee=employee)
+    if filters.get("department"):
+        qs = qs.filter(employee__department_id=filters["department"])
+    if filters.get("employee"):
+        qs = qs.filter(employee_id=filters["employee"])
+    return qs
+
+
+def attendance_export_rows(employee: Optional[Employee], filters: Dict[str, Any]) -> Iterator[tuple]:
+    qs = _scope(Attendance.objects.all(), employee, filters)
+    if filters.get("date_from"):
+        qs = qs.filter(date__gte=filters["date_from"])
+    if filters.get("date_to"):
+        qs = qs.filter(date__lte=filters["date_to"])
+    return (
+        qs.order_by("date", "employee__full_name", "id")
+        .values_list("employee__full_name", "date", "time_in", "time_out", "status", "latitude", "longitude")
+        .iterator(chunk_size=CHUNK_SIZE)
+    )
+
+
+def payslip_export_rows(employee: Optional[Employee], filters: Dict[str, Any]) -> Iterator[tuple]:
+    qs = _scope(Payslip.objects.all(), employee, filters)
+    # a payslip is in range when its period overlaps [date_from, date_to]
+    if filters.get("date_from"):
+        qs = qs.filter(period_to__gte=filters["date_from"])
+    if filters.get("date_to"):
+        qs = qs.filter(period_from__lte=filters["date_to"])
+    return (
+        qs.order_by("period_from", "employee__full_name", "id")
+        .values_list("employee__full_name", "period_from", "period_to", "gross_pay", "net_pay")
+        .iterator(chunk_size=CHUNK_SIZE)
+    )
+
+
+def iter_csv(header: Sequence[str], rows: Iterable[Sequence[Any]], *, rows_per_yield: int = ROWS_PER_YIELD) -> Iterator[bytes]:
+    """Encode rows as UTF-8 CSV, yielding one bytes chunk per `rows_per_yield` rows."""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(header)
+    pending = 1
+    for row in rows:
+        writer.writerow(row)
+        pending += 1
+        if pending >= rows_per_yield:
+            yield buf.getvalue().encode("utf-8")
+            buf.seek(0)
+            buf.truncate(0)
+            pending = 0
+    if pending:
+        yield buf.getvalue().encode("utf-8")
+
+
+def csv_streaming_response(header: Sequence[str], rows: Iterable[Sequence[Any]], filename: str) -> StreamingHttpResponse:
+    resp = StreamingHttpResponse(iter_csv(header, rows), content_type="text/csv")
+    resp["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return resp
+
+
+def write_xlsx(fh, title: str, header: Sequence[str], rows: Iterable[Sequence[Any]],
+               formats: Sequence[Optional[str]]) -> None:
+    """
+    Write rows to `fh` as a single-sheet workbook in openpyxl write-only mode.
+
+    Values keep their native types (date, time, Decimal). Each formatted
+    column reuses one styled cell, so the number format is resolved once per
+    column instead of once per cell; write-only rows are serialised on
+    append, which makes the reuse safe and keeps memory flat.
+    """
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet(title)
+    ws.append(list(header))
+
+    styled = []
+    for fmt in formats:
+        if fmt is None:
+            styled.append(None)
+        else:
+            cell = WriteOnlyCell(ws)
+            cell.number_format = fmt
+            styled.append(cell)
+
+    for row in rows:
+        out = []
+        for cell, value in zip(styled, row):
+            if cell is None or value is None:
+                out.append(value)
+            else:
+                cell.value = value
+                out.append(cell)
+        ws.append(out)
+    wb.save(fh)
+
+
+def spooled_response(write: Callable[[Any], Any], filename: str, content_type: str) -> FileResponse:
+    """
+    Call write(fh) on a temporary file and stream the result; the file is
+    removed when the response is closed.
+    """
+    tmp = tempfile.TemporaryFile()
+    try:
+        write(tmp)
+        tmp.seek(0)
+    except Exception:
+        tmp.close()
+        raise
+    return FileResponse(tmp, as_attachment=True, filename=filename, content_type=content_type)
+
+
+def xlsx_response(title: str, header: Sequence[str], rows: Iterable[Sequence[Any]],
+                  formats: Sequence[Optional[str]], filename: str) -> FileResponse:
+    return spooled_response(lambda fh: write_xlsx(fh, title, header, rows, formats), filename, XLSX_CONTENT_TYPE)
@@ -0,0 +1,341 @@
+# api/geofence.py
+"""
+Geofence validation of attendance coordinates.
+
+A Site's geofence is a radius (metres) around its location or a polygon of
+[lat, lng] vertices. An employee may punch at any active Site they are
+assigned to; the matching Site and the verdict are stored on the
+Attendance row (site, within_geofence). within_geofence stays None when the
+punch carried no coordinates or the employee has no sites, so nothing is
+flagged for employees whose locations were never configured. With
+GEOFENCE_ENFORCE on, validate_punch() refuses punches from employees with
+assigned sites that are outside every one of them or carry no (or only
+half a) location. Kiosk QR check-ins (validate_kiosk_punch) use the
+kiosk's Site instead: scanning the rotating code shown at a site proves
+presence there for employees assigned to it, and with GEOFENCE_ENFORCE on
+nobody else may use it.
+
+Punch-time checks (check_point) run against the employee's sites compiled
+into Fence tuples with precomputed bounding boxes, cached per employee (in
+process and in the shared cache) until a Site or assignment changes or
+GEOFENCE_CACHE_TTL passes: a point outside a site's box is
+rejected with four float comparisons, and only boxed points pay for the
+haversine distance or ray-casting test. A check on cached fences takes a
+few microseconds.
+
+The nightly `manage.py revalidate_geofences` re-checks stored rows after
+sites move (revalidate_attendance). It does the same box prefilter and
+exact tests as NumPy column operations over every (row, assigned site)
+pair, and writes back only the values that changed.
+"""
+import logging
+import math
+import time
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import FloatField
+from django.db.models.functions import Cast
+
+from .models import Attendance, Site
+from .utils import update_changed
+
+logger = logging.getLogger(__name__)
+
+__all__ = [
+    "Fence", "GeofenceCheck", "UNCHECKED", "compile_fence", "fences_for", "check_point", "validate_punch",
+    "validate_kiosk_punch",
+    "haversine_m", "points_in_polygon", "revalidate_attendance", "invalidate_geofences",
+]
+
+ENFORCE = getattr(settings, "GEOFENCE_ENFORCE", False)      # refuse punches outside assigned sites
+CACHE_TTL = getattr(settings, "GEOFENCE_CACHE_TTL", 300)    # seconds
+CACHE_KEY = "geofences:{version}:{employee_id}"
+VERSION_KEY = "geofences:version"
+LOCAL_MAX_ENTRIES = 10_000  # per-process copies; cleared wholesale when full
+
+_local: Dict[Tuple[int, int], Tuple[Tuple["Fence", ...], float]] = {}  # (version, employee_id) -> (fences, expiry)
+
+EARTH_RADIUS_M = 6_371_008.8
+BBOX_PAD = 1e-7  # degrees (~1 cm); keeps points on a circle's edge inside its box
+BULK_BATCH = 1000
+REVALIDATED_FIELDS = ("site_id", "within_geofence")
+CHUNK_DAYS = 31
+SITE_COLUMNS = ("id", "latitude", "longitude", "radius_m", "polygon")  # compile_fence's arguments
+
+OUTSIDE_SITES = "You are outside your assigned work sites."
+LOCATION_REQUIRED = "Your location is required to punch in or out."
+NOT_AT_KIOSK_SITE = "This kiosk is at a site you are not assigned to."
+
+
+class Fence(NamedTuple):
+    site_id: int
+    min_lat: float
+    max_lat: float
+    min_lng: float
+    max_lng: float
+    lat: float
+    lng: float
+    radius_m: Optional[float]                           # None for polygon fences
+    polygon: Optional[Tuple[Tuple[float, float], ...]]  # ((lat, lng), ...)
+
+    def in_box(self, lat: float, lng: float) -> bool:
+        return self.min_lat <= lat <= self.max_lat and self.min_lng <= lng <= self.max_lng
+
+    def contains(self, lat: float, lng: float) -> bool:
+        if not self.in_box(lat, lng):
+            return False
+        if self.polygon is None:
+            return _haversine(self.lat, self.lng, lat, lng) <= self.radius_m
+        return _in_polygon(lat, lng, self.polygon)
+
+
+class GeofenceCheck(NamedTuple):
+    site_id: Optional[int]
+    within: Optional[bool]
+
+
+UNCHECKED = GeofenceCheck(None, None)
+
+
+# ---- Geometry ----
+def _haversine(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    a = math.sin((p2 - p1) / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(math.radians(lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(min(1.0, a)))
+
+
+def haversine_m(lat1, lng1, lat2, lng2) -> np.ndarray:
+    """Great-circle distance in metres, elementwise over arrays (degrees)."""
+    p1, p2 = np.radians(lat1), np.radians(lat2)
+    a = np.sin((p2 - p1) / 2) ** 2 + np.cos(p1) * np.cos(p2) * np.sin(np.radians(np.subtract(lng2, lng1)) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(1.0, a)))
+
+
+def _in_polygon(lat: float, lng: float, polygon: Sequence[Tuple[float, float]]) -> bool:
+    """Even-odd ray casting in the lat/lng plane (fine at site scale)."""
+    inside = False
+    lat_b, lng_b = polygon[-1]
+    for lat_a, lng_a in polygon:
+        if (lat_a > lat) != (lat_b > lat) and lng < (lng_b - lng_a) * (lat - lat_a) / (lat_b - lat_a) + lng_a:
+            inside = not inside
+        lat_b, lng_b = lat_a, lng_a
+    return inside
+
+
+def points_in_polygon(lat: np.ndarray, lng: np.ndarray, polygon: Sequence[Tuple[float, float]]) -> np.ndarray:
+    """_in_polygon over arrays of points: one vectorized pass per edge."""
+    inside = np.zeros(len(lat), dtype=bool)
+    lat_b, lng_b = polygon[-1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for lat_a, lng_a in polygon:
+            crosses = (lat_a > lat) != (lat_b > lat)
+            inside ^= crosses & (lng < (lng_b - lng_a) * (lat - lat_a) / (lat_b - lat_a) + lng_a)
+            lat_b, lng_b = lat_a, lng_a
+    return inside
+
+
+def compile_fence(site_id: int, latitude, longitude, radius_m=None, polygon=None) -> Fence:
+    """A Fence with its bounding box precomputed from a Site's columns."""
+    lat, lng = float(latitude), float(longitude)
+    if polygon:
+        vertices = tuple((float(v[0]), float(v[1])) for v in polygon)
+        lats, lngs = [v[0] for v in vertices], [v[1] for v in vertices]
+        return Fence(site_id, min(lats) - BBOX_PAD, max(lats) + BBOX_PAD, min(lngs) - BBOX_PAD, max(lngs) + BBOX_PAD,
+                     lat, lng, None, vertices)
+    radius = float(radius_m or 0)
+    angle = radius / EARTH_RADIUS_M
+    dlat = math.degrees(angle)
+    # Widest longitude span of the circle (exact, not the small-angle dlat / cos(lat))
+    cos_lat = math.cos(math.radians(lat))
+    dlng = 180.0 if math.sin(angle) >= cos_lat else math.degrees(math.asin(math.sin(angle) / cos_lat))
+    return Fence(site_id, lat - dlat - BBOX_PAD, lat + dlat + BBOX_PAD, lng - dlng - BBOX_PAD, lng + dlng + BBOX_PAD,
+                 lat, lng, radius, None)
+
+
+# ---- Punch-time checks ----
+def invalidate_geofences(*args, **kwargs):
+    """post_save/post_delete on Site, m2m_changed on Site.employees: drop every cached fence list."""
+    cache.set(VERSION_KEY, time.time_ns(), None)
+
+
+def fences_for(employee_id: int) -> Tuple[Fence, ...]:
+    """
+    The employee's active sites as Fences. Kept in this process (keyed by
+    the shared invalidation version, so other processes' Site edits still
+    apply) and in the shared cache; a miss on both costs one query.
+    """
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, time.time_ns(), None)
+        version = cache.get(VERSION_KEY)
+    local_key, now = (version, employee_id), time.monotonic()
+    hit = _local.get(local_key)
+    if hit is not None and hit[1] > now:
+        return hit[0]
+    key = CACHE_KEY.format(version=version, employee_id=employee_id)
+    fences = cache.get(key)
+    if fences is None:
+        rows = Site.objects.filter(employees=employee_id, is_active=True).order_by("id").values_list(*SITE_COLUMNS)
+        fences = tuple(compile_fence(*row) for row in rows)
+        cache.set(key, fences, CACHE_TTL)
+    if len(_local) >= LOCAL_MAX_ENTRIES:
+        _local.clear()
+    _local[local_key] = (fences, now + CACHE_TTL)
+    return fences
+
+
+def check_point(employee_id: int, latitude, longitude, fences: Optional[Sequence[Fence]] = None) -> GeofenceCheck:
+    """
+    The site a punch at (latitude, longitude) falls in, nearest centre first.
+
+    UNCHECKED when there are no coordinates or no assigned sites; pass
+    `fences` to check several punches of one employee against one load.
+    """
+    if latitude is None or longitude is None:
+        return UNCHECKED
+    if fences is None:
+        fences = fences_for(employee_id)
+    if not fences:
+        return UNCHECKED
+    lat, lng = float(latitude), float(longitude)
+    hits = [f for f in fences if f.contains(lat, lng)]
+    if not hits:
+        return GeofenceCheck(None, False)
+    if len(hits) > 1:
+        hits.sort(key=lambda f: _haversine(f.lat, f.lng, lat, lng))
+    return GeofenceCheck(hits[0].site_id, True)
+
+
+def validate_punch(
+    employee_id: int, latitude, longitude, fences: Optional[Sequence[Fence]] = None,
+) -> Tuple[GeofenceCheck, Optional[str]]:
+    """check_point plus, when GEOFENCE_ENFORCE is on, the reason to refuse the punch (else None)."""
+    if fences is None:
+        fences = fences_for(employee_id)
+    check = check_point(employee_id, latitude, longitude, fences)
+    if not ENFORCE or not fences:
+        return check, None
+    if latitude is None or longitude is None:
+        return check, LOCATION_REQUIRED
+    return check, None if check.within else OUTSIDE_SITES
+
+
+def validate_kiosk_punch(
+    employee_id: int, site_id: int, latitude, longitude, fences: Optional[Sequence[Fence]] = None,
+) -> Tuple[GeofenceCheck, Optional[str]]:
+    """
+    Like validate_punch, for a scan of `site_id`'s kiosk code: the scan
+    places an employee assigned to that site there. Anyone else is only
+    checked on their coordinates, and refused when GEOFENCE_ENFORCE is on.
+    """
+    if fences is None:
+        fences = fences_for(employee_id)
+    if any(f.site_id == site_id for f in fences):
+        return GeofenceCheck(site_id, True), None
+    return check_point(employee_id, latitude, longitude, fences), NOT_AT_KIOSK_SITE if ENFORCE else None
+
+
+# ---- Bulk revalidation ----
+def _attendance_frame(day_from: date, day_to: date, employee_ids: Optional[List[int]]) -> pd.DataFrame:
+    qs = Attendance.objects.filter(
+        date__gte=day_from, date__lte=day_to, latitude__isnull=False, longitude__isnull=False,
+    )
+    if employee_ids:
+        qs = qs.filter(employee_id__in=employee_ids)
+    rows = qs.order_by().values_list(
+        "id", "employee_id", Cast("latitude", FloatField()), Cast("longitude", FloatField()),
+        "site_id", "within_geofence",
+    )
+    return pd.DataFrame.from_records(
+        list(rows), columns=["id", "employee_id", "lat", "lng", "site_id", "within_geofence"],
+    )
+
+
+def _site_frames(employee_ids: Optional[List[int]]) -> Tuple[pd.DataFrame, pd.DataFrame, Dict[int, Fence]]:
+    """(employee_id/site_id memberships, one row of fence columns per site, {site_id: Fence})."""
+    through = Site.employees.through.objects.filter(site__is_active=True)
+    if employee_ids:
+        through = through.filter(employee_id__in=employee_ids)
+    members = pd.DataFrame.from_records(
+        list(through.values_list("employee_id", "site_id")), columns=["employee_id", "site_id"],
+    )
+    sites = Site.objects.filter(id__in=members["site_id"].unique().tolist()).values_list(*SITE_COLUMNS)
+    fences = {row[0]: compile_fence(*row) for row in sites}
+    columns = ["site_id", "min_lat", "max_lat", "min_lng", "max_lng", "c_lat", "c_lng", "radius_m"]
+    frame = pd.DataFrame.from_records([f[:8] for f in fences.values()], columns=columns)
+    frame["radius_m"] = frame["radius_m"].astype(float)  # NaN for polygons
+    return members, frame, fences
+
+
+def _validate(att: pd.DataFrame, members: pd.DataFrame, sites: pd.DataFrame, fences: Dict[int, Fence]) -> pd.DataFrame:
+    """Match every row to its nearest containing assigned site and flag what changed."""
+    pairs = att[["id", "employee_id", "lat", "lng"]].merge(members, on="employee_id").merge(sites, on="site_id")
+    in_box = (
+        (pairs["lat"] >= pairs["min_lat"]) & (pairs["lat"] <= pairs["max_lat"])
+        & (pairs["lng"] >= pairs["min_lng"]) & (pairs["lng"] <= pairs["max_lng"])
+    )
+    cand = pairs.loc[in_box, ["id", "site_id", "lat", "lng", "c_lat", "c_lng", "radius_m"]]
+    lat, lng = cand["lat"].to_numpy(), cand["lng"].to_numpy()
+    dist = haversine_m(cand["c_lat"].to_numpy(), cand["c_lng"].to_numpy(), lat, lng)
+    hit = dist <= cand["radius_m"].to_numpy()  # NaN radius (polygon) compares False
+    site_ids = cand["site_id"].to_numpy()
+    for site_id in np.unique(site_ids):
+        polygon = fences[site_id].polygon
+        if polygon is not None:
+            rows = site_ids == site_id
+            hit[rows] = points_in_polygon(lat[rows], lng[rows], polygon)
+
+    nearest = (
+        cand.loc[hit, ["id", "site_id"]].assign(dist=dist[hit])
+        .sort_values(["id", "dist"]).drop_duplicates("id").set_index("id")["site_id"]
+    )
+    new_site = att["id"].map(nearest).astype("Int64")
+    has_sites = att["employee_id"].isin(members["employee_id"]).to_numpy()
+    within = pd.Series(np.where(has_sites, new_site.notna().to_numpy(), None), index=att.index, dtype=object)
+
+    def code(values):  # None/False/True -> -1/0/1 for comparison
+        return values.map({False: 0, True: 1}).fillna(-1).to_numpy()
+
+    return pd.DataFrame({
+        "id": att["id"].to_numpy(), "site_id": new_site, "within_geofence": within,
+        "site_id_changed": (new_site.fillna(-1) != pd.to_numeric(att["site_id"]).fillna(-1)).to_numpy(dtype=bool),
+        "within_geofence_changed": code(within) != code(att["within_geofence"]),
+    })
+
+
+def revalidate_attendance(
+    day_from: date,
+    day_to: date,
+    *,
+    employee_ids: Optional[Iterable[int]] = None,
+    batch_size: int = BULK_BATCH,
+) -> Dict[str, int]:
+    """
+    Re-check site and within_geofence for every row with coordinates in
+    [day_from, day_to] against the employees' current active sites.
+
+    Returns {"checked": rows read, "updated": rows written, "outside": rows outside every site}.
+    """
+    employee_ids = list(employee_ids) if employee_ids else None
+    members, sites, fences = _site_frames(employee_ids)
+    checked = updated = outside = 0
+    chunk_from = day_from
+    while chunk_from <= day_to:
+        chunk_to = min(day_to, chunk_from + timedelta(days=CHUNK_DAYS - 1))
+        att = _attendance_frame(chunk_from, chunk_to, employee_ids)
+        if not att.empty:
+            derived = _validate(att, members, sites, fences)
+            with transaction.atomic():
+                updated += update_changed(Attendance, derived, REVALIDATED_FIELDS, batch_size)
+            checked += len(att)
+            outside += int(derived["within_geofence"].eq(False).sum())
+        chunk_from = chunk_to + timedelta(days=1)
+    logger.info("Revalidated geofences %s..%s: %s rows checked, %s updated, %s outside",
+                day_from, day_to, checked, updated, outside)
+    return {"checked": checked, "updated": updated, "outside": outside}
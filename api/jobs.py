@@ -0,0 +1,173 @@
+# api/jobs.py
+"""
+Database-backed export queue.
+
+Views only create ExportJob rows; `manage.py export_worker` claims them with
+SELECT ... FOR UPDATE SKIP LOCKED (so several workers can run side by side),
+writes the artifact to MEDIA_ROOT/exports/ and marks the job Done. A job that
+raises goes back to Pending with its error until it has used MAX_ATTEMPTS,
+then it is marked Failed.
+"""
+import logging
+import os
+import tempfile
+from datetime import timedelta
+from typing import Optional
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .exports import (
+    ATTENDANCE_HEADER, ATTENDANCE_XLSX_FORMATS, PAYSLIP_HEADER, PAYSLIP_XLSX_FORMATS,
+    attendance_export_rows, iter_csv, parse_export_filters, payslip_export_rows, write_xlsx,
+)
+from .models import Employee, ExportJob, Payslip
+from .payslip_pdf import payslips_for_period, write_payslip_pdf, write_payslips_pdf, write_payslips_zip
+
+logger = logging.getLogger(__name__)
+
+__all__ = ["enqueue_export", "claim_next_job", "run_job", "cleanup_expired_exports", "artifact_filename"]
+
+JOB_TIMEOUT = getattr(settings, "EXPORT_JOB_TIMEOUT", 30 * 60)        # seconds before a Running job is reclaimed
+MAX_ATTEMPTS = getattr(settings, "EXPORT_JOB_MAX_ATTEMPTS", 3)
+RETENTION_DAYS = getattr(settings, "EXPORT_RETENTION_DAYS", 7)
+
+
+# ---- Exporters: kind -> (extension, writer(fh, job)) ----
+def _scope(job):
+    employee_id = job.params.get("employee_id")
+    employee = Employee.objects.filter(pk=employee_id).first() if employee_id else None
+    if employee_id and employee is None:
+        raise ValueError("Employee no longer exists")
+    return employee, parse_export_filters(job.params)
+
+
+def _attendance_csv(fh, job):
+    employee, filters = _scope(job)
+    for chunk in iter_csv(ATTENDANCE_HEADER, attendance_export_rows(employee, filters)):
+        fh.write(chunk)
+
+
+def _attendance_excel(fh, job):
+    employee, filters = _scope(job)
+    write_xlsx(fh, "Attendance", ATTENDANCE_HEADER, attendance_export_rows(employee, filters), ATTENDANCE_XLSX_FORMATS)
+
+
+def _payslips_csv(fh, job):
+    employee, filters = _scope(job)
+    for chunk in iter_csv(PAYSLIP_HEADER, payslip_export_rows(employee, filters)):
+        fh.write(chunk)
+
+
+def _payslips_excel(fh, job):
+    employee, filters = _scope(job)
+    write_xlsx(fh, "Payslips", PAYSLIP_HEADER, payslip_export_rows(employee, filters), PAYSLIP_XLSX_FORMATS)
+
+
+def _payslip_pdf(fh, job):
+    ps = Payslip.objects.select_related("employee__department").get(pk=job.params["payslip_id"])
+    write_payslip_pdf(fh, ps)
+
+
+def _period_payslips(job):
+    return payslips_for_period(
+        job.params.get("period_from"), job.params.get("period_to"), department_id=job.params.get("department"),
+    )
+
+
+def _payslips_pdf(fh, job):
+    write_payslips_pdf(fh, _period_payslips(job))
+
+
+def _payslips_zip(fh, job):
+    write_payslips_zip(fh, _period_payslips(job))
+
+
+EXPORTERS = {
+    "attendance_csv": ("csv", _attendance_csv),
+    "attendance_excel": ("xlsx", _attendance_excel),
+    "payslips_csv": ("csv", _payslips_csv),
+    "payslips_excel": ("xlsx", _payslips_excel),
+    "payslip_pdf": ("pdf", _payslip_pdf),
+    "payslips_pdf": ("pdf", _payslips_pdf),
+    "payslips_zip": ("zip", _payslips_zip),
+}
+
+
+# ---- Queue ----
+def enqueue_export(user, kind: str, params: dict) -> ExportJob:
+    if kind not in EXPORTERS:
+        raise ValueError(f"Unknown export kind: {kind}")
+    return ExportJob.objects.create(requested_by=user, kind=kind, params=params)
+
+
+def claim_next_job() -> Optional[ExportJob]:
+    """
+    Atomically take the oldest Pending job (or a Running job whose worker
+    died, i.e. started more than JOB_TIMEOUT ago) and mark it Running.
+    Jobs that used up MAX_ATTEMPTS on the way are marked Failed and skipped;
+    None means nothing is left to run.
+    """
+    now = timezone.now()
+    claimable = Q(status=ExportJob.PENDING) | Q(status=ExportJob.RUNNING, started_at__lt=now - timedelta(seconds=JOB_TIMEOUT))
+    with transaction.atomic():
+        while True:
+            job = ExportJob.objects.select_for_update(skip_locked=True).filter(claimable).order_by("created_at").first()
+            if job is None:
+                return None
+            if job.attempts < MAX_ATTEMPTS:
+                break
+            job.status = ExportJob.FAILED
+            job.error = f"Gave up after {job.attempts} attempts"
+            job.finished_at = now
+            job.save(update_fields=["status", "error", "finished_at"])
+        job.status = ExportJob.RUNNING
+        job.started_at = now
+        job.attempts += 1
+        job.save(update_fields=["status", "started_at", "attempts"])
+    return job
+
+
+def run_job(job: ExportJob) -> ExportJob:
+    ext, writer = EXPORTERS[job.kind]
+    try:
+        with tempfile.TemporaryFile() as tmp:
+            writer(tmp, job)
+            tmp.seek(0)
+            job.file.save(f"{job.kind}_{job.pk}.{ext}", File(tmp), save=False)
+        job.status = ExportJob.DONE
+        job.error = ""
+    except Exception as e:
+        logger.exception("Export job %s failed (attempt %s of %s)", job.pk, job.attempts, MAX_ATTEMPTS)
+        job.error = str(e) or e.__class__.__name__
+        if job.attempts < MAX_ATTEMPTS:
+            job.status = ExportJob.PENDING  # back in the queue; the error stays visible until a retry succeeds
+            job.save(update_fields=["status", "error"])
+            return job
+        job.status = ExportJob.FAILED
+    job.finished_at = timezone.now()
+    job.save(update_fields=["file", "status", "error", "finished_at"])
+    return job
+
+
+def cleanup_expired_exports(days: int = RETENTION_DAYS) -> int:
+    """Delete finished jobs older than `days` together with their files. Returns the number removed."""
+    cutoff = timezone.now() - timedelta(days=days)
+    expired = ExportJob.objects.filter(status__in=[ExportJob.DONE, ExportJob.FAILED], finished_at__lt=cutoff)
+    removed = 0
+    for job in list(expired):
+        if job.file:
+            try:
+                job.file.delete(save=False)
+            except OSError:
+                logger.warning("Could not remove export file %s", job.file.name)
+        job.delete()
+        removed += 1
+    return removed
+
+
+def artifact_filename(job: ExportJob) -> str:
+    return os.path.basename(job.file.name) if job.file else ""
@@ -0,0 +1,95 @@
+import logging
+import statistics
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from rest_framework.test import APIClient
+
+from api.authentication import ClaimsTokenObtainPairSerializer
+from api.models import Attendance, Employee
+
+BENCH_PREFIX = "__bench_checkin_"
+
+
+def _percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test shift-start check-ins: N employees POST /api/attendance/time-in/ at the same "
+        "moment (each `--repeat` times, as retries would), served by `--workers` threads like an "
+        "app server's worker pool. Reports p50/p99 latency from the burst start (queueing "
+        "included, as employees see it) and per request, and checks that exactly one attendance "
+        "row exists per employee. Seeds temporary users and removes them afterwards; run it "
+        "against a development database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int, default=500, help="Employees checking in at once")
+        parser.add_argument("--repeat", type=int, default=2, help="Requests per employee (duplicates must be rejected)")
+        parser.add_argument("--workers", type=int, default=16, help="Threads serving the burst")
+        parser.add_argument("--keep", action="store_true", help="Leave the seeded rows in place")
+
+    def handle(self, *args, **opts):
+        n, repeat = opts["concurrency"], opts["repeat"]
+        logging.getLogger("django.request").setLevel(logging.ERROR)  # rejected duplicates are expected
+        try:
+            tokens = self._seed(n)
+            requests = [t for _ in range(repeat) for t in tokens]
+            local = threading.local()
+
+            def punch(token):
+                if not hasattr(local, "client"):
+                    local.client = APIClient(SERVER_NAME="localhost")
+                start = time.perf_counter()
+                try:
+                    code = local.client.post(
+                        "/api/attendance/time-in/", {}, format="json", HTTP_AUTHORIZATION=f"Bearer {token}",
+                    ).status_code
+                except Exception as e:  # a crash is a result here, not a reason to stop
+                    code = type(e).__name__
+                done = time.perf_counter()
+                return code, (done - burst) * 1000, (done - start) * 1000
+
+            with ThreadPoolExecutor(max_workers=opts["workers"]) as pool:
+                burst = time.perf_counter()  # all requests arrive now
+                results = list(pool.map(punch, requests))
+            elapsed = time.perf_counter() - burst
+
+            waited = [ms for _, ms, _ in results]
+            served = [ms for _, _, ms in results]
+            codes = Counter(code for code, _, _ in results)
+            per_employee = (
+                Attendance.objects.filter(employee__full_name__startswith=BENCH_PREFIX)
+                .values("employee_id", "date").annotate(n=Count("id")).values_list("n", flat=True)
+            )
+            self.stdout.write(
+                f"{len(requests)} requests from {n} employees in {elapsed:.2f}s "
+                f"({len(requests) / elapsed:,.0f} req/s)\n"
+                f"latency ms (from burst): p50 {statistics.median(waited):.1f}  p99 {_percentile(waited, 99):.1f}  "
+                f"max {max(waited):.1f}\n"
+                f"service ms (per request): p50 {statistics.median(served):.1f}  p99 {_percentile(served, 99):.1f}\n"
+                f"responses: {dict(codes)}\n"
+                f"attendance rows: {sum(per_employee)} for {len(per_employee)} employees "
+                f"(duplicates: {sum(c - 1 for c in per_employee)})"
+            )
+        finally:
+            if not opts["keep"]:
+                User.objects.filter(username__startswith=BENCH_PREFIX).delete()  # cascades to rows
+
+    def _seed(self, n):
+        User.objects.filter(username__startswith=BENCH_PREFIX).delete()
+        User.objects.bulk_create([User(username=f"{BENCH_PREFIX}{i}") for i in range(n)])
+        users = list(User.objects.filter(username__startswith=BENCH_PREFIX).order_by("id"))
+        Employee.objects.bulk_create([
+            Employee(user=u, full_name=u.username, date_hired=date(2024, 1, 1)) for u in users
+        ])
+        return [str(ClaimsTokenObtainPairSerializer.get_token(u).access_token) for u in users]
@@ -0,0 +1,107 @@
+import multiprocessing
+import resource
+import tempfile
+import time
+from datetime import date, time as dtime, timedelta
+
+import openpyxl
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+
+from api.exports import ATTENDANCE_HEADER, ATTENDANCE_XLSX_FORMATS, attendance_export_rows, write_xlsx
+from api.models import Attendance, Department, Employee
+
+BENCH_DEPARTMENT = "__benchmark_exports__"
+
+
+def _legacy_excel(department_id, fh):
+    # The pre-streaming implementation: full in-memory Workbook, model
+    # instances, one employee lookup per row, str()-converted values.
+    qs = Attendance.objects.filter(employee__department_id=department_id)
+    wb = openpyxl.Workbook()
+    ws = wb.active; ws.title = "Attendance"
+    ws.append(ATTENDANCE_HEADER)
+    for a in qs:
+        ws.append([a.employee.full_name, str(a.date), str(a.time_in), str(a.time_out or ""), a.status, a.latitude, a.longitude])
+    wb.save(fh)
+
+
+def _write_only_excel(department_id, fh):
+    rows = attendance_export_rows(None, {"department": department_id})
+    write_xlsx(fh, "Attendance", ATTENDANCE_HEADER, rows, ATTENDANCE_XLSX_FORMATS)
+
+
+VARIANTS = {"legacy": _legacy_excel, "write_only": _write_only_excel}
+
+
+def _run(variant, department_id, queue):
+    connections.close_all()  # never share the parent's DB socket
+    base_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    with tempfile.TemporaryFile() as fh:
+        start = time.perf_counter()
+        VARIANTS[variant](department_id, fh)
+        elapsed = time.perf_counter() - start
+        size = fh.tell()
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    connections.close_all()
+    queue.put({"variant": variant, "seconds": elapsed, "peak_rss_mb": peak_kb / 1024,
+               "growth_mb": (peak_kb - base_kb) / 1024, "bytes": size})
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the attendance Excel export (legacy in-memory workbook vs write-only). "
+        "Seeds temporary rows in a throwaway department and removes them afterwards; "
+        "run it against a development database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=100_000)
+        parser.add_argument("--employees", type=int, default=250)
+
+    def handle(self, *args, **opts):
+        rows, n_emp = opts["rows"], max(1, opts["employees"])
+        dept = self._seed(rows, n_emp)
+        try:
+            ctx = multiprocessing.get_context("fork")
+            connections.close_all()
+            for variant in VARIANTS:
+                # one fresh process per variant so peak RSS is not shared
+                queue = ctx.Queue()
+                proc = ctx.Process(target=_run, args=(variant, dept.id, queue))
+                proc.start()
+                result = queue.get()
+                proc.join()
+                self.stdout.write(
+                    f"{result['variant']:>10}: {rows} rows in {result['seconds']:.2f}s, "
+                    f"peak RSS {result['peak_rss_mb']:.1f} MB (+{result['growth_mb']:.1f} MB), "
+                    f"{result['bytes'] / 1024:.0f} KB"
+                )
+        finally:
+            Employee.objects.filter(department=dept).delete()
+            dept.delete()
+
+    def _seed(self, rows, n_emp):
+        days = -(-rows // n_emp)
+        start = date(2000, 1, 1)
+        with transaction.atomic():
+            dept = Department.objects.create(name=BENCH_DEPARTMENT)
+            employees = Employee.objects.bulk_create(
+                [Employee(full_name=f"Bench Employee {i:05d}", date_hired=start, department=dept) for i in range(n_emp)]
+            )
+            if employees[0].pk is None:  # backends without RETURNING
+                employees = list(Employee.objects.filter(department=dept).order_by("id"))
+            batch = []
+            for i in range(rows):
+                emp = employees[i % n_emp]
+                batch.append(Attendance(
+                    employee=emp, date=start + timedelta(days=i // n_emp),
+                    time_in=dtime(8, i % 60), time_out=dtime(17, 0), status="Present",
+                    latitude="14.599512", longitude="120.984222",
+                ))
+                if len(batch) == 5000:
+                    Attendance.objects.bulk_create(batch)
+                    batch = []
+            Attendance.objects.bulk_create(batch)
+        self.stdout.write(f"Seeded {rows} attendance rows for {n_emp} employees ({days} days).")
+        return dept
@@ -0,0 +1,175 @@
+import math
+import statistics
+import time
+from datetime import date, timedelta
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from api.geofence import EARTH_RADIUS_M, check_point, fences_for, haversine_m, revalidate_attendance
+from api.models import Attendance, Employee, Site
+
+BENCH_PREFIX = "__bench_geofence_"
+CENTER = (14.55, 121.03)  # sites are spread over ~0.4 degrees around this point
+BATCH = 10_000
+
+
+def _metres_to_degrees(metres, lat):
+    dlat = np.degrees(metres / EARTH_RADIUS_M)
+    return dlat, dlat / np.cos(np.radians(lat))
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark geofence validation on stored coordinates: seeds `--rows` attendance rows for "
+        "`--employees` employees assigned to 1-3 of `--sites` sites (half radius, half polygon; "
+        "`--outside` of the points off site), then times the bulk revalidation, the NumPy "
+        "haversine kernel and per-punch check_point calls, and cross-checks a sample of rows "
+        "against check_point. Seeds temporary rows and removes them afterwards; run it against "
+        "a development database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=1_000_000, help="Attendance rows with coordinates")
+        parser.add_argument("--employees", type=int, default=2000)
+        parser.add_argument("--sites", type=int, default=200)
+        parser.add_argument("--outside", type=float, default=0.2, help="Fraction of points off site")
+        parser.add_argument("--checks", type=int, default=100_000, help="Per-punch check_point calls to time")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--keep", action="store_true", help="Leave the seeded rows in place")
+
+    def handle(self, *args, **opts):
+        rng = np.random.default_rng(opts["seed"])
+        try:
+            started = time.perf_counter()
+            employee_ids, day_from, day_to, points = self._seed(rng, opts)
+            self.stdout.write(f"seeded {opts['rows']:,} rows in {time.perf_counter() - started:.1f}s")
+
+            for label in ("revalidate (first run)", "revalidate (no changes)"):
+                started = time.perf_counter()
+                result = revalidate_attendance(day_from, day_to, employee_ids=employee_ids)
+                elapsed = time.perf_counter() - started
+                self.stdout.write(
+                    f"{label}: {elapsed:.2f}s ({result['checked'] / elapsed:,.0f} rows/s)  "
+                    f"updated {result['updated']:,}  outside {result['outside']:,}"
+                )
+
+            lat, lng = points[:, 1], points[:, 2]
+            c_lat, c_lng = np.full_like(lat, CENTER[0]), np.full_like(lng, CENTER[1])
+            started = time.perf_counter()
+            haversine_m(c_lat, c_lng, lat, lng)
+            self.stdout.write(f"haversine kernel: {len(lat):,} distances in {(time.perf_counter() - started) * 1000:.1f} ms")
+
+            self._time_checks(rng, points, opts["checks"])
+            self._cross_check(rng, employee_ids)
+        finally:
+            if not opts["keep"]:
+                self._cleanup()
+
+    def _seed(self, rng, opts):
+        self._cleanup()
+        n_emp, n_sites = opts["employees"], opts["sites"]
+        days = math.ceil(opts["rows"] / n_emp)
+        day_from = date(2020, 1, 1)
+
+        # Sites: half circles of 100-500 m, half rectangles of 200-800 m a side
+        site_lat = CENTER[0] + rng.uniform(-0.2, 0.2, n_sites)
+        site_lng = CENTER[1] + rng.uniform(-0.2, 0.2, n_sites)
+        radius = rng.uniform(100, 500, n_sites)
+        half_lat, half_lng = _metres_to_degrees(rng.uniform(100, 400, n_sites), site_lat)
+        is_polygon = np.arange(n_sites) % 2 == 1
+        sites = []
+        for i in range(n_sites):
+            kw = dict(name=f"{BENCH_PREFIX}{i}", latitude=round(site_lat[i], 6), longitude=round(site_lng[i], 6))
+            if is_polygon[i]:
+                lo_lat, hi_lat = site_lat[i] - half_lat[i], site_lat[i] + half_lat[i]
+                lo_lng, hi_lng = site_lng[i] - half_lng[i], site_lng[i] + half_lng[i]
+                kw["polygon"] = [[lo_lat, lo_lng], [lo_lat, hi_lng], [hi_lat, hi_lng], [hi_lat, lo_lng]]
+            else:
+                kw["radius_m"] = int(radius[i])
+            sites.append(Site(**kw))
+        Site.objects.bulk_create(sites)
+        site_ids = np.array(Site.objects.filter(name__startswith=BENCH_PREFIX).order_by("id").values_list("id", flat=True))
+
+        Employee.objects.bulk_create([
+            Employee(full_name=f"{BENCH_PREFIX}{i}", date_hired=day_from) for i in range(n_emp)
+        ])
+        employee_ids = list(
+            Employee.objects.filter(full_name__startswith=BENCH_PREFIX).order_by("id").values_list("id", flat=True)
+        )
+        assigned = [rng.choice(n_sites, rng.integers(1, 4), replace=False) for _ in employee_ids]
+        Site.employees.through.objects.bulk_create([
+            Site.employees.through(employee_id=emp, site_id=site_ids[s])
+            for emp, chosen in zip(employee_ids, assigned) for s in chosen
+        ])
+
+        # Points: near one of the employee's sites (inside its fence), or 1-5 km away
+        emp_idx = np.repeat(np.arange(n_emp), days)[:opts["rows"]]
+        day_idx = np.tile(np.arange(days), n_emp)[:opts["rows"]]
+        site_idx = np.array([rng.choice(assigned[e]) for e in emp_idx])
+        off_site = rng.random(len(emp_idx)) < opts["outside"]
+        inside_m = np.where(is_polygon[site_idx], 0.0, radius[site_idx] * 0.9 * np.sqrt(rng.random(len(emp_idx))))
+        dist_m = np.where(off_site, rng.uniform(1000, 5000, len(emp_idx)), inside_m)
+        bearing = rng.uniform(0, 2 * np.pi, len(emp_idx))
+        dlat, dlng = _metres_to_degrees(dist_m, site_lat[site_idx])
+        lat = site_lat[site_idx] + dlat * np.cos(bearing)
+        lng = site_lng[site_idx] + dlng * np.sin(bearing)
+        in_poly = is_polygon[site_idx] & ~off_site  # uniformly inside the rectangle
+        lat[in_poly] = site_lat[site_idx][in_poly] + half_lat[site_idx][in_poly] * rng.uniform(-0.9, 0.9, in_poly.sum())
+        lng[in_poly] = site_lng[site_idx][in_poly] + half_lng[site_idx][in_poly] * rng.uniform(-0.9, 0.9, in_poly.sum())
+        lat, lng = np.round(lat, 6), np.round(lng, 6)
+
+        emp_arr = np.array(employee_ids)[emp_idx]
+        for start in range(0, len(emp_arr), BATCH):
+            end = start + BATCH
+            with transaction.atomic():
+                Attendance.objects.bulk_create([
+                    Attendance(employee_id=int(e), date=day_from + timedelta(days=int(d)), latitude=float(a), longitude=float(o))
+                    for e, d, a, o in zip(emp_arr[start:end], day_idx[start:end], lat[start:end], lng[start:end])
+                ])
+        points = np.column_stack([emp_arr, lat, lng])
+        return employee_ids, day_from, day_from + timedelta(days=days - 1), points
+
+    def _time_checks(self, rng, points, n):
+        sample = points[rng.integers(0, len(points), n)]
+        employees = sample[:, 0].astype(int).tolist()
+        for emp in set(employees):
+            fences_for(emp)  # warm the cache, as steady-state punches find it
+        lats, lngs = sample[:, 1].tolist(), sample[:, 2].tolist()
+        timings = []
+        for emp, lat, lng in zip(employees, lats, lngs):
+            started = time.perf_counter()
+            check_point(emp, lat, lng)
+            timings.append((time.perf_counter() - started) * 1e6)
+        fences = [fences_for(emp) for emp in employees]
+        started = time.perf_counter()
+        for emp, lat, lng, f in zip(employees, lats, lngs, fences):
+            check_point(emp, lat, lng, f)
+        geometry_us = (time.perf_counter() - started) * 1e6 / n
+        self.stdout.write(
+            f"check_point: p50 {statistics.median(timings):.1f} us  mean {statistics.fmean(timings):.1f} us "
+            f"(cached fences); geometry alone {geometry_us:.2f} us"
+        )
+
+    def _cross_check(self, rng, employee_ids, n=2000):
+        rows = list(
+            Attendance.objects.filter(employee_id__in=employee_ids)
+            .order_by("?")[:n].values_list("employee_id", "latitude", "longitude", "site_id", "within_geofence")
+        )
+        mismatches = sum(check_point(e, lat, lng) != (site, within) for e, lat, lng, site, within in rows)
+        self.stdout.write(f"cross-check: {mismatches} of {len(rows)} sampled rows differ from check_point")
+
+    def _cleanup(self):
+        # Raw DELETE: the ORM would load every row to send post_delete signals
+        employees, params = (
+            Employee.objects.filter(full_name__startswith=BENCH_PREFIX).values("id").query.sql_with_params()
+        )
+        att = Attendance._meta
+        qn = connection.ops.quote_name
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {qn(att.db_table)} WHERE {qn(att.get_field('employee').column)} IN ({employees})", params,
+            )
+        Site.objects.filter(name__startswith=BENCH_PREFIX).delete()
+        Employee.objects.filter(full_name__startswith=BENCH_PREFIX).delete()
@@ -0,0 +1,71 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.models import AuditLog
+from api.pagination import KeysetPagination
+
+BENCH_ACTION = "__benchmark_pagination__"
+PAGE = 10
+REPEAT = 20
+
+
+def _median_ms(fn):
+    samples = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def _grow(target, batch=10_000):
+    """Append benchmark rows until the table holds `target` of them."""
+    have = AuditLog.objects.filter(action=BENCH_ACTION).count()
+    while have < target:
+        n = min(batch, target - have)
+        AuditLog.objects.bulk_create([AuditLog(action=BENCH_ACTION, details={}) for _ in range(n)])
+        have += n
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark AuditLog page latency at increasing table sizes: OFFSET + COUNT(*) pages vs "
+        "keyset (cursor) pages. Seeds temporary rows and removes them afterwards; run it "
+        "against a development database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default="10000,100000,1000000",
+                            help="Comma-separated table sizes to measure at")
+        parser.add_argument("--keep", action="store_true", help="Leave the seeded rows in place")
+
+    def handle(self, *args, **opts):
+        sizes = sorted(int(s) for s in opts["sizes"].split(","))
+        qs = AuditLog.objects.all()  # the whole feed, as AuditLogViewSet pages it
+        order = ("-timestamp", "-id")  # as AuditLogViewSet.keyset_ordering
+        self.stdout.write(f"{'rows':>10} {'depth':>8} {'offset+count ms':>16} {'keyset ms':>10}")
+        try:
+            for size in sizes:
+                _grow(size)
+                for depth in (0, size // 2, size - PAGE):
+                    def offset_page():
+                        qs.count()
+                        list(qs.order_by(*order)[depth:depth + PAGE])
+
+                    # The cursor a client would hold after paging down to `depth`
+                    anchor = qs.order_by(*order).values_list("timestamp", "id")[depth - 1] if depth else None
+
+                    def keyset_page():
+                        page = qs.order_by(*order)
+                        if anchor:
+                            page = page.filter(KeysetPagination._after(list(order), list(anchor)))
+                        list(page[:PAGE + 1])
+
+                    self.stdout.write(
+                        f"{size:>10,} {depth:>8,} {_median_ms(offset_page):>16.2f} {_median_ms(keyset_page):>10.2f}"
+                    )
+        finally:
+            if not opts["keep"]:
+                AuditLog.objects.filter(action=BENCH_ACTION).delete()
@@ -0,0 +1,48 @@
+import io
+import time
+from datetime import date
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+
+from api.models import Department, Employee, Payslip
+from api.payslip_pdf import PDF_WORKERS, write_payslips_pdf, write_payslips_zip
+
+
+def _fake_payslips(n):
+    # Unsaved instances with relations attached: rendering never hits the DB.
+    dept = Department(name="Operations")
+    out = []
+    for i in range(n):
+        emp = Employee(id=i + 1, full_name=f"Employee {i:05d}", position="Field Technician",
+                       date_hired=date(2020, 1, 1), department=dept)
+        out.append(Payslip(
+            id=i + 1, employee=emp, period_from=date(2025, 3, 1), period_to=date(2025, 3, 15),
+            issued_date=date(2025, 3, 16), daily_rate=Decimal("650.00"), days_worked=11,
+            overtime_pay=Decimal("420.00"), allowance=Decimal("500.00"), late_undertime=Decimal("50.00"),
+            sss=Decimal("400"), hdmf=Decimal("100"), phic=Decimal("200"),
+            gross_pay=Decimal("8070.00"), total_deductions=Decimal("750.00"), net_pay=Decimal("7320.00"),
+            name_snapshot=emp.full_name, position_snapshot=emp.position, employee_id_no=f"TLX-{i:05d}",
+        ))
+    return out
+
+
+class Command(BaseCommand):
+    help = "Benchmark bulk payslip rendering (payslips per second), single process vs worker pool."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--count", type=int, default=500)
+        parser.add_argument("--workers", type=int, default=PDF_WORKERS)
+
+    def handle(self, *args, **opts):
+        payslips = _fake_payslips(opts["count"])
+        for label, writer in (("multi-page PDF", write_payslips_pdf), ("ZIP", write_payslips_zip)):
+            for workers in sorted({1, opts["workers"]}):
+                buf = io.BytesIO()
+                start = time.perf_counter()
+                writer(buf, payslips, workers=workers)
+                elapsed = time.perf_counter() - start
+                self.stdout.write(
+                    f"{label:>15}, {workers:>2} worker(s): {len(payslips)} payslips in {elapsed:.2f}s "
+                    f"= {len(payslips) / elapsed:.0f}/s ({buf.tell() / 1024:.0f} KB)"
+                )
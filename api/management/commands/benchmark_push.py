@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.push_notifications import MAX_CONCURRENCY, send_push_notification
+from api.testing import ExpoStubServer
+
+
+class Command(BaseCommand):
+    help = "Benchmark push fan-out (messages per second) against a local Expo stub server."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--tokens", type=int, default=10_000)
+        parser.add_argument("--latency-ms", type=float, default=150.0,
+                            help="Simulated Expo response time per batch request")
+        parser.add_argument("--concurrency", type=int, default=MAX_CONCURRENCY)
+
+    def handle(self, *args, **opts):
+        tokens = [f"ExponentPushToken[bench{i:08d}]" for i in range(opts["tokens"])]
+        for concurrency in sorted({1, opts["concurrency"]}):
+            with ExpoStubServer(latency=opts["latency_ms"] / 1000) as stub:
+                start = time.perf_counter()
+                result = send_push_notification(tokens, "Benchmark", "Hello", endpoint=stub.url,
+                                                max_concurrency=concurrency)
+                elapsed = time.perf_counter() - start
+            self.stdout.write(
+                f"concurrency {concurrency:>2}: {len(result['success'])}/{len(tokens)} delivered in "
+                f"{elapsed:.2f}s = {len(tokens) / elapsed:,.0f} msg/s ({stub.requests} requests)"
+            )
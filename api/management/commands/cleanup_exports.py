@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from api.jobs import RETENTION_DAYS, cleanup_expired_exports
+
+
+class Command(BaseCommand):
+    help = "Delete finished export jobs and their files after the retention period."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=RETENTION_DAYS)
+
+    def handle(self, *args, **opts):
+        removed = cleanup_expired_exports(opts["days"])
+        self.stdout.write(self.style.SUCCESS(f"Removed {removed} export job(s) older than {opts['days']} days"))
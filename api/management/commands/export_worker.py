@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.jobs import claim_next_job, run_job
+
+
+class Command(BaseCommand):
+    help = "Run queued export jobs (ExportJob rows). Several workers can run side by side."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--poll", type=float, default=2.0, help="Seconds to wait when the queue is empty")
+        parser.add_argument("--once", action="store_true", help="Drain the queue once and exit")
+
+    def handle(self, *args, **opts):
+        self.stdout.write("Export worker started")
+        try:
+            while True:
+                job = claim_next_job()
+                if job is None:
+                    if opts["once"]:
+                        break
+                    time.sleep(opts["poll"])
+                    continue
+                job = run_job(job)
+                self.stdout.write(f"Export job {job.pk} ({job.kind}): {job.status}")
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write("Export worker stopped")
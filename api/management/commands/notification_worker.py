@@ -0,0 +1,61 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.outbox import (
+    BATCH_SIZE, claim_announcement, claim_batch, deliver_batch, fanout_announcement, poll_receipts,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Fan out announcements and deliver queued notifications (NotificationOutbox rows). "
+        "Several workers can run side by side."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch", type=int, default=BATCH_SIZE, help="Rows claimed per pass")
+        parser.add_argument("--poll", type=float, default=1.0, help="Seconds to wait when nothing is due")
+        parser.add_argument("--receipt-interval", type=float, default=60.0,
+                            help="Seconds between push receipt polls (dead-token pruning)")
+        parser.add_argument("--once", action="store_true", help="Drain due rows, poll receipts once and exit")
+
+    def handle(self, *args, **opts):
+        self.stdout.write("Notification worker started")
+        last_receipts = None
+        try:
+            while True:
+                if last_receipts is None or time.monotonic() - last_receipts >= opts["receipt_interval"]:
+                    self._poll_receipts()
+                    last_receipts = time.monotonic()
+                ann = claim_announcement()
+                if ann is not None:
+                    ann = fanout_announcement(ann)
+                    self.stdout.write(
+                        f"Announcement {ann.pk}: {ann.fanout_status}, {ann.recipients_done} recipient(s)"
+                    )
+                rows = claim_batch(opts["batch"])
+                if not rows and ann is None:
+                    if opts["once"]:
+                        self._poll_receipts()
+                        break
+                    time.sleep(opts["poll"])
+                    continue
+                if rows:
+                    counts = deliver_batch(rows)
+                    self.stdout.write(
+                        f"Delivered {len(rows)} notification(s): {counts['sent']} sent, "
+                        f"{counts['retry']} to retry, {counts['failed']} failed, {counts['pruned']} token(s) pruned"
+                    )
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write("Notification worker stopped")
+
+    def _poll_receipts(self):
+        counts = poll_receipts()
+        if counts["checked"] or counts["expired"]:
+            self.stdout.write(
+                f"Checked {counts['checked']} receipt(s): {counts['delivered']} delivered, "
+                f"{counts['failed']} failed, {counts['pruned']} token(s) pruned, "
+                f"{counts['expired']} expired without a receipt"
+            )
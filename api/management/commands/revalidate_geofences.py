@@ -0,0 +1,39 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from api.geofence import revalidate_attendance
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-check Attendance coordinates against the employees' current site geofences and "
+        "update site/within_geofence. Defaults to yesterday; run it over a wider range after "
+        "moving sites or changing assignments."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--from", dest="day_from", help="YYYY-MM-DD (default: yesterday)")
+        parser.add_argument("--to", dest="day_to", help="YYYY-MM-DD (default: same as --from)")
+        parser.add_argument("--employee", type=int, action="append", dest="employees",
+                            help="Employee id (repeatable)")
+
+    def handle(self, *args, **opts):
+        yesterday = timezone.localdate() - timedelta(days=1)
+        try:
+            day_from = parse_date(opts["day_from"]) if opts["day_from"] else yesterday
+            day_to = parse_date(opts["day_to"]) if opts["day_to"] else day_from
+        except ValueError:  # well formed but impossible, e.g. 2025-02-30
+            day_from = day_to = None
+        if not (day_from and day_to):
+            raise CommandError("--from and --to must be YYYY-MM-DD")
+        if day_from > day_to:
+            raise CommandError("--from must be on or before --to")
+
+        result = revalidate_attendance(day_from, day_to, employee_ids=opts["employees"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Geofences {day_from} to {day_to}: {result['checked']} rows checked, "
+            f"{result['updated']} updated, {result['outside']} outside every site"
+        ))
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from api.payroll import run_payroll
+
+
+class Command(BaseCommand):
+    help = "Generate payslips for every employee (or a department / employee set) for one period."
+
+    def add_arguments(self, parser):
+        parser.add_argument("period_from", help="YYYY-MM-DD")
+        parser.add_argument("period_to", help="YYYY-MM-DD")
+        parser.add_argument("--department", type=int, help="Department id to limit the run to")
+        parser.add_argument("--employee", type=int, action="append", dest="employees",
+                            help="Employee id (repeatable)")
+        parser.add_argument("--allow-duplicates", action="store_true",
+                            help="Create payslips even if the employee already has one for this period")
+
+    def handle(self, *args, **opts):
+        try:
+            period_from = parse_date(opts["period_from"])
+            period_to = parse_date(opts["period_to"])
+        except ValueError:  # well formed but impossible, e.g. 2025-02-30
+            period_from = period_to = None
+        if not (period_from and period_to):
+            raise CommandError("period_from and period_to must be YYYY-MM-DD")
+        if period_from > period_to:
+            raise CommandError("period_from must be on or before period_to")
+
+        summary = run_payroll(
+            period_from, period_to,
+            department_id=opts["department"],
+            employee_ids=opts["employees"],
+            skip_existing=not opts["allow_duplicates"],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Payroll {summary['period_from']} to {summary['period_to']}: "
+            f"{summary['created']} payslips created, {len(summary['skipped'])} skipped "
+            f"(gross {summary['gross_pay_total']}, net {summary['net_pay_total']})"
+        ))
@@ -0,0 +1,64 @@
+# Generated by Django 5.2.2 on 2026-10-17 01:38
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def merge_duplicate_attendance(apps, schema_editor):
+    """
+    Collapse duplicate (employee, date) rows before the unique constraint is
+    added. The oldest row is kept and its empty punch fields are filled from
+    the duplicates.
+    """
+    Attendance = apps.get_model('api', 'Attendance')
+    dupes = (
+        Attendance.objects.values('employee_id', 'date')
+        .annotate(n=Count('id')).filter(n__gt=1)
+    )
+    for d in dupes:
+        rows = list(Attendance.objects.filter(employee_id=d['employee_id'], date=d['date']).order_by('id'))
+        keep, extra = rows[0], rows[1:]
+        for other in extra:
+            for field in ('time_in', 'time_out', 'latitude', 'longitude', 'photo'):
+                if not getattr(keep, field) and getattr(other, field):
+                    setattr(keep, field, getattr(other, field))
+            keep.late_minutes = max(keep.late_minutes or 0, other.late_minutes or 0)
+        keep.save()
+        Attendance.objects.filter(pk__in=[r.pk for r in extra]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_auto_20250822_1308'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='appnotification',
+            index=models.Index(fields=['user', 'read', 'created_at'], name='notif_user_read_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['date'], name='attendance_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['timestamp'], name='auditlog_timestamp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='leaverequest',
+            index=models.Index(fields=['status', 'start_date', 'end_date'], name='leave_status_dates_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payslip',
+            index=models.Index(fields=['employee', 'period_to'], name='payslip_emp_period_to_idx'),
+        ),
+        migrations.RunPython(merge_duplicate_attendance, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='attendance',
+            constraint=models.UniqueConstraint(fields=('employee', 'date'), name='uniq_attendance_employee_date'),
+        ),
+    ]
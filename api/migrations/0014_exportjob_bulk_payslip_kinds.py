@@ -0,0 +1,18 @@
+# Generated by Django 5.2.2 on 2026-10-17 01:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_exportjob'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='exportjob',
+            name='kind',
+            field=models.CharField(choices=[('attendance_csv', 'Attendance CSV'), ('attendance_excel', 'Attendance Excel'), ('payslips_csv', 'Payslips CSV'), ('payslips_excel', 'Payslips Excel'), ('payslip_pdf', 'Payslip PDF'), ('payslips_pdf', 'Payslips PDF (one page each)'), ('payslips_zip', 'Payslips ZIP (one PDF each)')], max_length=30),
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.2 on 2026-10-17 01:52
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def drop_duplicate_tokens(apps, schema_editor):
+    """
+    A token can only belong to one device; when two accounts registered the
+    same token keep the most recently updated row.
+    """
+    PushToken = apps.get_model('api', 'PushToken')
+    dupes = PushToken.objects.values('expo_push_token').annotate(n=Count('id')).filter(n__gt=1)
+    for d in dupes:
+        rows = list(PushToken.objects.filter(expo_push_token=d['expo_push_token']).order_by('-updated_at', '-id'))
+        PushToken.objects.filter(pk__in=[r.pk for r in rows[1:]]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0016_outbox_receipts'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pushtoken',
+            name='device_id',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='pushtoken',
+            name='last_seen',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='pushtoken',
+            name='platform',
+            field=models.CharField(blank=True, choices=[('ios', 'iOS'), ('android', 'Android'), ('web', 'Web')], max_length=10),
+        ),
+        migrations.RunPython(drop_duplicate_tokens, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='pushtoken',
+            name='expo_push_token',
+            field=models.CharField(max_length=200, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='pushtoken',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='push_tokens', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
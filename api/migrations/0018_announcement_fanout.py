@@ -0,0 +1,67 @@
+# Generated by Django 5.2.2 on 2026-10-17 01:54
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def mark_existing_published(apps, schema_editor):
+    # Announcements made before fan-out existed are not sent retroactively.
+    Announcement = apps.get_model('api', 'Announcement')
+    Announcement.objects.update(fanout_status='Done')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0017_multi_device_push_tokens'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='announcement',
+            name='fanout_cursor',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='announcement',
+            name='fanout_error',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='announcement',
+            name='fanout_finished_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='announcement',
+            name='fanout_started_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='announcement',
+            name='fanout_status',
+            field=models.CharField(choices=[('Pending', 'Pending'), ('Running', 'Running'), ('Done', 'Done'), ('Failed', 'Failed')], default='Pending', max_length=20),
+        ),
+        migrations.RunPython(mark_existing_published, migrations.RunPython.noop),
+        migrations.AddField(
+            model_name='announcement',
+            name='recipients_done',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='announcement',
+            name='recipients_total',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='appnotification',
+            name='announcement',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='notifications', to='api.announcement'),
+        ),
+        migrations.AddConstraint(
+            model_name='appnotification',
+            constraint=models.UniqueConstraint(condition=models.Q(('announcement__isnull', False)), fields=('user', 'announcement'), name='uniq_notif_user_announcement'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.2 on 2026-10-17 02:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0019_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttendancePunch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64)),
+                ('kind', models.CharField(choices=[('in', 'Time in'), ('out', 'Time out')], max_length=3)),
+                ('punched_at', models.DateTimeField()),
+                ('latitude', models.DecimalField(blank=True, decimal_places=6, max_digits=9, null=True)),
+                ('longitude', models.DecimalField(blank=True, decimal_places=6, max_digits=9, null=True)),
+                ('photo_ref', models.CharField(blank=True, max_length=255)),
+                ('result', models.CharField(choices=[('applied', 'Applied'), ('superseded', 'Superseded'), ('rejected', 'Rejected')], max_length=20)),
+                ('error', models.CharField(blank=True, max_length=255)),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+                ('attendance', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='punches', to='api.attendance')),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='punches', to='api.employee')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('employee', 'key'), name='uniq_punch_employee_key')],
+            },
+        ),
+    ]
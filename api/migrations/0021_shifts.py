@@ -0,0 +1,42 @@
+# Generated by Django 5.2.2 on 2026-10-17 02:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0020_attendance_punch'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Shift',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('start_time', models.TimeField()),
+                ('end_time', models.TimeField()),
+                ('grace_minutes', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='attendance',
+            name='undertime_minutes',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='ShiftAssignment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start_date', models.DateField()),
+                ('end_date', models.DateField(blank=True, null=True)),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shift_assignments', to='api.employee')),
+                ('shift', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='assignments', to='api.shift')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['employee', 'start_date'], name='shiftassign_emp_start_idx')],
+            },
+        ),
+    ]
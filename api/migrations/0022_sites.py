@@ -0,0 +1,37 @@
+# Generated by Django 5.2.2 on 2026-10-17 02:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0021_shifts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attendance',
+            name='within_geofence',
+            field=models.BooleanField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='Site',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('latitude', models.DecimalField(decimal_places=6, max_digits=9)),
+                ('longitude', models.DecimalField(decimal_places=6, max_digits=9)),
+                ('radius_m', models.PositiveIntegerField(blank=True, null=True)),
+                ('polygon', models.JSONField(blank=True, null=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('employees', models.ManyToManyField(blank=True, related_name='sites', to='api.employee')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='attendance',
+            name='site',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='attendances', to='api.site'),
+        ),
+    ]
@@ -53,6 +53,47 @@ class Employee(models.Model):
         return (self.role or '').lower() == 'hr'
 
 
+class Shift(models.Model):
+    """A working schedule; an end at or before the start means it ends the next day."""
+    name = models.CharField(max_length=50, unique=True)
+    start_time = models.TimeField()
+    end_time = models.TimeField()
+    grace_minutes = models.IntegerField(default=0)  # time-ins up to this late still count as Present
+
+    def __str__(self):
+        return f"{self.name} ({self.start_time:%H:%M}-{self.end_time:%H:%M})"
+
+
+class ShiftAssignment(models.Model):
+    """Employee works `shift` from start_date until end_date (open-ended when null); the latest start wins."""
+    employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name='shift_assignments')
+    shift = models.ForeignKey(Shift, on_delete=models.CASCADE, related_name='assignments')
+    start_date = models.DateField()
+    end_date = models.DateField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['employee', 'start_date'], name='shiftassign_emp_start_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.employee_id} -> {self.shift_id} from {self.start_date}"
+
+
+class Site(models.Model):
+    """A work location; punches count as on site inside its radius around (latitude, longitude) or its polygon."""
+    name = models.CharField(max_length=100, unique=True)
+    latitude = models.DecimalField(max_digits=9, decimal_places=6)
+    longitude = models.DecimalField(max_digits=9, decimal_places=6)
+    radius_m = models.PositiveIntegerField(null=True, blank=True)  # circular geofence, metres
+    polygon = models.JSONField(null=True, blank=True)  # [[lat, lng], ...] geofence instead of a radius
+    employees = models.ManyToManyField(Employee, related_name='sites', blank=True)
+    is_active = models.BooleanField(default=True)
+
+    def __str__(self):
+        return self.name
+
+
 class Attendance(models.Model):
     employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name='attendances')
     date = models.DateField(default=timezone.localdate)
@@ -63,11 +104,58 @@ class Attendance(models.Model):
     longitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
     status = models.CharField(max_length=20, default="Present")  # Present, Absent, Late, etc.
     late_minutes = models.IntegerField(default=0)  # used for Late/Undertime deduction
+    undertime_minutes = models.IntegerField(default=0)  # left before shift end; deducted with late_minutes
+    site = models.ForeignKey(Site, on_delete=models.SET_NULL, null=True, blank=True, related_name='attendances')
+    within_geofence = models.BooleanField(null=True, blank=True)  # None: no coordinates or no assigned sites
+
+    class Meta:
+        constraints = [
+            # one row per employee per day; also serves as the (employee, date) index
+            models.UniqueConstraint(fields=['employee', 'date'], name='uniq_attendance_employee_date'),
+        ]
+        indexes = [
+            models.Index(fields=['date'], name='attendance_date_idx'),
+        ]
 
     def __str__(self):
         return f"{self.employee.full_name} - {self.date}"
 
 
+class AttendancePunch(models.Model):
+    """
+    One punch synced from the mobile app (api/punch_sync.py), kept so a
+    re-sent batch is answered from here instead of being applied twice.
+    """
+    IN = 'in'
+    OUT = 'out'
+    KIND_CHOICES = [(IN, 'Time in'), (OUT, 'Time out')]
+
+    APPLIED = 'applied'        # changed the attendance row
+    SUPERSEDED = 'superseded'  # valid, but an earlier time-in / later time-out is already recorded
+    REJECTED = 'rejected'
+    RESULT_CHOICES = [(APPLIED, 'Applied'), (SUPERSEDED, 'Superseded'), (REJECTED, 'Rejected')]
+
+    employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name='punches')
+    key = models.CharField(max_length=64)  # client-generated idempotency key
+    kind = models.CharField(max_length=3, choices=KIND_CHOICES)
+    punched_at = models.DateTimeField()    # device clock at the moment of the punch
+    latitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
+    longitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
+    photo_ref = models.CharField(max_length=255, blank=True)
+    attendance = models.ForeignKey(Attendance, on_delete=models.SET_NULL, null=True, blank=True, related_name='punches')
+    result = models.CharField(max_length=20, choices=RESULT_CHOICES)
+    error = models.CharField(max_length=255, blank=True)
+    received_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['employee', 'key'], name='uniq_punch_employee_key'),
+        ]
+
+    def __str__(self):
+        return f"{self.employee_id} {self.kind} @ {self.punched_at} ({self.result})"
+
+
 class Payroll(models.Model):
     employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name='payrolls')
     pay_period = models.CharField(max_length=20)  # e.g., "2025-07-15_to_2025-07-29"
@@ -119,6 +207,11 @@ class Payslip(models.Model):
     position_snapshot = models.CharField(max_length=100, blank=True)
     name_snapshot = models.CharField(max_length=100, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['employee', 'period_to'], name='payslip_emp_period_to_idx'),
+        ]
+
     def __str__(self):
         return f"{self.employee.full_name} Payslip ({self.period_from} to {self.period_to})"
 
@@ -148,24 +241,48 @@ class LeaveRequest(models.Model):
     remarks = models.TextField(blank=True, null=True)
     leave_type = models.ForeignKey(LeaveType, on_delete=models.CASCADE, null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'start_date', 'end_date'], name='leave_status_dates_idx'),
+        ]
+
     def __str__(self):
         return f"{self.employee.full_name} - {self.status} ({self.start_date} to {self.end_date})"
 
 
 class PushToken(models.Model):
-    user = models.OneToOneField(User, on_delete=models.CASCADE)
-    expo_push_token = models.CharField(max_length=200)
+    PLATFORM_CHOICES = [('ios', 'iOS'), ('android', 'Android'), ('web', 'Web')]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='push_tokens')
+    expo_push_token = models.CharField(max_length=200, unique=True)
+    device_id = models.CharField(max_length=100, blank=True)
+    platform = models.CharField(max_length=10, choices=PLATFORM_CHOICES, blank=True)
+    last_seen = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
-        return f"{self.user.username} token"
+        return f"{self.user.username} token ({self.platform or 'device'})"
 
 
 class Announcement(models.Model):
+    # Fan-out into AppNotification + push outbox rows (api/outbox.py)
+    PENDING = 'Pending'
+    RUNNING = 'Running'
+    DONE = 'Done'
+    FAILED = 'Failed'
+    FANOUT_STATUS_CHOICES = [(PENDING, 'Pending'), (RUNNING, 'Running'), (DONE, 'Done'), (FAILED, 'Failed')]
+
     title = models.CharField(max_length=200)
     message = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
     created_by = models.ForeignKey('auth.User', on_delete=models.SET_NULL, null=True, blank=True)
+    fanout_status = models.CharField(max_length=20, choices=FANOUT_STATUS_CHOICES, default=PENDING)
+    fanout_cursor = models.IntegerField(default=0)  # last user id notified; a retried fan-out resumes after it
+    recipients_total = models.IntegerField(default=0)
+    recipients_done = models.IntegerField(default=0)
+    fanout_started_at = models.DateTimeField(null=True, blank=True)
+    fanout_finished_at = models.DateTimeField(null=True, blank=True)
+    fanout_error = models.TextField(blank=True)
 
     def __str__(self):
         return self.title
@@ -179,9 +296,20 @@ class AppNotification(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     read = models.BooleanField(default=False)
     type = models.CharField(max_length=50, default='info')
+    announcement = models.ForeignKey(Announcement, on_delete=models.CASCADE, null=True, blank=True,
+                                     related_name='notifications')
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', 'read', 'created_at'], name='notif_user_read_created_idx'),
+            models.Index(fields=['user', 'created_at', 'id'], name='notif_user_created_id_idx'),  # keyset pages
+        ]
+        constraints = [
+            # Makes a retried announcement fan-out a no-op for users already notified
+            models.UniqueConstraint(fields=['user', 'announcement'], condition=models.Q(announcement__isnull=False),
+                                    name='uniq_notif_user_announcement'),
+        ]
 
     def __str__(self):
         return f"{self.title} → {self.user.username}"
@@ -193,6 +321,11 @@ class AuditLog(models.Model):
     timestamp = models.DateTimeField(auto_now_add=True)
     details = models.JSONField(default=dict)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['timestamp', 'id'], name='auditlog_timestamp_id_idx'),  # keyset pages
+        ]
+
     def __str__(self):
         return f"{self.timestamp} - {self.user} - {self.action}"
 
@@ -206,3 +339,82 @@ class UserInvitation(models.Model):
 
     def __str__(self):
         return f"Invite to {self.email} (accepted: {self.accepted})"
+
+
+class ExportJob(models.Model):
+    PENDING = 'Pending'
+    RUNNING = 'Running'
+    DONE = 'Done'
+    FAILED = 'Failed'
+    STATUS_CHOICES = [(PENDING, 'Pending'), (RUNNING, 'Running'), (DONE, 'Done'), (FAILED, 'Failed')]
+
+    KIND_CHOICES = [
+        ('attendance_csv', 'Attendance CSV'),
+        ('attendance_excel', 'Attendance Excel'),
+        ('payslips_csv', 'Payslips CSV'),
+        ('payslips_excel', 'Payslips Excel'),
+        ('payslip_pdf', 'Payslip PDF'),
+        ('payslips_pdf', 'Payslips PDF (one page each)'),
+        ('payslips_zip', 'Payslips ZIP (one PDF each)'),
+    ]
+
+    requested_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='export_jobs')
+    kind = models.CharField(max_length=30, choices=KIND_CHOICES)
+    params = models.JSONField(default=dict)  # filters/scope captured at submit time
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PENDING)
+    file = models.FileField(upload_to='exports/', null=True, blank=True)
+    error = models.TextField(blank=True)
+    attempts = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='exportjob_status_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.pk} ({self.status})"
+
+
+class NotificationOutbox(models.Model):
+    PENDING = 'Pending'
+    SENDING = 'Sending'
+    SENT = 'Sent'            # accepted by Expo, receipt not fetched yet
+    DELIVERED = 'Delivered'  # receipt ok
+    FAILED = 'Failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'), (SENDING, 'Sending'), (SENT, 'Sent'), (DELIVERED, 'Delivered'), (FAILED, 'Failed'),
+    ]
+
+    PUSH = 'push'
+    IN_APP = 'in_app'
+    CHANNEL_CHOICES = [(PUSH, 'Push'), (IN_APP, 'In-app')]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='outbox')
+    channel = models.CharField(max_length=10, choices=CHANNEL_CHOICES, default=PUSH)
+    token = models.CharField(max_length=200, blank=True)  # Expo token, push rows only
+    title = models.CharField(max_length=120)
+    body = models.TextField()
+    data = models.JSONField(default=dict, blank=True)
+    link = models.CharField(max_length=255, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.IntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    ticket_id = models.CharField(max_length=100, blank=True)  # Expo push ticket id
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_status_next_idx'),
+            models.Index(fields=['status', 'sent_at'], name='outbox_status_sent_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.channel} #{self.pk} ({self.status})"
@@ -0,0 +1,49 @@
+# api/notifications.py
+import logging
+from typing import Iterable
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import AppNotification
+
+logger = logging.getLogger(__name__)
+
+__all__ = ["unread_count", "invalidate_unread_count", "invalidate_unread_count_for"]
+
+CACHE_KEY = "notif_unread:{user_id}"
+CACHE_TTL = getattr(settings, "UNREAD_COUNT_CACHE_TTL", 30)  # seconds
+
+
+def unread_count(user_id: int) -> int:
+    """
+    Unread AppNotification count for the badge: a cache hit, or one COUNT
+    served by the (user, read, created_at) index.
+
+    Writes drop the entry, but only in the cache the writer can see. With a
+    shared cache (REDIS_URL) that is every process. With the per-process
+    default, notifications created elsewhere (the notification_worker fan-out,
+    another web worker) show up in this process's count up to CACHE_TTL
+    seconds late.
+    """
+    key = CACHE_KEY.format(user_id=user_id)
+    n = cache.get(key)
+    if n is None:
+        n = AppNotification.objects.filter(user_id=user_id, read=False).count()
+        cache.set(key, n, CACHE_TTL)
+    return n
+
+
+def invalidate_unread_count(user_ids: Iterable[int]) -> None:
+    """
+    Drop cached counters. Bulk writers (bulk_create / update, which send no
+    signals) call this with the users they touched.
+    """
+    keys = [CACHE_KEY.format(user_id=uid) for uid in set(user_ids) if uid]
+    if keys:
+        cache.delete_many(keys)
+
+
+def invalidate_unread_count_for(sender, instance, **kwargs) -> None:
+    """Signal receiver for single-row saves and deletes."""
+    invalidate_unread_count([instance.user_id])
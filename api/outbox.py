@@ -0,0 +1,433 @@
+# api/outbox.py
+"""
+Notification outbox.
+
+Views only insert NotificationOutbox rows (one per push token / in-app
+recipient); `manage.py notification_worker` claims due rows with
+SELECT ... FOR UPDATE SKIP LOCKED, so any number of workers can drain the
+table side by side, delivers them in Expo-sized batches and records the
+per-token result. Transient failures are rescheduled with exponential
+backoff instead of sleeping inside a request.
+
+Expo only reports whether a device is still registered in the push
+*receipt*, available some minutes after sending. poll_receipts() leases
+Sent rows, fetches their receipts in bulk outside any transaction, marks
+the rows Delivered/Failed and deletes
+PushToken rows whose device is gone, so later broadcasts only go to live
+devices.
+
+Announcements fan out from the same worker: recipients are walked in user
+id order, FANOUT_CHUNK at a time, and each chunk's AppNotification rows,
+push rows and progress cursor are committed together, so a retried
+fan-out resumes where it stopped instead of notifying anyone twice.
+"""
+import logging
+import random
+from datetime import timedelta
+from typing import Dict, Iterable, List, Optional
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from .models import Announcement, AppNotification, NotificationOutbox, PushToken
+from .notifications import invalidate_unread_count
+from .push_notifications import _looks_like_expo_token, build_message, get_receipts, send_messages
+
+logger = logging.getLogger(__name__)
+
+__all__ = [
+    "enqueue_push", "enqueue_notification", "broadcast_recipients", "enqueue_broadcast",
+    "claim_batch", "deliver_batch", "poll_receipts", "prune_tokens", "delivery_stats",
+    "claim_announcement", "fanout_announcement",
+]
+
+ENQUEUE_PAGE = 1000          # outbox rows inserted per statement
+BATCH_SIZE = getattr(settings, "NOTIFICATION_OUTBOX_BATCH", 500)       # rows claimed per worker pass
+MAX_ATTEMPTS = getattr(settings, "NOTIFICATION_OUTBOX_MAX_ATTEMPTS", 5)
+CLAIM_TIMEOUT = getattr(settings, "NOTIFICATION_OUTBOX_CLAIM_TIMEOUT", 5 * 60)  # seconds before a Sending row is reclaimed
+RECEIPT_DELAY = getattr(settings, "PUSH_RECEIPT_DELAY", 15 * 60)     # seconds after sending before receipts are fetched
+RECEIPT_TTL = 24 * 60 * 60   # Expo keeps receipts for a day
+RECEIPT_BATCH = 5000         # Sent rows checked per poll
+FANOUT_CHUNK = getattr(settings, "ANNOUNCEMENT_FANOUT_CHUNK", 1000)  # recipients per fan-out transaction
+RETRY_BASE = 30          # seconds; attempt n is retried after up to RETRY_BASE * 2**n (full jitter)
+RETRY_CAP = 60 * 60
+
+# Expo ticket errors that are worth another try; anything else
+# (DeviceNotRegistered, MessageTooBig, InvalidCredentials) is final.
+RETRYABLE_ERRORS = {"MessageRateExceeded"}
+DEAD_TOKEN_ERROR = "DeviceNotRegistered"
+
+
+# ---- Enqueue ----
+def enqueue_push(
+    recipients: Iterable,
+    title: str,
+    body: str,
+    *,
+    data: Optional[Dict] = None,
+    link: str = "",
+    page_size: int = ENQUEUE_PAGE,
+) -> int:
+    """
+    Queue push rows for (user_id, token) pairs, inserting them a page at a
+    time so a company-wide broadcast never holds every recipient in memory.
+    Duplicate tokens are skipped within a page; callers pass PushToken rows,
+    whose tokens are unique, so pages don't overlap. Returns the number of
+    rows queued.
+    """
+    data = data or {}
+    seen = set()
+    page: List[NotificationOutbox] = []
+    queued = 0
+    for uid, token in recipients:
+        if not token or token in seen:
+            continue
+        seen.add(token)
+        page.append(NotificationOutbox(user_id=uid, channel=NotificationOutbox.PUSH, token=token,
+                                       title=title, body=body, data=data, link=link))
+        if len(page) >= page_size:
+            NotificationOutbox.objects.bulk_create(page)
+            queued += len(page)
+            page = []
+            seen.clear()
+    if page:
+        NotificationOutbox.objects.bulk_create(page)
+        queued += len(page)
+    return queued
+
+
+def enqueue_notification(
+    user_ids: Iterable[int],
+    title: str,
+    body: str,
+    *,
+    data: Optional[Dict] = None,
+    link: str = "",
+    push: bool = True,
+    in_app: bool = False,
+) -> Dict[str, int]:
+    """
+    Queue a notification for users. Push rows are created per registered
+    device token, in-app rows per user. Returns {"push": n, "in_app": n}.
+    """
+    user_ids = list(dict.fromkeys(user_ids))
+    pushed = 0
+    if push:
+        tokens = PushToken.objects.filter(user_id__in=user_ids).values_list("user_id", "expo_push_token")
+        pushed = enqueue_push(tokens.iterator(), title, body, data=data, link=link)
+    rows = []
+    if in_app:
+        rows = [
+            NotificationOutbox(user_id=uid, channel=NotificationOutbox.IN_APP,
+                               title=title, body=body, data=data or {}, link=link)
+            for uid in user_ids
+        ]
+        NotificationOutbox.objects.bulk_create(rows, batch_size=ENQUEUE_PAGE)
+    return {"push": pushed, "in_app": len(rows)}
+
+
+def broadcast_recipients(*, department_id=None, role: Optional[str] = None):
+    """
+    (user_id, token) pairs for every registered device of employees in the
+    given department and/or role (all employees when neither is given),
+    resolved in a single query.
+    """
+    qs = PushToken.objects.filter(user__employee__isnull=False)
+    if department_id:
+        qs = qs.filter(user__employee__department_id=department_id)
+    if role:
+        qs = qs.filter(user__employee__role__iexact=role)
+    return qs.order_by("pk").values_list("user_id", "expo_push_token")
+
+
+def enqueue_broadcast(title: str, body: str, *, data: Optional[Dict] = None, department_id=None,
+                      role: Optional[str] = None) -> int:
+    recipients = broadcast_recipients(department_id=department_id, role=role)
+    return enqueue_push(recipients.iterator(chunk_size=ENQUEUE_PAGE), title, body, data=data)
+
+
+# ---- Claim ----
+def claim_batch(limit: int = BATCH_SIZE) -> List[NotificationOutbox]:
+    """
+    Atomically take up to `limit` due rows (Pending with next_attempt_at
+    reached, or Sending rows whose worker died) and mark them Sending.
+    """
+    now = timezone.now()
+    due = Q(status=NotificationOutbox.PENDING, next_attempt_at__lte=now) | Q(
+        status=NotificationOutbox.SENDING, claimed_at__lt=now - timedelta(seconds=CLAIM_TIMEOUT)
+    )
+    with transaction.atomic():
+        ids = list(
+            NotificationOutbox.objects.select_for_update(skip_locked=True)
+            .filter(due)
+            .order_by("next_attempt_at")
+            .values_list("pk", flat=True)[:limit]
+        )
+        if not ids:
+            return []
+        NotificationOutbox.objects.filter(pk__in=ids).update(
+            status=NotificationOutbox.SENDING, claimed_at=now, attempts=F("attempts") + 1,
+        )
+    return list(NotificationOutbox.objects.filter(pk__in=ids).order_by("pk"))
+
+
+# ---- Deliver ----
+def _retry_delay(attempt: int) -> timedelta:
+    return timedelta(seconds=random.uniform(RETRY_BASE, min(RETRY_CAP, RETRY_BASE * (2 ** attempt))))
+
+
+def _mark_failed(row: NotificationOutbox, error: str, now, *, retryable: bool) -> None:
+    row.error = error
+    if retryable and row.attempts < MAX_ATTEMPTS:
+        row.status = NotificationOutbox.PENDING
+        row.next_attempt_at = now + _retry_delay(row.attempts)
+    else:
+        row.status = NotificationOutbox.FAILED
+
+
+def deliver_batch(rows: List[NotificationOutbox], *, endpoint: Optional[str] = None) -> Dict[str, int]:
+    """
+    Deliver claimed rows and persist each row's outcome.
+    Returns {"sent": n, "retry": n, "failed": n, "pruned": n}.
+    """
+    now = timezone.now()
+    dead = set()
+
+    in_app = [r for r in rows if r.channel == NotificationOutbox.IN_APP]
+    if in_app:
+        AppNotification.objects.bulk_create([
+            AppNotification(user_id=r.user_id, title=r.title, body=r.body, link=r.link or None)
+            for r in in_app if r.user_id
+        ])
+        invalidate_unread_count(r.user_id for r in in_app)
+        for r in in_app:
+            r.status, r.sent_at, r.error = NotificationOutbox.DELIVERED, now, ""
+
+    push = []
+    for r in rows:
+        if r.channel != NotificationOutbox.PUSH:
+            continue
+        if _looks_like_expo_token(r.token):
+            push.append(r)
+        else:
+            _mark_failed(r, "invalid_token_format", now, retryable=False)
+
+    if push:
+        # No in-process retries: a failed batch goes back to the table with a
+        # backoff and the worker moves on to other rows.
+        messages = [build_message(r.token, r.title, r.body, data=r.data) for r in push]
+        tickets = send_messages(messages, endpoint=endpoint, retries=0)["tickets"]
+        for r, ticket in zip(push, tickets):
+            if ticket.get("status") == "ok":
+                r.status, r.sent_at, r.error = NotificationOutbox.SENT, now, ""
+                r.ticket_id = ticket.get("id") or ""
+                continue
+            details = ticket.get("details") or {}
+            code = details.get("error") if isinstance(details, dict) else None
+            if code == DEAD_TOKEN_ERROR:
+                dead.add(r.token)
+            _mark_failed(r, code or ticket.get("message") or "expo_status_error", now,
+                         retryable=bool(ticket.get("transport")) or code in RETRYABLE_ERRORS)
+
+    NotificationOutbox.objects.bulk_update(
+        rows, ["status", "sent_at", "error", "ticket_id", "next_attempt_at"], batch_size=1000,
+    )
+    counts = {"sent": 0, "retry": 0, "failed": 0, "pruned": prune_tokens(dead)}
+    for r in rows:
+        key = {
+            NotificationOutbox.SENT: "sent", NotificationOutbox.DELIVERED: "sent", NotificationOutbox.PENDING: "retry",
+        }.get(r.status, "failed")
+        counts[key] += 1
+    if counts["failed"] or counts["retry"]:
+        logger.info("Outbox batch: %s", counts)
+    return counts
+
+
+# ---- Receipts ----
+def _claim_receipt_rows(limit: int, now) -> List[NotificationOutbox]:
+    """
+    Lease Sent rows whose receipts are due, then commit. A Sent row's
+    next_attempt_at is no longer needed for sending, so it serves as the
+    lease: other pollers skip the rows until CLAIM_TIMEOUT passes, and no
+    lock is held while Expo is asked for the receipts.
+    """
+    with transaction.atomic():
+        ids = list(
+            NotificationOutbox.objects.select_for_update(skip_locked=True)
+            .filter(
+                channel=NotificationOutbox.PUSH, status=NotificationOutbox.SENT, next_attempt_at__lte=now,
+                sent_at__lte=now - timedelta(seconds=RECEIPT_DELAY),
+                sent_at__gte=now - timedelta(seconds=RECEIPT_TTL),
+            )
+            .exclude(ticket_id="")
+            .order_by("sent_at")
+            .values_list("pk", flat=True)[:limit]
+        )
+        if not ids:
+            return []
+        NotificationOutbox.objects.filter(pk__in=ids).update(next_attempt_at=now + timedelta(seconds=CLAIM_TIMEOUT))
+    return list(NotificationOutbox.objects.filter(pk__in=ids).only("pk", "token", "ticket_id", "status", "error"))
+
+
+def poll_receipts(limit: int = RECEIPT_BATCH, *, endpoint: Optional[str] = None) -> Dict[str, int]:
+    """
+    Fetch receipts for Sent push rows older than RECEIPT_DELAY and settle
+    them as Delivered or Failed; tokens reported DeviceNotRegistered are
+    pruned. Rows Expo has no receipt for yet stay Sent for a later poll;
+    rows still Sent once Expo has dropped their receipts (RECEIPT_TTL) are
+    failed as "receipt_expired".
+
+    Rows are leased and committed first, the receipts are fetched outside
+    any transaction, and the results are written in a second short one.
+    Returns {"checked": n, "delivered": n, "failed": n, "pruned": n, "expired": n}.
+    """
+    now = timezone.now()
+    counts = {"checked": 0, "delivered": 0, "failed": 0, "pruned": 0}
+    counts["expired"] = NotificationOutbox.objects.filter(
+        channel=NotificationOutbox.PUSH, status=NotificationOutbox.SENT,
+        sent_at__lt=now - timedelta(seconds=RECEIPT_TTL),
+    ).update(status=NotificationOutbox.FAILED, error="receipt_expired")
+
+    rows = _claim_receipt_rows(limit, now)
+    if not rows:
+        return counts
+    receipts = get_receipts([r.ticket_id for r in rows], endpoint=endpoint)
+
+    dead, settled = set(), []
+    for r in rows:
+        receipt = receipts.get(r.ticket_id)
+        if receipt is None:
+            continue
+        if receipt.get("status") == "ok":
+            r.status = NotificationOutbox.DELIVERED
+            counts["delivered"] += 1
+        else:
+            details = receipt.get("details") or {}
+            code = details.get("error") if isinstance(details, dict) else None
+            r.status = NotificationOutbox.FAILED
+            r.error = code or receipt.get("message") or "receipt_error"
+            counts["failed"] += 1
+            if code == DEAD_TOKEN_ERROR:
+                dead.add(r.token)
+        settled.append(r)
+    with transaction.atomic():
+        NotificationOutbox.objects.bulk_update(settled, ["status", "error"], batch_size=1000)
+    counts["checked"] = len(rows)
+    counts["pruned"] = prune_tokens(dead)
+    return counts
+
+
+def prune_tokens(tokens: Iterable[str]) -> int:
+    """
+    Delete PushToken rows for devices Expo reported as gone and fail any
+    rows still queued for them. Returns the number of tokens removed.
+    """
+    tokens = list(tokens)
+    if not tokens:
+        return 0
+    NotificationOutbox.objects.filter(
+        token__in=tokens, status=NotificationOutbox.PENDING,
+    ).update(status=NotificationOutbox.FAILED, error=DEAD_TOKEN_ERROR)
+    removed, _ = PushToken.objects.filter(expo_push_token__in=tokens).delete()
+    if removed:
+        logger.info("Pruned %s dead push token(s)", removed)
+    return removed
+
+
+def delivery_stats() -> Dict[str, int]:
+    """Push outbox rows per status, plus live and pruned token counts."""
+    by_status = dict(
+        NotificationOutbox.objects.filter(channel=NotificationOutbox.PUSH)
+        .values_list("status").annotate(n=Count("id")).values_list("status", "n")
+    )
+    stats = {status.lower(): by_status.get(status, 0) for status, _ in NotificationOutbox.STATUS_CHOICES}
+    stats["pruned_tokens"] = (
+        NotificationOutbox.objects.filter(error=DEAD_TOKEN_ERROR).values("token").distinct().count()
+    )
+    stats["live_tokens"] = PushToken.objects.count()
+    return stats
+
+
+# ---- Announcement fan-out ----
+def _announcement_recipients():
+    return User.objects.filter(is_active=True, employee__isnull=False)
+
+
+def claim_announcement() -> Optional[Announcement]:
+    """
+    Take the oldest announcement waiting for fan-out (or one whose worker
+    has not finished a chunk for CLAIM_TIMEOUT seconds) and mark it Running.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        ann = (
+            Announcement.objects.select_for_update(skip_locked=True)
+            .filter(Q(fanout_status=Announcement.PENDING) | Q(
+                fanout_status=Announcement.RUNNING, fanout_started_at__lt=now - timedelta(seconds=CLAIM_TIMEOUT)))
+            .order_by("created_at")
+            .first()
+        )
+        if ann is None:
+            return None
+        ann.fanout_status = Announcement.RUNNING
+        ann.fanout_started_at = now
+        ann.fanout_error = ""
+        if not ann.fanout_cursor:
+            ann.recipients_total = _announcement_recipients().count()
+        ann.save(update_fields=["fanout_status", "fanout_started_at", "fanout_error", "recipients_total"])
+    return ann
+
+
+def fanout_announcement(ann: Announcement, *, chunk: int = FANOUT_CHUNK) -> Announcement:
+    """
+    Notify every active employee of `ann`: one AppNotification per user and
+    a push row per registered device. Each chunk costs a handful of
+    statements (recipient ids, notification INSERT, token lookup, outbox
+    INSERT, progress UPDATE) regardless of its size.
+    """
+    data = {"announcement_id": ann.pk}
+    try:
+        while True:
+            with transaction.atomic():
+                user_ids = list(
+                    _announcement_recipients().filter(pk__gt=ann.fanout_cursor)
+                    .order_by("pk").values_list("pk", flat=True)[:chunk]
+                )
+                if not user_ids:
+                    break
+                AppNotification.objects.bulk_create(
+                    [AppNotification(user_id=uid, title=ann.title, body=ann.message, type="announcement",
+                                     announcement=ann) for uid in user_ids],
+                    ignore_conflicts=True,  # rows left by an interrupted run
+                )
+                # after COMMIT, or a reader could re-cache the pre-insert count
+                transaction.on_commit(lambda ids=user_ids: invalidate_unread_count(ids))
+                tokens = PushToken.objects.filter(user_id__in=user_ids).values_list("user_id", "expo_push_token")
+                enqueue_push(tokens.iterator(), ann.title, ann.message, data=data)
+                ann.fanout_cursor = user_ids[-1]
+                ann.recipients_done += len(user_ids)
+                # Guarded by fanout_started_at: a reclaimed run's old worker stops here.
+                # Moving it forward is the heartbeat that keeps a long fan-out from
+                # looking dead to claim_announcement after CLAIM_TIMEOUT.
+                heartbeat = timezone.now()
+                updated = Announcement.objects.filter(pk=ann.pk, fanout_started_at=ann.fanout_started_at).update(
+                    fanout_cursor=ann.fanout_cursor, recipients_done=ann.recipients_done, fanout_started_at=heartbeat,
+                )
+                if not updated:
+                    raise RuntimeError("Fan-out was taken over by another worker")
+                ann.fanout_started_at = heartbeat
+        ann.fanout_status = Announcement.DONE
+        ann.recipients_total = max(ann.recipients_total, ann.recipients_done)
+        ann.fanout_finished_at = timezone.now()
+        ann.save(update_fields=["fanout_status", "recipients_total", "fanout_finished_at"])
+    except Exception as e:
+        logger.exception("Fan-out of announcement %s failed", ann.pk)
+        ann.fanout_status = Announcement.FAILED
+        ann.fanout_error = str(e) or e.__class__.__name__
+        Announcement.objects.filter(pk=ann.pk, fanout_started_at=ann.fanout_started_at).update(
+            fanout_status=ann.fanout_status, fanout_error=ann.fanout_error,
+        )
+    return ann
@@ -0,0 +1,164 @@
+# api/pagination.py
+import base64
+import json
+from collections import OrderedDict
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+__all__ = ["KeysetPagination"]
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination on a unique compound key, e.g. ('-timestamp', '-id').
+
+    Each page is `WHERE (timestamp, id) < (last row) ORDER BY ... LIMIT n`,
+    so page 10,000 costs the same index range scan as page 1: no OFFSET and
+    no COUNT(*). Views choose the key with `keyset_ordering` (the last field
+    must be unique, normally the pk) and may override `page_size`. The key
+    is the only ordering, so such views don't take `?ordering=`.
+
+    Response: {"count": null, "next": url|null, "previous": url|null,
+    "results": [...]}, the same keys as page-number responses. `count` is
+    always null since the total would need the COUNT(*) this avoids; clients
+    should page on `next` rather than on the total.
+    """
+    ordering = ("-created_at", "-id")
+    page_size = api_settings.PAGE_SIZE or 10
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.fields = tuple(getattr(view, "keyset_ordering", self.ordering))
+        self.page_size = self.get_page_size(request, view)
+        cursor = self.decode_cursor(request)
+
+        reverse = bool(cursor and cursor["r"])
+        order = [self._flip(f) for f in self.fields] if reverse else list(self.fields)
+        qs = queryset.order_by(*order)
+        if cursor:
+            qs = qs.filter(self._after(order, self._parse_values(queryset.model, cursor["v"])))
+        rows = list(qs[: self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[: self.page_size]
+        if reverse:
+            rows.reverse()
+
+        # Walking forward there is a previous page whenever we started from a
+        # cursor; walking backward there is always a next page.
+        self.has_next = has_more if not reverse else True
+        self.has_previous = bool(cursor) if not reverse else has_more
+        self.first, self.last = (rows[0], rows[-1]) if rows else (None, None)
+        return rows
+
+    def get_page_size(self, request, view=None):
+        size = getattr(view, "page_size", None) or self.page_size
+        raw = request.query_params.get(self.page_size_query_param)
+        if raw:
+            try:
+                size = int(raw)
+            except ValueError:
+                pass
+        return max(1, min(size, self.max_page_size))
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ("count", None),
+            ("next", self.get_next_link()),
+            ("previous", self.get_previous_link()),
+            ("results", data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "count": {"type": "integer", "nullable": True},
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+    # ---- Links ----
+    def get_next_link(self):
+        if not (self.has_next and self.last is not None):
+            return None
+        return self._link(self.last, reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if self.first is None:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self._link(self.first, reverse=True)
+
+    def _link(self, row, *, reverse):
+        values = [self._attr(row, f.lstrip("-")) for f in self.fields]
+        return replace_query_param(self.base_url, self.cursor_query_param, self.encode_cursor(values, reverse))
+
+    # ---- Cursor encoding ----
+    @staticmethod
+    def encode_cursor(values, reverse=False) -> str:
+        raw = json.dumps({"v": [v.isoformat() if hasattr(v, "isoformat") else v for v in values], "r": int(reverse)})
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            raw = base64.urlsafe_b64decode(encoded + "=" * (-len(encoded) % 4))
+            cursor = json.loads(raw)
+            if not isinstance(cursor.get("v"), list) or len(cursor["v"]) != len(self.fields):
+                raise ValueError
+            return cursor
+        except (ValueError, TypeError, AttributeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def _parse_values(self, model, values):
+        out = []
+        for f, v in zip(self.fields, values):
+            field = model._meta.get_field(f.lstrip("-"))
+            try:
+                out.append(field.to_python(v))
+            except Exception:
+                raise NotFound(self.invalid_cursor_message)
+        return out
+
+    # ---- Keyset predicate ----
+    @staticmethod
+    def _flip(field):
+        return field[1:] if field.startswith("-") else f"-{field}"
+
+    @staticmethod
+    def _attr(row, name):
+        return getattr(row, "pk" if name == "id" else name)
+
+    @staticmethod
+    def _after(order, values):
+        """
+        Rows strictly after `values` in `order`, expanded lexicographically:
+        a <= x AND ((a < x) OR (a = x AND b < y)) for ('-a', '-b'). The
+        leading bound on `a` is redundant but lets the planner start an
+        index range scan at the cursor instead of filtering the whole index.
+        """
+        q = Q()
+        for i, f in enumerate(order):
+            name = f.lstrip("-")
+            step = Q(**{f"{name}__{'lt' if f.startswith('-') else 'gt'}": values[i]})
+            for prev, v in zip(order[:i], values[:i]):
+                step &= Q(**{prev.lstrip("-"): v})
+            q |= step
+        first = order[0]
+        return Q(**{f"{first.lstrip('-')}__{'lte' if first.startswith('-') else 'gte'}": values[0]}) & q
@@ -0,0 +1,146 @@
+# api/payroll.py
+import logging
+from decimal import Decimal
+from typing import Any, Dict, Iterable, Optional
+
+from django.db import transaction
+from django.db.models import Count, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .dashboard import invalidate_dashboard_stats
+from .models import Attendance, Employee, Payslip
+from .utils import LATE_UNDERTIME, WORKED_DAY, payroll_totals
+
+logger = logging.getLogger(__name__)
+
+__all__ = ["run_payroll", "attendance_totals_by_employee"]
+
+BULK_BATCH = 500
+
+
+def attendance_totals_by_employee(period_from, period_to, employee_ids: Iterable[int]) -> Dict[int, Dict[str, int]]:
+    """
+    One grouped query: {employee_id: {"days_worked": int, "late_minutes": int}},
+    where late_minutes includes undertime.
+    Employees without attendance in the period are absent from the result.
+    """
+    rows = (
+        Attendance.objects
+        .filter(employee_id__in=list(employee_ids), date__gte=period_from, date__lte=period_to)
+        .order_by()
+        .values("employee_id")
+        .annotate(
+            days_worked=Count("id", filter=WORKED_DAY),
+            late_minutes=Coalesce(Sum(LATE_UNDERTIME), Value(0)),
+        )
+    )
+    return {
+        r["employee_id"]: {"days_worked": r["days_worked"], "late_minutes": r["late_minutes"]}
+        for r in rows
+    }
+
+
+def run_payroll(
+    period_from,
+    period_to,
+    *,
+    department_id: Optional[int] = None,
+    employee_ids: Optional[Iterable[int]] = None,
+    skip_existing: bool = True,
+    overtime_pay: Any = 0,
+    allowance: Any = 0,
+    late_rate_per_minute: Any = 10,
+    sss: Any = 400,
+    hdmf: Any = 100,
+    phic: Any = 200,
+    tax: Any = 0,
+) -> Dict[str, Any]:
+    """
+    Generate payslips for every employee in scope for one period.
+
+    Reads employees and their aggregated attendance in two queries, computes
+    all payslips in memory and writes them with bulk_create in a single
+    transaction.
+
+    Returns a run summary:
+        {
+          "period_from": ..., "period_to": ...,
+          "employees": int,       # employees in scope
+          "created": int,         # payslips written
+          "skipped": [ids],       # already had a payslip for this exact period
+          "gross_pay_total": Decimal, "net_pay_total": Decimal,
+        }
+    """
+    employees = Employee.objects.all()
+    if department_id:
+        employees = employees.filter(department_id=department_id)
+    if employee_ids is not None:
+        employees = employees.filter(pk__in=list(employee_ids))
+    employees = list(
+        employees.only("id", "full_name", "position", "employee_id_no", "daily_rate").order_by("id")
+    )
+    ids = [e.id for e in employees]
+
+    skipped = []
+    if skip_existing and ids:
+        existing = set(
+            Payslip.objects
+            .filter(employee_id__in=ids, period_from=period_from, period_to=period_to)
+            .values_list("employee_id", flat=True)
+        )
+        skipped = [i for i in ids if i in existing]
+        employees = [e for e in employees if e.id not in existing]
+
+    totals = attendance_totals_by_employee(period_from, period_to, [e.id for e in employees])
+
+    payslips = []
+    gross_total = Decimal("0")
+    net_total = Decimal("0")
+    for e in employees:
+        t = totals.get(e.id, {"days_worked": 0, "late_minutes": 0})
+        p = payroll_totals(
+            t["days_worked"], t["late_minutes"], e.daily_rate,
+            overtime_pay=overtime_pay, allowance=allowance, late_rate_per_minute=late_rate_per_minute,
+            sss=sss, hdmf=hdmf, phic=phic, tax=tax,
+        )
+        payslips.append(Payslip(
+            employee_id=e.id,
+            period_from=period_from,
+            period_to=period_to,
+            daily_rate=e.daily_rate or 0,
+            days_worked=p["days_worked"],
+            overtime_pay=p["overtime_pay"],
+            allowance=p["allowance"],
+            late_undertime=p["late_undertime"],
+            sss=p["sss"],
+            sss_mpf=p["sss_mpf"],
+            hdmf=p["hdmf"],
+            phic=p["phic"],
+            tax=p["tax"],
+            sss_loan=p["sss_loan"],
+            hdmf_loan=p["hdmf_loan"],
+            cash_advance=p["cash_advance"],
+            gross_pay=p["gross_pay"],
+            total_deductions=p["total_deductions"],
+            net_pay=p["net_pay"],
+            employee_id_no=e.employee_id_no,
+            position_snapshot=e.position or "",
+            name_snapshot=e.full_name or "",
+        ))
+        gross_total += p["gross_pay"]
+        net_total += p["net_pay"]
+
+    with transaction.atomic():
+        Payslip.objects.bulk_create(payslips, batch_size=BULK_BATCH)
+        transaction.on_commit(invalidate_dashboard_stats)  # bulk_create sends no post_save
+
+    logger.info("Payroll run %s..%s: %s payslips, %s skipped", period_from, period_to, len(payslips), len(skipped))
+    return {
+        "period_from": str(period_from),
+        "period_to": str(period_to),
+        "employees": len(ids),
+        "created": len(payslips),
+        "skipped": skipped,
+        "gross_pay_total": gross_total,
+        "net_pay_total": net_total,
+    }
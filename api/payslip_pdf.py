@@ -0,0 +1,304 @@
+# api/payslip_pdf.py
+import glob
+import hashlib
+import io
+import json
+import os
+import tempfile
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Sequence, Tuple
+
+from django.conf import settings
+from django.db import connections
+from pypdf import PdfWriter
+
+from .models import Payslip
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+
+__all__ = [
+    "draw_payslip", "write_payslip_pdf", "payslip_filename",
+    "payslips_for_period", "write_payslips_pdf", "write_payslips_zip",
+    "payslip_fingerprint", "cached_payslip_pdf", "invalidate_payslip_pdf",
+]
+
+# Bump whenever draw_payslip's output changes so cached PDFs are re-rendered.
+TEMPLATE_VERSION = "2"
+CACHE_DIR = str(getattr(settings, "PAYSLIP_PDF_CACHE_DIR", os.path.join(settings.BASE_DIR, "cache", "payslip_pdf")))
+
+PDF_WORKERS = getattr(settings, "PAYSLIP_PDF_WORKERS", None) or os.cpu_count() or 1
+PARALLEL_THRESHOLD = 20   # below this many payslips a process pool costs more than it saves
+CHUNK = 25                # payslips per task handed to a worker
+
+
+def payslip_filename(ps) -> str:
+    return f"payslip_{ps.employee.full_name}_{ps.period_from}.pdf"
+
+
+def draw_payslip(p, ps) -> None:
+    """
+    Draw one payslip as a single A4 page on canvas `p` (ends the page).
+    Expects `ps` loaded with select_related('employee__department').
+    """
+    width, height = A4
+
+    # ===== HEADER SECTION =====
+    p.setFont("Helvetica-Bold", 16)
+    p.drawCentredString(width/2, height-50, "TERRALOGIX HR")
+    p.setFont("Helvetica-Bold", 14)
+    p.drawCentredString(width/2, height-80, "EMPLOYEE PAYSLIP")
+
+    # ===== COMPANY & EMPLOYEE INFO =====
+    p.setFont("Helvetica", 10)
+    p.drawString(width-200, height-110, "Terralogix Inc.")
+
+    # Employee info box
+    p.rect(50, height-180, width-100, 60)
+    p.setFont("Helvetica-Bold", 12)
+    p.drawString(60, height-140, "EMPLOYEE INFORMATION")
+    p.setFont("Helvetica", 10)
+
+    employee_info = [
+        ("Name:", ps.name_snapshot or ps.employee.full_name),
+        ("ID No:", ps.employee_id_no or "N/A"),
+        ("Position:", ps.position_snapshot or ps.employee.position or "N/A"),
+        ("Department:", ps.employee.department.name if ps.employee.department else "N/A")
+    ]
+
+    y_pos = height-160
+    for label, value in employee_info:
+        p.drawString(60, y_pos, label)
+        p.drawString(120, y_pos, value)
+        y_pos -= 20
+
+    # ===== PAY PERIOD SECTION =====
+    p.setFont("Helvetica-Bold", 12)
+    p.drawString(50, height-250, "PAY PERIOD")
+    p.setFont("Helvetica", 10)
+    p.drawString(50, height-270, f"From: {ps.period_from}")
+    p.drawString(200, height-270, f"To: {ps.period_to}")
+    p.drawString(350, height-270, f"Pay Date: {ps.issued_date}")
+
+    # ===== EARNINGS SECTION =====
+    p.setFont("Helvetica-Bold", 12)
+    p.drawString(50, height-310, "EARNINGS")
+    p.setFont("Helvetica", 10)
+
+    earnings = [
+        ("Basic Salary", f"{ps.daily_rate} × {ps.days_worked} days", ps.daily_rate * ps.days_worked),
+        ("Overtime Pay", "", ps.overtime_pay),
+        ("Allowance", "", ps.allowance),
+        ("Holiday Pay", f"{ps.regular_holidays} days", 0),  # Add actual calculation if available
+    ]
+
+    y_pos = height-330
+    for item, description, amount in earnings:
+        p.drawString(60, y_pos, item)
+        p.drawString(200, y_pos, description)
+        p.drawString(450, y_pos, f"₱{amount:,.2f}")
+        y_pos -= 20
+
+    # Gross Pay
+    p.setFont("Helvetica-Bold", 10)
+    p.drawString(400, y_pos-10, "--------------")
+    p.drawString(60, y_pos-30, "GROSS PAY")
+    p.drawString(450, y_pos-30, f"₱{ps.gross_pay:,.2f}")
+    p.drawString(400, y_pos-40, "==============")
+
+    # ===== DEDUCTIONS SECTION =====
+    p.setFont("Helvetica-Bold", 12)
+    p.drawString(50, y_pos-70, "DEDUCTIONS")
+    p.setFont("Helvetica", 10)
+
+    deductions = [
+        ("Late/Undertime", "", ps.late_undertime),
+        ("SSS Contribution", "", ps.sss),
+        ("SSS Loan", "", ps.sss_loan),
+        ("HDMF Contribution", "", ps.hdmf),
+        ("HDMF Loan", "", ps.hdmf_loan),
+        ("PHIC Contribution", "", ps.phic),
+        ("Withholding Tax", "", ps.tax),
+        ("Cash Advance", "", ps.cash_advance),
+    ]
+
+    y_pos -= 90
+    for item, description, amount in deductions:
+        p.drawString(60, y_pos, item)
+        p.drawString(450, y_pos, f"₱{amount:,.2f}")
+        y_pos -= 20
+
+    # Total Deductions
+    p.setFont("Helvetica-Bold", 10)
+    p.drawString(400, y_pos-10, "--------------")
+    p.drawString(60, y_pos-30, "TOTAL DEDUCTIONS")
+    p.drawString(450, y_pos-30, f"₱{ps.total_deductions:,.2f}")
+    p.drawString(400, y_pos-40, "==============")
+
+    # ===== NET PAY SECTION =====
+    p.setFont("Helvetica-Bold", 14)
+    p.drawString(60, y_pos-70, "NET PAY")
+    p.drawString(450, y_pos-70, f"₱{ps.net_pay:,.2f}")
+    p.setLineWidth(2)
+    p.line(60, y_pos-75, 500, y_pos-75)
+
+    # ===== FOOTER =====
+    p.setFont("Helvetica", 8)
+    p.drawCentredString(width/2, 50, "This is a computer-generated document and does not require a signature")
+    p.drawCentredString(width/2, 35, "Terralogix HR System | https://terralogixhr.com")
+
+    p.showPage()
+
+
+def write_payslip_pdf(fh, ps) -> None:
+    """Render one payslip as a complete PDF document into file-like `fh`."""
+    p = canvas.Canvas(fh, pagesize=A4)
+    draw_payslip(p, ps)
+    p.save()
+
+
+# ---- Bulk rendering ----
+# Workers receive Payslip instances with employee/department already joined
+# (select_related), so they never touch the database.
+
+def payslips_for_period(period_from=None, period_to=None, *, department_id: Optional[int] = None,
+                        employee_id: Optional[int] = None) -> List[Payslip]:
+    """Payslips whose period lies within [period_from, period_to], ready for rendering."""
+    qs = Payslip.objects.select_related("employee__department")
+    if period_from:
+        qs = qs.filter(period_from__gte=period_from)
+    if period_to:
+        qs = qs.filter(period_to__lte=period_to)
+    if department_id:
+        qs = qs.filter(employee__department_id=department_id)
+    if employee_id:
+        qs = qs.filter(employee_id=employee_id)
+    return list(qs.order_by("employee__full_name", "period_from", "id"))
+
+
+def _render_pages(payslips: Sequence) -> bytes:
+    buf = io.BytesIO()
+    p = canvas.Canvas(buf, pagesize=A4)
+    for ps in payslips:
+        draw_payslip(p, ps)
+    p.save()
+    return buf.getvalue()
+
+
+def _render_files(payslips: Sequence) -> List[bytes]:
+    out = []
+    for ps in payslips:
+        buf = io.BytesIO()
+        write_payslip_pdf(buf, ps)
+        out.append(buf.getvalue())
+    return out
+
+
+def _chunks(items: Sequence, size: int):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _drop_inherited_connections():
+    """
+    Pool initializer: a forked worker must not use the parent's DB sockets.
+    They are forgotten rather than closed, since closing would end the
+    parent's sessions too; the worker opens its own if it needs one.
+    """
+    for conn in connections.all(initialized_only=True):
+        conn.connection = None
+
+
+def _map_chunks(fn, payslips: Sequence, workers: int):
+    """Apply fn to CHUNK-sized slices, in a process pool when it is worth it; results keep input order."""
+    chunks = list(_chunks(list(payslips), CHUNK))
+    if workers <= 1 or len(payslips) < PARALLEL_THRESHOLD:
+        return [fn(c) for c in chunks]
+    with ProcessPoolExecutor(max_workers=min(workers, len(chunks)), initializer=_drop_inherited_connections) as pool:
+        return list(pool.map(fn, chunks))
+
+
+def write_payslips_pdf(fh, payslips: Sequence, *, workers: int = PDF_WORKERS) -> int:
+    """Render payslips as one multi-page PDF (one page each) into `fh`. Returns the page count."""
+    writer = PdfWriter()
+    for part in _map_chunks(_render_pages, payslips, workers):
+        writer.append(io.BytesIO(part))
+    writer.write(fh)
+    return len(payslips)
+
+
+def write_payslips_zip(fh, payslips: Sequence, *, workers: int = PDF_WORKERS) -> int:
+    """Render one PDF per payslip into a ZIP archive written to `fh`. Returns the file count."""
+    names = _unique_names(payslips)
+    rendered = (pdf for part in _map_chunks(_render_files, payslips, workers) for pdf in part)
+    # PDFs are already compressed; storing them avoids burning CPU on deflate
+    with zipfile.ZipFile(fh, "w", compression=zipfile.ZIP_STORED) as zf:
+        for name, pdf in zip(names, rendered):
+            zf.writestr(name, pdf)
+    return len(names)
+
+
+def _unique_names(payslips: Sequence) -> List[str]:
+    seen = set()
+    names = []
+    for i, ps in enumerate(payslips, start=1):
+        name = payslip_filename(ps)
+        if name in seen:
+            stem, ext = os.path.splitext(name)
+            name = f"{stem}_{ps.pk or i}{ext}"
+        seen.add(name)
+        names.append(name)
+    return names
+
+
+# ---- Rendered PDF cache ----
+# Payslips are snapshots, so a rendered PDF stays valid until one of the
+# fields it draws changes. Files are named <payslip id>-<fingerprint>.pdf.
+
+def payslip_fingerprint(ps) -> str:
+    """Hash of everything draw_payslip prints, plus the template version."""
+    fields = {f.attname: getattr(ps, f.attname) for f in ps._meta.concrete_fields}
+    emp = ps.employee
+    fields["_employee"] = [emp.full_name, emp.position, emp.department.name if emp.department else None]
+    fields["_template"] = TEMPLATE_VERSION
+    raw = json.dumps(fields, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(raw).hexdigest()[:32]
+
+
+def _cache_path(payslip_id, fingerprint: str) -> str:
+    return os.path.join(CACHE_DIR, f"{payslip_id}-{fingerprint}.pdf")
+
+
+def cached_payslip_pdf(ps) -> Tuple[str, str]:
+    """
+    (path, fingerprint) of the rendered PDF for `ps`, rendering it only on a
+    cache miss. Writes go through a temp file + rename so readers never see
+    a partial PDF.
+    """
+    fingerprint = payslip_fingerprint(ps)
+    path = _cache_path(ps.pk, fingerprint)
+    if not os.path.exists(path):
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        invalidate_payslip_pdf(ps.pk)  # drop renders of older versions
+        fd, tmp = tempfile.mkstemp(dir=CACHE_DIR, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                write_payslip_pdf(fh, ps)
+            os.replace(tmp, path)
+        except Exception:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+    return path, fingerprint
+
+
+def invalidate_payslip_pdf(payslip_id) -> int:
+    """Remove every cached render of one payslip. Returns the number of files removed."""
+    removed = 0
+    for path in glob.glob(os.path.join(CACHE_DIR, f"{payslip_id}-*.pdf")):
+        try:
+            os.remove(path)
+            removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
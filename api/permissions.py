@@ -1,22 +1,24 @@
 from rest_framework.permissions import BasePermission
 
+from .roles import Roles, has_role
+
 class IsAdmin(BasePermission):
     """
     Allows access only to admin users.
     """
     def has_permission(self, request, view):
-        return request.user and request.user.groups.filter(name='Admin').exists()
+        return bool(request.user) and has_role(request.user, Roles.ADMIN)
 
 class IsHR(BasePermission):
     """
     Allows access only to HR users.
     """
     def has_permission(self, request, view):
-        return request.user and request.user.groups.filter(name='HR').exists()
+        return bool(request.user) and has_role(request.user, Roles.HR)
 
 class IsEmployee(BasePermission):
     """
     Allows access only to employee users.
     """
     def has_permission(self, request, view):
-        return request.user and request.user.groups.filter(name='Employee').exists()
\ No newline at end of file
+        return bool(request.user) and has_role(request.user, Roles.EMPLOYEE)
@@ -0,0 +1,223 @@
+# api/punch_sync.py
+"""
+Batch sync of punches recorded offline by the mobile app.
+
+A sync carries any number of client-timestamped time-in/time-out punches,
+each with a client-generated idempotency key. The whole batch costs a fixed
+number of queries: one to find keys already synced, one to load (and lock)
+the attendance rows for the days involved, one to tell which of their
+time-ins came from an earlier sync, one for the shifts of those days, then
+a bulk_create/bulk_update for attendance and a bulk_create for the punch
+log (plus one for the employee's geofences when they are not cached and
+some punch carries a location).
+
+Punches are applied in timestamp order and the earliest time-in / latest
+time-out of a day wins, so batches converge to the same rows whatever order
+they arrive in, with two exceptions. A time-in recorded online (check_in)
+stands: an earlier offline time-in never replaces it, and is logged as
+superseded with a note for HR instead. And a time-out needs the day's
+time-in: one that arrives first is answered `retry` and not logged, so the
+app keeps it and sends it again (same key) on a later sync, until it is
+too old to sync. Every other punch with a key is logged as AttendancePunch
+with its result; a re-sent key is answered from the log
+(`"duplicate": true`) and is never applied twice. Photo references are
+stored on the punch as given.
+"""
+from datetime import timedelta
+from typing import Any, Dict, List, Optional
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .attendance import parse_coordinate
+from .dashboard import invalidate_dashboard_stats
+from . import geofence
+from .geofence import fences_for, validate_punch
+from .models import Attendance, AttendancePunch
+from .schedules import lateness, shifts_by_day, undertime
+
+__all__ = ["sync_punches", "MAX_BATCH", "RETRY", "PunchSyncError"]
+
+MAX_BATCH = getattr(settings, "PUNCH_SYNC_MAX_BATCH", 200)
+MAX_AGE = timedelta(days=getattr(settings, "PUNCH_SYNC_MAX_AGE_DAYS", 7))  # older punches need HR
+CLOCK_SKEW = timedelta(minutes=5)                                          # device clocks run ahead
+
+ATTENDANCE_FIELDS = [
+    "time_in", "time_out", "latitude", "longitude", "status", "late_minutes", "undertime_minutes",
+    "site", "within_geofence",
+]
+
+
+SERVER_TIME_IN = "A later time in was already recorded on the server; ask HR to correct it."
+RETRY = "retry"  # a result that is never logged: the app keeps the punch and sends it again
+
+
+class PunchSyncError(ValueError):
+    """The batch as a whole is unusable (not a list, too large)."""
+
+
+# ---- Parsing ----
+def _parse(item: Any, now) -> Dict[str, Any]:
+    """A validated punch, or {"key", "error"} for one that is rejected outright."""
+    if not isinstance(item, dict):
+        return {"key": None, "error": "Punch must be an object."}
+    key = str(item.get("key") or "").strip()
+    if not key or len(key) > 64:
+        return {"key": key or None, "error": "key is required (at most 64 characters)."}
+    kind = item.get("type")
+    if kind not in (AttendancePunch.IN, AttendancePunch.OUT):
+        return {"key": key, "error": "type must be 'in' or 'out'."}
+    punched_at = parse_datetime(str(item.get("timestamp") or ""))
+    if punched_at is None:
+        return {"key": key, "error": "timestamp must be an ISO 8601 datetime."}
+    if timezone.is_naive(punched_at):
+        punched_at = timezone.make_aware(punched_at)
+    if punched_at > now + CLOCK_SKEW:
+        return {"key": key, "error": "timestamp is in the future."}
+    if punched_at < now - MAX_AGE:
+        return {"key": key, "error": "timestamp is too old to sync."}
+    try:
+        latitude = parse_coordinate(item.get("latitude"), 90)
+        longitude = parse_coordinate(item.get("longitude"), 180)
+    except ValueError as e:
+        return {"key": key, "error": str(e)}
+    local = timezone.localtime(punched_at)
+    return {
+        "key": key, "kind": kind, "punched_at": punched_at,
+        "day": local.date(), "clock": local.time().replace(microsecond=0),
+        "latitude": latitude, "longitude": longitude,
+        "photo_ref": str(item.get("photo") or "")[:255],
+    }
+
+
+# ---- Applying ----
+def _apply(employee_id: int, punches: List[Dict[str, Any]]):
+    """Apply new punches in timestamp order; returns {key: AttendancePunch} (retry results unsaved)."""
+    days = {p["day"] for p in punches}
+    rows = {
+        att.date: att
+        for att in Attendance.objects.select_for_update().filter(employee_id=employee_id, date__in=days)
+    }
+    # Time-ins recorded by the server (check_in) stand; a synced punch may only
+    # replace one that an earlier sync set
+    recorded = [att.pk for att in rows.values() if att.time_in is not None]
+    synced_in = set(
+        AttendancePunch.objects.filter(attendance_id__in=recorded, kind=AttendancePunch.IN, result=AttendancePunch.APPLIED)
+        .values_list("attendance_id", flat=True)
+    ) if recorded and any(p["kind"] == AttendancePunch.IN for p in punches) else set()
+    shifts = shifts_by_day(employee_id, days)
+    needs_fences = geofence.ENFORCE or any(p["latitude"] is not None for p in punches)
+    fences = fences_for(employee_id) if needs_fences else ()
+    new_rows, dirty, log = [], {}, {}
+
+    def result(p, outcome, att=None, error=""):
+        log[p["key"]] = AttendancePunch(
+            employee_id=employee_id, key=p["key"], kind=p["kind"], punched_at=p["punched_at"],
+            latitude=p["latitude"], longitude=p["longitude"], photo_ref=p["photo_ref"],
+            attendance=att, result=outcome, error=error,
+        )
+
+    for p in sorted(punches, key=lambda p: p["punched_at"]):
+        att = rows.get(p["day"])
+        fence, refusal = validate_punch(employee_id, p["latitude"], p["longitude"], fences)
+        if refusal:
+            result(p, AttendancePunch.REJECTED, att, refusal)
+            continue
+        if p["kind"] == AttendancePunch.IN:
+            if att is None:
+                att = rows[p["day"]] = Attendance(employee_id=employee_id, date=p["day"])
+                new_rows.append(att)
+            elif att.time_in is not None and att.time_in <= p["clock"]:
+                result(p, AttendancePunch.SUPERSEDED, att)
+                continue
+            elif att.time_in is not None and att.pk and att.pk not in synced_in:
+                result(p, AttendancePunch.SUPERSEDED, att, SERVER_TIME_IN)
+                continue
+            att.time_in = p["clock"]
+            att.status, att.late_minutes = lateness(p["clock"], shifts[p["day"]])
+        else:
+            if att is None or att.time_in is None:
+                result(p, RETRY, att, "You need to time in first; this punch will be sent again.")
+                continue
+            if p["clock"] < att.time_in:
+                result(p, AttendancePunch.REJECTED, att, "Time out is earlier than time in.")
+                continue
+            if att.time_out is not None and att.time_out >= p["clock"]:
+                result(p, AttendancePunch.SUPERSEDED, att)
+                continue
+            att.time_out = p["clock"]
+            att.undertime_minutes = undertime(p["clock"], shifts[p["day"]])
+        if p["latitude"] is not None and p["longitude"] is not None:
+            att.latitude, att.longitude = p["latitude"], p["longitude"]
+            att.site_id, att.within_geofence = fence
+        if att.pk:
+            dirty[att.pk] = att
+        result(p, AttendancePunch.APPLIED, att)
+
+    Attendance.objects.bulk_create(new_rows)  # pks come back (RETURNING) before the log references them
+    if dirty:
+        Attendance.objects.bulk_update(list(dirty.values()), ATTENDANCE_FIELDS)
+    AttendancePunch.objects.bulk_create([punch for punch in log.values() if punch.result != RETRY])
+    if new_rows or dirty:
+        transaction.on_commit(invalidate_dashboard_stats)  # bulk writes send no post_save
+    return log
+
+
+def _describe(punch: AttendancePunch, duplicate: bool) -> Dict[str, Any]:
+    out = {"key": punch.key, "result": punch.result, "duplicate": duplicate, "attendance": punch.attendance_id}
+    if punch.error:
+        out["error"] = punch.error
+    return out
+
+
+def sync_punches(employee_id: int, items: Any, now: Optional[Any] = None) -> List[Dict[str, Any]]:
+    """
+    Apply a batch of offline punches for one employee.
+
+    Returns one result per input item, in input order:
+    {"key", "result": applied|superseded|rejected|retry, "duplicate", "attendance", ["error"]}.
+    """
+    if not isinstance(items, list):
+        raise PunchSyncError("punches must be a list.")
+    if len(items) > MAX_BATCH:
+        raise PunchSyncError(f"At most {MAX_BATCH} punches per sync.")
+    now = now or timezone.now()
+    parsed = [_parse(item, now) for item in items]
+    keys = {p["key"] for p in parsed if p["key"]}
+    valid = {}
+    for p in parsed:
+        if "error" not in p:
+            valid.setdefault(p["key"], p)  # a key repeated inside the batch counts once
+
+    for attempt in range(2):
+        try:
+            with transaction.atomic():
+                # Keys already synced are answered from the log, even if the
+                # punch would no longer validate (e.g. it is now too old)
+                seen = {
+                    punch.key: punch
+                    for punch in AttendancePunch.objects.filter(employee_id=employee_id, key__in=keys)
+                }
+                fresh = [p for key, p in valid.items() if key not in seen]
+                applied = _apply(employee_id, fresh) if fresh else {}
+            break
+        except IntegrityError:
+            # A concurrent sync or check-in inserted the same key/day first; the
+            # retry sees its rows and treats them as existing.
+            if attempt:
+                raise
+
+    results, answered = [], set()
+    for p in parsed:
+        key = p["key"]
+        if key in seen:
+            results.append(_describe(seen[key], True))
+        elif "error" in p:
+            results.append({"key": key, "result": AttendancePunch.REJECTED, "duplicate": False,
+                            "attendance": None, "error": p["error"]})
+        else:
+            results.append(_describe(applied[key], key in answered))
+            answered.add(key)
+    return results
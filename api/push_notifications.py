@@ -1,19 +1,56 @@
 # api/push_notifications.py
-import time
 import logging
-from typing import Iterable, List, Dict, Any, Optional
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List, Dict, Any, Optional, Tuple
 
 import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
 
-EXPO_PUSH_URL = "https://exp.host/--/api/v2/push/send"
+EXPO_PUSH_URL = getattr(settings, "EXPO_PUSH_URL", "https://exp.host/--/api/v2/push/send")
+EXPO_RECEIPTS_URL = getattr(settings, "EXPO_RECEIPTS_URL", "https://exp.host/--/api/v2/push/getReceipts")
 MAX_BATCH = 100            # Expo recommends <= 100 messages per request
+MAX_RECEIPT_BATCH = 1000   # Expo accepts <= 1000 ticket ids per receipts request
+MAX_CONCURRENCY = getattr(settings, "EXPO_PUSH_CONCURRENCY", 6)  # batches in flight at once
 DEFAULT_TIMEOUT = 8        # seconds
 RETRIES = 2                # total attempts = 1 + RETRIES
-RETRY_BACKOFF = 1.5        # seconds between retries (grows linearly)
+RETRY_BACKOFF = 1.0        # base seconds; attempt n waits up to RETRY_BACKOFF * 2**n (full jitter)
+RETRY_BACKOFF_CAP = 10.0   # upper bound for a single wait
 
 logger = logging.getLogger(__name__)
 
-__all__ = ["send_push_notification", "send_single_push"]
+__all__ = [
+    "send_push_notification", "send_single_push", "send_messages", "build_message", "get_receipts",
+    "get_session",
+]
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """
+    Process-wide keep-alive session, so batches reuse TCP/TLS connections
+    instead of opening a new one per request.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                s = requests.Session()
+                adapter = HTTPAdapter(pool_connections=2, pool_maxsize=max(MAX_CONCURRENCY, 1))
+                s.mount("https://", adapter)
+                s.mount("http://", adapter)
+                s.headers.update({
+                    "Accept": "application/json",
+                    "Accept-Encoding": "gzip, deflate",
+                    "Content-Type": "application/json",
+                })
+                _session = s
+    return _session
 
 
 def _chunk(items: List[Any], size: int) -> Iterable[List[Any]]:
@@ -22,8 +59,163 @@ def _chunk(items: List[Any], size: int) -> Iterable[List[Any]]:
 
 
 def _looks_like_expo_token(token: str) -> bool:
-    # Typical Expo token format: ExponentPushToken[xxxxxxxxxxxxxxxxxxxxxx]
-    return isinstance(token, str) and token.startswith("ExponentPushToken[")
+    # Expo token formats: ExponentPushToken[xxxxxxxx] (legacy) and ExpoPushToken[xxxxxxxx]
+    return isinstance(token, str) and token.startswith(("ExponentPushToken[", "ExpoPushToken[")) and token.endswith("]")
+
+
+def _backoff(attempt: int) -> float:
+    # Exponential backoff with full jitter: concurrent batches that failed
+    # together do not retry in lockstep.
+    return random.uniform(0, min(RETRY_BACKOFF_CAP, RETRY_BACKOFF * (2 ** attempt)))
+
+
+def _post_batch(
+    session: requests.Session,
+    endpoint: str,
+    messages: List[Dict[str, Any]],
+    timeout: int,
+    retries: int,
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    POST one batch (<= MAX_BATCH messages) with retries.
+
+    Returns (tickets, raw responses); tickets[i] belongs to messages[i] and is
+    either Expo's ticket ({"status": "ok", "id": ...} / {"status": "error", ...})
+    or a synthetic error ticket with "transport": True when the request
+    itself never succeeded (those are worth retrying later).
+    """
+    responses: List[Dict[str, Any]] = []
+
+    for attempt in range(retries + 1):
+        last = attempt == retries
+        try:
+            resp = session.post(endpoint, json=messages, timeout=timeout)
+        except requests.RequestException as e:
+            logger.warning("Expo push request exception on attempt %s: %s", attempt + 1, e)
+            if not last:
+                time.sleep(_backoff(attempt))
+                continue
+            return [{"status": "error", "message": f"request_exception: {e}", "transport": True}] * len(messages), responses
+
+        try:
+            payload = resp.json()
+        except Exception:
+            payload = {"_non_json_response": resp.text, "_status_code": resp.status_code}
+        responses.append(payload)
+
+        if resp.status_code == 200:
+            # 200 with top-level 'errors' is retryable unless last attempt
+            if payload.get("errors") and not last:
+                time.sleep(_backoff(attempt))
+                continue
+            per_item = payload.get("data") or []
+            if isinstance(per_item, dict):  # single-message requests get a bare ticket
+                per_item = [per_item]
+            tickets = []
+            for i in range(len(messages)):
+                item = per_item[i] if i < len(per_item) else None
+                tickets.append(item or {"status": "error", "message": "expo_status_error", "transport": True})
+            return tickets, responses
+
+        # Throttling and server errors are transient; other 4xx will not improve on retry
+        if (resp.status_code == 429 or resp.status_code >= 500) and not last:
+            time.sleep(_backoff(attempt))
+            continue
+        return [{"status": "error", "message": f"http_{resp.status_code}", "transport": True}] * len(messages), responses
+
+    return [], responses  # not reached
+
+
+def send_messages(
+    messages: List[Dict[str, Any]],
+    *,
+    timeout: int = DEFAULT_TIMEOUT,
+    endpoint: Optional[str] = None,
+    max_concurrency: int = MAX_CONCURRENCY,
+    session: Optional[requests.Session] = None,
+    retries: int = RETRIES,
+) -> Dict[str, Any]:
+    """
+    Low-level send of ready-made Expo messages (each with its own "to").
+
+    Messages are split into MAX_BATCH-sized requests, up to `max_concurrency`
+    in flight at once over a shared keep-alive session.
+
+    Returns {"tickets": [one per message, same order], "responses": [raw Expo responses]}.
+    """
+    if not messages:
+        return {"tickets": [], "responses": []}
+    endpoint = endpoint or EXPO_PUSH_URL
+    session = session or get_session()
+    batches = list(_chunk(messages, MAX_BATCH))
+
+    def post(batch):
+        return _post_batch(session, endpoint, batch, timeout, retries)
+
+    if len(batches) == 1 or max_concurrency <= 1:
+        results = [post(b) for b in batches]
+    else:
+        with ThreadPoolExecutor(max_workers=min(max_concurrency, len(batches))) as pool:
+            results = list(pool.map(post, batches))
+
+    tickets: List[Dict[str, Any]] = []
+    responses: List[Dict[str, Any]] = []
+    for batch_tickets, batch_responses in results:
+        tickets.extend(batch_tickets)
+        responses.extend(batch_responses)
+    return {"tickets": tickets, "responses": responses}
+
+
+def get_receipts(
+    ticket_ids: Iterable[str],
+    *,
+    timeout: int = DEFAULT_TIMEOUT,
+    endpoint: Optional[str] = None,
+    session: Optional[requests.Session] = None,
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Fetch push receipts for ticket ids, MAX_RECEIPT_BATCH ids per request.
+
+    Returns {ticket_id: receipt}; ids Expo has no receipt for yet (or whose
+    request failed) are simply missing, so callers can ask again later.
+    """
+    ids = [i for i in dict.fromkeys(ticket_ids) if i]
+    endpoint = endpoint or EXPO_RECEIPTS_URL
+    session = session or get_session()
+    receipts: Dict[str, Dict[str, Any]] = {}
+    for batch in _chunk(ids, MAX_RECEIPT_BATCH):
+        try:
+            resp = session.post(endpoint, json={"ids": batch}, timeout=timeout)
+            resp.raise_for_status()
+            receipts.update(resp.json().get("data") or {})
+        except (requests.RequestException, ValueError) as e:
+            logger.warning("Expo receipts request failed for %s ids: %s", len(batch), e)
+    return receipts
+
+
+def build_message(
+    token: str,
+    title: str,
+    body: str,
+    *,
+    data: Optional[Dict[str, Any]] = None,
+    priority: str = "high",
+    ttl: Optional[int] = None,
+    channel_id: Optional[str] = None,
+) -> Dict[str, Any]:
+    msg = {
+        "to": token,
+        "sound": "default",
+        "title": title,
+        "body": body,
+        "data": data or {},
+        "priority": priority,
+    }
+    if ttl is not None:
+        msg["ttl"] = int(ttl)
+    if channel_id:
+        msg["channelId"] = channel_id
+    return msg
 
 
 def send_single_push(
@@ -36,13 +228,14 @@ def send_single_push(
     ttl: Optional[int] = None,
     channel_id: Optional[str] = None,
     timeout: int = DEFAULT_TIMEOUT,
+    endpoint: Optional[str] = None,
 ) -> Dict[str, Any]:
     """
     Convenience wrapper for sending to one token.
     """
     return send_push_notification(
         [token], title, body, data=data, priority=priority, ttl=ttl,
-        channel_id=channel_id, timeout=timeout
+        channel_id=channel_id, timeout=timeout, endpoint=endpoint,
     )
 
 
@@ -56,10 +249,16 @@ def send_push_notification(
     ttl: Optional[int] = None,   # seconds (e.g., 3600)
     channel_id: Optional[str] = None,  # Android channel ID
     timeout: int = DEFAULT_TIMEOUT,
+    endpoint: Optional[str] = None,    # override EXPO_PUSH_URL (e.g. a local stub in tests)
+    max_concurrency: int = MAX_CONCURRENCY,
+    session: Optional[requests.Session] = None,
 ) -> Dict[str, Any]:
     """
     Send Expo push notifications to many tokens.
 
+    Tokens are split into batches of MAX_BATCH and up to `max_concurrency`
+    batches are in flight at once over a shared keep-alive session.
+
     Args:
         tokens: Iterable of Expo tokens (e.g., 'ExponentPushToken[...]')
         title: Notification title
@@ -69,6 +268,9 @@ def send_push_notification(
         ttl: Time-to-live in seconds
         channel_id: Android channel ID
         timeout: Per-request timeout in seconds
+        endpoint: Push API URL, defaults to EXPO_PUSH_URL
+        max_concurrency: Upper bound on parallel batch requests
+        session: requests.Session to use, defaults to get_session()
 
     Returns:
         {
@@ -94,85 +296,19 @@ def send_push_notification(
     if not valid_tokens:
         return {"ok": False, "success": [], "failed": failed, "responses": []}
 
-    headers = {
-        "Accept": "application/json",
-        "Content-Type": "application/json",
-    }
+    messages = [
+        build_message(t, title, body, data=data, priority=priority, ttl=ttl, channel_id=channel_id)
+        for t in valid_tokens
+    ]
+    sent = send_messages(messages, timeout=timeout, endpoint=endpoint, max_concurrency=max_concurrency, session=session)
 
     all_success: List[str] = []
-    responses: List[Dict[str, Any]] = []
-
-    for batch in _chunk(valid_tokens, MAX_BATCH):
-        messages = []
-        for t in batch:
-            msg = {
-                "to": t,
-                "sound": "default",
-                "title": title,
-                "body": body,
-                "data": data or {},
-                "priority": priority,
-            }
-            if ttl is not None:
-                msg["ttl"] = int(ttl)
-            if channel_id:
-                msg["channelId"] = channel_id
-            messages.append(msg)
-
-        # Retry on transient issues/timeouts
-        last_error = None
-        for attempt in range(RETRIES + 1):
-            try:
-                resp = requests.post(EXPO_PUSH_URL, json=messages, headers=headers, timeout=timeout)
-                try:
-                    payload = resp.json()
-                except Exception:
-                    payload = {"_non_json_response": resp.text, "_status_code": resp.status_code}
-
-                responses.append(payload)
-
-                ok_http = (resp.status_code == 200)
-                has_global_errors = bool(payload.get("errors"))
-                per_item = payload.get("data") or []
-
-                # If HTTP ok, parse per-item statuses
-                if ok_http:
-                    for i, item in enumerate(per_item):
-                        token = batch[i] if i < len(batch) else None
-                        status = item.get("status")
-                        if status == "ok":
-                            if token:
-                                all_success.append(token)
-                        else:
-                            msg = item.get("message") or item.get("details") or "expo_status_error"
-                            failed.append({"token": token or "unknown", "error": str(msg)})
-
-                    # If we got a 200 but also a top-level 'errors', treat as retryable unless last attempt
-                    if has_global_errors and attempt < RETRIES:
-                        time.sleep(RETRY_BACKOFF * (attempt + 1))
-                        continue
-
-                    break  # success or handled errors; move on to next batch
-
-                # Non-200: retry unless last attempt
-                if attempt < RETRIES:
-                    time.sleep(RETRY_BACKOFF * (attempt + 1))
-                    continue
-
-                # Last attempt failed: mark whole batch as failed
-                for t in batch:
-                    failed.append({"token": t, "error": f"http_{resp.status_code}"})
-                break
-
-            except requests.RequestException as e:
-                last_error = str(e)
-                logger.warning("Expo push request exception on attempt %s: %s", attempt + 1, e)
-                if attempt < RETRIES:
-                    time.sleep(RETRY_BACKOFF * (attempt + 1))
-                    continue
-                for t in batch:
-                    failed.append({"token": t, "error": f"request_exception: {last_error}"})
-                break
+    for token, ticket in zip(valid_tokens, sent["tickets"]):
+        if ticket.get("status") == "ok":
+            all_success.append(token)
+        else:
+            msg = ticket.get("message") or ticket.get("details") or "expo_status_error"
+            failed.append({"token": token, "error": str(msg)})
 
     ok = len(failed) == 0
-    return {"ok": ok, "success": all_success, "failed": failed, "responses": responses}
+    return {"ok": ok, "success": all_success, "failed": failed, "responses": sent["responses"]}
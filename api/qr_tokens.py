@@ -0,0 +1,92 @@
+# api/qr_tokens.py
+"""
+Signed, rotating QR tokens for attendance check-in.
+
+A token is "<kind>:<subject>:<window>:<signature>" signed with SECRET_KEY
+(django.core.signing, HMAC-SHA256), where window = unix time //
+ATTENDANCE_QR_ROTATION. It is accepted during its own window and the next
+one, so a code scanned just after it rotates still works, and verifying
+it needs no database read.
+
+Two kinds:
+  e:<employee id>  personal code shown in the employee's app
+  k:<site id>      one code shown on a Site's kiosk screen, scanned by
+                   the employees assigned to that site
+
+Tokens are deterministic per subject and window, so the rendered PNG is
+cached under the token until the window ends: a kiosk screen polled by
+several devices, or an employee re-opening the QR screen, costs one
+qrcode render per rotation.
+"""
+import base64
+from io import BytesIO
+from typing import NamedTuple
+
+import qrcode
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.utils import timezone
+
+__all__ = [
+    "QRToken", "QRTokenError", "make_token", "verify_token", "qr_png_base64", "seconds_left",
+    "EMPLOYEE", "KIOSK",
+]
+
+ROTATION = getattr(settings, "ATTENDANCE_QR_ROTATION", 120)  # seconds per window
+SALT = "api.attendance-qr"
+PNG_CACHE_PREFIX = "attendance_qr_png:"
+
+EMPLOYEE = "e"
+KIOSK = "k"
+
+_signer = signing.Signer(salt=SALT)
+
+
+class QRTokenError(ValueError):
+    pass
+
+
+class QRToken(NamedTuple):
+    kind: str
+    subject: str
+    window: int
+
+
+def _window(now=None) -> int:
+    return int((now or timezone.now()).timestamp()) // ROTATION
+
+
+def seconds_left(now=None) -> int:
+    """Seconds until the current window (and its tokens' PNGs) rotates."""
+    return ROTATION - int((now or timezone.now()).timestamp()) % ROTATION
+
+
+def make_token(kind: str, subject, now=None) -> str:
+    return _signer.sign(f"{kind}:{subject}:{_window(now)}")
+
+
+def verify_token(token: str, now=None) -> QRToken:
+    """Check signature and freshness; raises QRTokenError. No database access."""
+    try:
+        kind, subject, window = _signer.unsign(str(token or "")).split(":")
+        window = int(window)
+    except (signing.BadSignature, ValueError):
+        raise QRTokenError("Invalid QR code.")
+    if kind not in (EMPLOYEE, KIOSK):
+        raise QRTokenError("Invalid QR code.")
+    if not 0 <= _window(now) - window <= 1:
+        raise QRTokenError("QR code has expired. Refresh it and scan again.")
+    return QRToken(kind, subject, window)
+
+
+def qr_png_base64(token: str, now=None) -> str:
+    """Base64 PNG for a token, rendered once per rotation window."""
+    key = PNG_CACHE_PREFIX + token
+    png = cache.get(key)
+    if png is None:
+        buf = BytesIO()
+        qrcode.make(token).save(buf, format="PNG")
+        png = base64.b64encode(buf.getvalue()).decode()
+        cache.set(key, png, seconds_left(now))
+    return png
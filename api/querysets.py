@@ -0,0 +1,51 @@
+# api/querysets.py
+"""
+Query profiles: the joins a serializer needs, declared once per view.
+
+List endpoints must cost a fixed number of queries whatever the page size.
+Serializers read related names (employee.full_name, leave_type.name, ...),
+so each view declares the joins that feed them:
+
+    class LeaveRequestViewSet(QueryProfileMixin, viewsets.ModelViewSet):
+        query_profile = LEAVE_REQUEST
+
+and function views call `LEAVE_REQUEST.apply(qs)`. When a serializer grows a
+new related field, its profile here grows with it.
+"""
+from typing import NamedTuple, Tuple
+
+__all__ = [
+    "QueryProfile", "QueryProfileMixin",
+    "EMPLOYEE", "PAYROLL", "PAYSLIP", "LEAVE_REQUEST",
+]
+
+
+class QueryProfile(NamedTuple):
+    select_related: Tuple[str, ...] = ()
+    prefetch_related: Tuple[str, ...] = ()
+
+    def apply(self, queryset):
+        if self.select_related:
+            queryset = queryset.select_related(*self.select_related)
+        if self.prefetch_related:
+            queryset = queryset.prefetch_related(*self.prefetch_related)
+        return queryset
+
+
+# ---- Profiles (keep in step with api/serializers.py) ----
+EMPLOYEE = QueryProfile(select_related=("department",))
+PAYROLL = QueryProfile(select_related=("employee", "employee__department"))
+PAYSLIP = QueryProfile(select_related=("employee", "employee__department"))
+LEAVE_REQUEST = QueryProfile(select_related=("employee", "employee__department", "approved_by", "leave_type"))
+
+
+class QueryProfileMixin:
+    """
+    Applies `query_profile` to whatever get_queryset() returns, for list and
+    detail alike (both go through filter_queryset), so views that scope the
+    queryset per user do not have to repeat the joins in every branch.
+    """
+    query_profile = QueryProfile()
+
+    def filter_queryset(self, queryset):
+        return self.query_profile.apply(super().filter_queryset(queryset))
@@ -7,6 +7,32 @@ class Roles:
     HR = "HR"
     EMPLOYEE = "Employee"
 
+
+# ---- Role resolution ----
+# A user's group names are loaded once per request (memoized on the user
+# object, which DRF keeps for the whole request). They are not cached across
+# requests: these checks authorize access, and a per-process cache would let
+# a demoted user keep their rights in other processes until it expired.
+
+def group_names(user) -> frozenset:
+    if not user or not user.is_authenticated:
+        return frozenset()
+    names = getattr(user, "_group_names", None)
+    if names is None:
+        names = user._group_names = frozenset(user.groups.values_list("name", flat=True))
+    return names
+
+
+def has_role(user, *roles) -> bool:
+    """True if the user is in any of the given groups."""
+    return not group_names(user).isdisjoint(roles)
+
+
+def invalidate_group_names(sender, instance, action, reverse, pk_set, **kwargs):
+    """m2m_changed receiver for User.groups: drop the memo on a user whose groups just changed."""
+    if action in ("post_add", "post_remove", "post_clear") and not reverse:
+        instance.__dict__.pop("_group_names", None)
+
 # Define permissions for each role
 # Format: {role_name: [permission_codename, permission_name]}
 ROLE_PERMISSIONS = {
@@ -0,0 +1,227 @@
+# api/schedules.py
+"""
+Shift schedules and the lateness/undertime they imply.
+
+An employee's shift on a day comes from the ShiftAssignment covering that
+day with the latest start_date; days without one use the default shift from
+settings (ATTENDANCE_SHIFT_START / _END / ATTENDANCE_GRACE_MINUTES).
+
+Check-ins compute lateness as they are written (api/attendance.py). The
+nightly `manage.py recompute_attendance` re-derives status, late_minutes and
+undertime_minutes for a whole date range after schedules change or rows
+are edited. It loads the rows with values_list, does the arithmetic with
+pandas/NumPy column operations and writes back only the values that
+changed, grouped into one UPDATE per distinct value, so a month for every
+employee costs a few hundred queries and no per-row Python logic.
+
+Times are compared in minutes relative to the shift start, wrapped into
+[-12h, +12h) for time-ins and [0, 24h) for time-outs, so shifts that run
+past midnight need no special cases. A time-out in the later half of the
+off-shift gap is taken as before the shift started (nothing worked, full
+undertime) rather than as overtime that ran on into the next morning.
+"""
+import logging
+from datetime import date, time, timedelta
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.functions import ExtractHour, ExtractMinute
+
+from .models import Attendance, ShiftAssignment
+from .utils import update_changed
+
+logger = logging.getLogger(__name__)
+
+__all__ = [
+    "ShiftTimes", "default_shift", "shift_for", "shifts_by_day", "lateness", "undertime",
+    "recompute_attendance", "PRESENT", "LATE",
+]
+
+PRESENT = "Present"
+LATE = "Late"
+AUTO_STATUSES = {"present", "late"}  # other statuses (Absent, On Leave, ...) were set by hand and are kept
+
+SHIFT_START = getattr(settings, "ATTENDANCE_SHIFT_START", "08:00")  # local time, HH:MM
+SHIFT_END = getattr(settings, "ATTENDANCE_SHIFT_END", "17:00")
+GRACE_MINUTES = getattr(settings, "ATTENDANCE_GRACE_MINUTES", 0)    # late only after this many minutes
+
+DAY = 24 * 60
+BULK_BATCH = 1000  # ids per UPDATE
+RECOMPUTED_FIELDS = ("status", "late_minutes", "undertime_minutes")
+CHUNK_DAYS = 31  # recompute one month of rows at a time to bound memory
+
+
+class ShiftTimes(NamedTuple):
+    start: time
+    end: time
+    grace_minutes: int = 0
+
+
+def default_shift() -> ShiftTimes:
+    return ShiftTimes(time.fromisoformat(SHIFT_START), time.fromisoformat(SHIFT_END), GRACE_MINUTES)
+
+
+# ---- Resolving schedules ----
+def _covering(day_from: date, day_to: date) -> Q:
+    return Q(start_date__lte=day_to) & (Q(end_date__isnull=True) | Q(end_date__gte=day_from))
+
+
+def shift_for(employee_id: int, day: date) -> ShiftTimes:
+    """The employee's shift on `day`, in one indexed query."""
+    row = (
+        ShiftAssignment.objects
+        .filter(_covering(day, day), employee_id=employee_id)
+        .order_by("-start_date", "-id")
+        .values_list("shift__start_time", "shift__end_time", "shift__grace_minutes")
+        .first()
+    )
+    return ShiftTimes(*row) if row else default_shift()
+
+
+def shifts_by_day(employee_id: int, days: Iterable[date]) -> Dict[date, ShiftTimes]:
+    """{day: shift} for several days of one employee, in one query."""
+    days = sorted(set(days))
+    if not days:
+        return {}
+    assignments = list(
+        ShiftAssignment.objects
+        .filter(_covering(days[0], days[-1]), employee_id=employee_id)
+        .order_by("-start_date", "-id")
+        .values_list("start_date", "end_date", "shift__start_time", "shift__end_time", "shift__grace_minutes")
+    )
+    out = {}
+    for day in days:
+        match = next((a for a in assignments if a[0] <= day and (a[1] is None or a[1] >= day)), None)
+        out[day] = ShiftTimes(*match[2:]) if match else default_shift()
+    return out
+
+
+# ---- Scalar rules (check-in, punch sync) ----
+def _minutes(t: time) -> int:
+    return t.hour * 60 + t.minute
+
+
+def lateness(time_in: time, shift: ShiftTimes) -> Tuple[str, int]:
+    """(status, late_minutes) for a time-in against the shift."""
+    late = (_minutes(time_in) - _minutes(shift.start) + DAY // 2) % DAY - DAY // 2
+    if late <= shift.grace_minutes:
+        return PRESENT, 0
+    return LATE, late
+
+
+def _worked(time_out, start, length):
+    """Minutes of the shift covered by a time-out; 0 when it falls before the shift start (scalars or arrays)."""
+    worked = (time_out - start) % DAY
+    return np.where(worked > length + (DAY - length) // 2, 0, worked)
+
+
+def undertime(time_out: time, shift: ShiftTimes) -> int:
+    """Minutes between a time-out and the shift end (0 when the employee stayed)."""
+    length = (_minutes(shift.end) - _minutes(shift.start)) % DAY or DAY
+    return max(0, length - int(_worked(_minutes(time_out), _minutes(shift.start), length)))
+
+
+# ---- Bulk recompute ----
+def _attendance_frame(day_from: date, day_to: date, employee_ids: Optional[List[int]]) -> pd.DataFrame:
+    qs = Attendance.objects.filter(date__gte=day_from, date__lte=day_to, time_in__isnull=False)
+    if employee_ids:
+        qs = qs.filter(employee_id__in=employee_ids)
+    columns = ["id", "employee_id", "date", "in_h", "in_m", "out_h", "out_m", "status", "late_minutes", "undertime_minutes"]
+    rows = qs.order_by().values_list(
+        "id", "employee_id", "date",
+        ExtractHour("time_in"), ExtractMinute("time_in"), ExtractHour("time_out"), ExtractMinute("time_out"),
+        "status", "late_minutes", "undertime_minutes",
+    )
+    df = pd.DataFrame.from_records(list(rows), columns=columns)
+    df["date"] = pd.to_datetime(df["date"])
+    return df
+
+
+def _assignment_frame(day_from: date, day_to: date, employee_ids) -> pd.DataFrame:
+    columns = ["employee_id", "start_date", "end_date", "s_h", "s_m", "e_h", "e_m", "grace", "assignment_id"]
+    rows = (
+        ShiftAssignment.objects
+        .filter(_covering(day_from, day_to), employee_id__in=employee_ids)
+        .order_by()
+        .values_list(
+            "employee_id", "start_date", "end_date",
+            ExtractHour("shift__start_time"), ExtractMinute("shift__start_time"),
+            ExtractHour("shift__end_time"), ExtractMinute("shift__end_time"),
+            "shift__grace_minutes", "id",
+        )
+    )
+    df = pd.DataFrame.from_records(list(rows), columns=columns)
+    df["start_date"] = pd.to_datetime(df["start_date"])
+    df["end_date"] = pd.to_datetime(df["end_date"])
+    return df
+
+
+def _derive(att: pd.DataFrame, assignments: pd.DataFrame) -> pd.DataFrame:
+    """Attach each row's shift and compute status/late/undertime as columns."""
+    if not assignments.empty:
+        merged = att.merge(assignments, on="employee_id", how="left")
+        covers = (merged["start_date"] <= merged["date"]) & (
+            merged["end_date"].isna() | (merged["end_date"] >= merged["date"])
+        )
+        merged = merged[covers].sort_values(["start_date", "assignment_id"], ascending=False)
+        shift = merged.drop_duplicates("id").set_index("id")[["s_h", "s_m", "e_h", "e_m", "grace"]]
+        att = att.join(shift, on="id")
+    else:
+        att = att.assign(s_h=np.nan, s_m=np.nan, e_h=np.nan, e_m=np.nan, grace=np.nan)
+
+    d = default_shift()  # for rows no assignment covers
+    start = (att["s_h"].fillna(d.start.hour) * 60 + att["s_m"].fillna(d.start.minute)).to_numpy(np.int64)
+    end = (att["e_h"].fillna(d.end.hour) * 60 + att["e_m"].fillna(d.end.minute)).to_numpy(np.int64)
+    grace = att["grace"].fillna(d.grace_minutes).to_numpy(np.int64)
+
+    time_in = (att["in_h"] * 60 + att["in_m"]).to_numpy(np.int64)
+    late = (time_in - start + DAY // 2) % DAY - DAY // 2
+    late = np.where(late > grace, late, 0)
+
+    has_out = att["out_h"].notna().to_numpy()
+    time_out = (att["out_h"].fillna(0) * 60 + att["out_m"].fillna(0)).to_numpy(np.int64)
+    length = (end - start) % DAY
+    length = np.where(length == 0, DAY, length)
+    under = np.where(has_out, np.maximum(0, length - _worked(time_out, start, length)), 0)
+
+    auto = att["status"].fillna("").str.lower().isin(AUTO_STATUSES).to_numpy()
+    status = np.where(auto, np.where(late > 0, LATE, PRESENT), att["status"].to_numpy())
+    return pd.DataFrame({
+        "id": att["id"].to_numpy(), "status": status, "late_minutes": late, "undertime_minutes": under,
+        "status_changed": status != att["status"].to_numpy(),
+        "late_minutes_changed": late != att["late_minutes"].to_numpy(),
+        "undertime_minutes_changed": under != att["undertime_minutes"].to_numpy(),
+    })
+
+
+def recompute_attendance(
+    day_from: date,
+    day_to: date,
+    *,
+    employee_ids: Optional[Iterable[int]] = None,
+    batch_size: int = BULK_BATCH,
+) -> Dict[str, int]:
+    """
+    Re-derive status, late_minutes and undertime_minutes for every timed-in
+    row in [day_from, day_to]. Statuses other than Present/Late are kept.
+
+    Returns {"checked": rows read, "updated": rows written}.
+    """
+    employee_ids = list(employee_ids) if employee_ids else None
+    checked = updated = 0
+    chunk_from = day_from
+    while chunk_from <= day_to:
+        chunk_to = min(day_to, chunk_from + timedelta(days=CHUNK_DAYS - 1))
+        att = _attendance_frame(chunk_from, chunk_to, employee_ids)
+        if not att.empty:
+            derived = _derive(att, _assignment_frame(chunk_from, chunk_to, att["employee_id"].unique().tolist()))
+            with transaction.atomic():
+                updated += update_changed(Attendance, derived, RECOMPUTED_FIELDS, batch_size)
+            checked += len(att)
+        chunk_from = chunk_to + timedelta(days=1)
+    logger.info("Recomputed attendance %s..%s: %s rows checked, %s updated", day_from, day_to, checked, updated)
+    return {"checked": checked, "updated": updated}
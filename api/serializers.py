@@ -1,8 +1,12 @@
+from urllib.parse import urljoin
+
 from django.contrib.auth.models import User
+from django.urls import reverse
 from rest_framework import serializers
 from .models import (
     Employee, Payroll, Attendance, Payslip, LeaveRequest, Announcement,
-    AppNotification, AuditLog, LeaveType, Department, UserInvitation, PushToken
+    AppNotification, AuditLog, LeaveType, Department, UserInvitation, PushToken, ExportJob,
+    Shift, ShiftAssignment, Site,
 )
 
 # ========== Auth ==========
@@ -22,20 +26,30 @@ class DepartmentSerializer(serializers.ModelSerializer):
         model = Department
         fields = '__all__'
 
+# Related names below are read through select_related joins; the matching
+# query profiles live in api/querysets.py.
 class EmployeeSerializer(serializers.ModelSerializer):
     profile_photo_url = serializers.SerializerMethodField()
+    department_name = serializers.CharField(source='department.name', read_only=True, default=None)
 
     class Meta:
         model = Employee
         fields = '__all__'
 
     def get_profile_photo_url(self, obj):
-        request = self.context.get('request')
-        if obj.profile_photo and hasattr(obj.profile_photo, 'url'):
-            return request.build_absolute_uri(obj.profile_photo.url) if request else obj.profile_photo.url
-        return None
+        if not (obj.profile_photo and hasattr(obj.profile_photo, 'url')):
+            return None
+        # Resolve the host once per serializer, not once per row of a list
+        if not hasattr(self, '_media_base'):
+            request = self.context.get('request')
+            self._media_base = request.build_absolute_uri('/') if request else None
+        url = obj.profile_photo.url
+        return urljoin(self._media_base, url) if self._media_base else url
 
 class PayrollSerializer(serializers.ModelSerializer):
+    employee_name = serializers.CharField(source='employee.full_name', read_only=True)
+    department_name = serializers.CharField(source='employee.department.name', read_only=True, default=None)
+
     class Meta:
         model = Payroll
         fields = '__all__'
@@ -45,7 +59,54 @@ class AttendanceSerializer(serializers.ModelSerializer):
         model = Attendance
         fields = '__all__'
 
+class ShiftSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Shift
+        fields = '__all__'
+
+class ShiftAssignmentSerializer(serializers.ModelSerializer):
+    shift_name = serializers.CharField(source='shift.name', read_only=True)
+
+    class Meta:
+        model = ShiftAssignment
+        fields = '__all__'
+
+    def validate(self, attrs):
+        start = attrs.get('start_date', getattr(self.instance, 'start_date', None))
+        end = attrs.get('end_date', getattr(self.instance, 'end_date', None))
+        if start and end and end < start:
+            raise serializers.ValidationError({'end_date': 'Must be on or after start_date.'})
+        return attrs
+
+class SiteSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Site
+        fields = '__all__'
+
+    def validate_polygon(self, value):
+        if value is None:
+            return value
+        try:
+            vertices = [[float(lat), float(lng)] for lat, lng in value]
+        except (TypeError, ValueError):
+            raise serializers.ValidationError('Must be a list of [latitude, longitude] pairs.')
+        if len(vertices) < 3:
+            raise serializers.ValidationError('Needs at least 3 vertices.')
+        if any(abs(lat) > 90 or abs(lng) > 180 for lat, lng in vertices):
+            raise serializers.ValidationError('Vertex out of range.')
+        return vertices
+
+    def validate(self, attrs):
+        radius = attrs.get('radius_m', getattr(self.instance, 'radius_m', None))
+        polygon = attrs.get('polygon', getattr(self.instance, 'polygon', None))
+        if bool(radius) == bool(polygon):
+            raise serializers.ValidationError('Set exactly one of radius_m and polygon.')
+        return attrs
+
 class PayslipSerializer(serializers.ModelSerializer):
+    employee_name = serializers.CharField(source='employee.full_name', read_only=True)
+    department_name = serializers.CharField(source='employee.department.name', read_only=True, default=None)
+
     class Meta:
         model = Payslip
         fields = '__all__'
@@ -56,6 +117,11 @@ class LeaveTypeSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 class LeaveRequestSerializer(serializers.ModelSerializer):
+    employee_name = serializers.CharField(source='employee.full_name', read_only=True)
+    department_name = serializers.CharField(source='employee.department.name', read_only=True, default=None)
+    leave_type_name = serializers.CharField(source='leave_type.name', read_only=True, default=None)
+    approved_by_username = serializers.CharField(source='approved_by.username', read_only=True, default=None)
+
     class Meta:
         model = LeaveRequest
         fields = '__all__'
@@ -63,8 +129,14 @@ class LeaveRequestSerializer(serializers.ModelSerializer):
 class AnnouncementSerializer(serializers.ModelSerializer):
     class Meta:
         model = Announcement
-        fields = ['id', 'title', 'message', 'created_at', 'created_by']
-        read_only_fields = ['id', 'created_at', 'created_by']
+        fields = [
+            'id', 'title', 'message', 'created_at', 'created_by',
+            'fanout_status', 'recipients_total', 'recipients_done', 'fanout_finished_at',
+        ]
+        read_only_fields = [
+            'id', 'created_at', 'created_by',
+            'fanout_status', 'recipients_total', 'recipients_done', 'fanout_finished_at',
+        ]
 
 class NotificationSerializer(serializers.ModelSerializer):
     class Meta:
@@ -85,3 +157,19 @@ class PushTokenSerializer(serializers.ModelSerializer):
     class Meta:
         model = PushToken
         fields = '__all__'
+
+
+class ExportJobSerializer(serializers.ModelSerializer):
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ExportJob
+        fields = ['id', 'kind', 'params', 'status', 'error', 'created_at', 'started_at', 'finished_at', 'download_url']
+        read_only_fields = fields
+
+    def get_download_url(self, obj):
+        if obj.status != ExportJob.DONE:
+            return None
+        url = reverse('export_job_download', args=[obj.pk])
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
@@ -0,0 +1,21 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import m2m_changed, post_delete, post_save
+
+from .dashboard import invalidate_dashboard_stats
+from .geofence import invalidate_geofences
+from .models import AppNotification, Attendance, Employee, LeaveRequest, Payslip, Site
+from .notifications import invalidate_unread_count_for
+from .roles import invalidate_group_names
+
+for _model in (Attendance, LeaveRequest, Employee, Payslip):
+    post_save.connect(invalidate_dashboard_stats, sender=_model, dispatch_uid=f"dashboard_stats_save_{_model.__name__}")
+    post_delete.connect(invalidate_dashboard_stats, sender=_model, dispatch_uid=f"dashboard_stats_delete_{_model.__name__}")
+
+post_save.connect(invalidate_unread_count_for, sender=AppNotification, dispatch_uid="unread_count_save")
+post_delete.connect(invalidate_unread_count_for, sender=AppNotification, dispatch_uid="unread_count_delete")
+
+m2m_changed.connect(invalidate_group_names, sender=User.groups.through, dispatch_uid="user_group_names")
+
+post_save.connect(invalidate_geofences, sender=Site, dispatch_uid="geofences_save")
+post_delete.connect(invalidate_geofences, sender=Site, dispatch_uid="geofences_delete")
+m2m_changed.connect(invalidate_geofences, sender=Site.employees.through, dispatch_uid="geofences_members")
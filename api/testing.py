@@ -0,0 +1,150 @@
+# api/testing.py
+"""Helpers shared by the test suite and the benchmark management commands."""
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+__all__ = ["ExpoStubServer", "assert_constant_queries"]
+
+
+def assert_constant_queries(testcase, client, url, add_rows, *, sizes=(1, 5)):
+    """
+    Assert that GET `url` runs the same number of queries however many rows
+    it lists, i.e. that the view has no N+1.
+
+        assert_constant_queries(self, self.client, "/api/leaves/",
+                                lambda n: make_leaves(self.emp, n))
+
+    `add_rows(n)` must create n more rows visible to the client; the list is
+    measured after growing it to each of `sizes` (keep them within one page).
+    Returns the query count.
+    """
+    client.get(url)  # warm per-user caches (roles, ...) so they do not skew the first count
+    counts, lengths, have = [], [], 0
+    for n in sizes:
+        add_rows(n - have)
+        have = n
+        with CaptureQueriesContext(connection) as ctx:
+            response = client.get(url)
+        testcase.assertEqual(response.status_code, 200, f"GET {url}")
+        data = response.data
+        lengths.append(len(data["results"] if isinstance(data, dict) else data))
+        counts.append(len(ctx.captured_queries))
+    testcase.assertEqual(len(set(lengths)), len(sizes), f"GET {url} did not list the added rows: {lengths}")
+    testcase.assertEqual(
+        len(set(counts)), 1,
+        f"GET {url}: query count grows with rows {dict(zip(lengths, counts))}\n"
+        + "\n".join(q["sql"] for q in ctx.captured_queries),
+    )
+    return counts[0]
+
+
+class ExpoStubServer:
+    """
+    Local stand-in for the Expo push API, for tests and benchmarks.
+
+        with ExpoStubServer(latency=0.05) as stub:
+            send_push_notification(tokens, "t", "b", endpoint=stub.url)
+
+    Every message gets an "ok" ticket unless its token is listed in
+    `error_tokens` (-> DeviceNotRegistered). Tokens in `dead_tokens` get an
+    "ok" ticket but a DeviceNotRegistered receipt from `receipts_url`, like
+    a device that uninstalled the app. The first `fail_first` send requests
+    answer HTTP 500.
+    """
+
+    def __init__(self, *, latency: float = 0.0, fail_first: int = 0, error_tokens=(), dead_tokens=()):
+        self.latency = latency
+        self.fail_first = fail_first
+        self.error_tokens = set(error_tokens)
+        self.dead_tokens = set(dead_tokens)
+        self.tickets = {}  # ticket id -> token
+        self.requests = 0
+        self.messages = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}/--/api/v2/push/send"
+
+    @property
+    def receipts_url(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}/--/api/v2/push/getReceipts"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                if self.path.endswith("/getReceipts"):
+                    return self._receipts(json.loads(body or b"{}").get("ids") or [])
+                with stub._lock:
+                    stub.requests += 1
+                    failing = stub.requests <= stub.fail_first
+                if stub.latency:
+                    time.sleep(stub.latency)
+                if failing:
+                    return self._reply(500, {"errors": [{"code": "INTERNAL_SERVER_ERROR"}]})
+                messages = json.loads(body or b"[]")
+                if isinstance(messages, dict):
+                    messages = [messages]
+                with stub._lock:
+                    stub.messages += len(messages)
+                data = []
+                for m in messages:
+                    if m.get("to") in stub.error_tokens:
+                        data.append({"status": "error", "message": "not registered",
+                                     "details": {"error": "DeviceNotRegistered"}})
+                    else:
+                        ticket_id = str(uuid.uuid4())
+                        with stub._lock:
+                            stub.tickets[ticket_id] = m.get("to")
+                        data.append({"status": "ok", "id": ticket_id})
+                self._reply(200, {"data": data})
+
+            def _receipts(self, ids):
+                data = {}
+                for ticket_id in ids:
+                    token = stub.tickets.get(ticket_id)
+                    if token is None:
+                        continue
+                    if token in stub.dead_tokens:
+                        data[ticket_id] = {"status": "error", "message": "not registered",
+                                           "details": {"error": "DeviceNotRegistered"}}
+                    else:
+                        data[ticket_id] = {"status": "ok"}
+                self._reply(200, {"data": data})
+
+            def _reply(self, code, payload):
+                raw = json.dumps(payload).encode()
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(raw)))
+                self.end_headers()
+                self.wfile.write(raw)
+
+        return Handler
@@ -1,3 +1,1218 @@
-from django.test import TestCase
+import io
+import os
+import shutil
+import tempfile
+import zipfile
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.contrib.auth.models import Group, User
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from .models import (
+    Announcement, AppNotification, Attendance, AuditLog, Department, Employee, ExportJob, LeaveRequest, LeaveType, NotificationOutbox,
+    Payroll, Payslip, PushToken, Shift, ShiftAssignment, Site,
+)
+from . import jobs, payslip_pdf, qr_tokens
+from .geofence import check_point, fences_for, revalidate_attendance
+from .attendance import check_in
+from .dashboard import get_dashboard_stats
+from .exports import (
+    ATTENDANCE_HEADER, DATE_FORMAT, MONEY_FORMAT, TIME_FORMAT, XLSX_CONTENT_TYPE, iter_csv, write_xlsx,
+)
+from .schedules import ShiftTimes, lateness, recompute_attendance, shift_for, undertime
+from .notifications import unread_count
+from .payroll import run_payroll
+from .roles import group_names
+from .outbox import (
+    broadcast_recipients, claim_announcement, claim_batch, deliver_batch, delivery_stats, enqueue_broadcast,
+    enqueue_notification, fanout_announcement, poll_receipts,
+)
+from .push_notifications import send_push_notification
+from .testing import ExpoStubServer, assert_constant_queries
+from .utils import attendance_counters, attendance_counters_reference, compute_payroll, payroll_totals
+
+
+class ComputePayrollAggregateTests(TestCase):
+    def setUp(self):
+        self.emp = Employee.objects.create(full_name="Ana Cruz", date_hired=date(2024, 1, 1), daily_rate=650)
+        other = Employee.objects.create(full_name="Ben Reyes", date_hired=date(2024, 1, 1), daily_rate=700)
+        rows = [
+            (date(2025, 3, 3), time(8, 0), "Present", 0),
+            (date(2025, 3, 4), time(8, 17), "Late", 17),
+            (date(2025, 3, 5), None, "late", 5),
+            (date(2025, 3, 6), None, "PRESENT", 0),
+            (date(2025, 3, 7), None, "Absent", 0),
+            (date(2025, 3, 8), time(9, 0), "Absent", 60),
+            (date(2025, 3, 9), None, "On Leave", 3),
+            (date(2025, 4, 1), time(8, 0), "Present", 40),  # outside period
+        ]
+        for d, t_in, st, late in rows:
+            Attendance.objects.create(employee=self.emp, date=d, time_in=t_in, status=st, late_minutes=late)
+        Attendance.objects.create(employee=other, date=date(2025, 3, 3), time_in=time(8, 30), late_minutes=30)
+
+    def test_counters_match_reference_loop(self):
+        for period in [(date(2025, 3, 1), date(2025, 3, 31)), (date(2025, 3, 4), date(2025, 3, 5)),
+                       (date(2025, 1, 1), date(2025, 12, 31)), (date(2024, 1, 1), date(2024, 1, 31))]:
+            self.assertEqual(attendance_counters(self.emp, *period), attendance_counters_reference(self.emp, *period))
+
+    def test_compute_payroll_matches_reference_decimals(self):
+        period = (date(2025, 3, 1), date(2025, 3, 31))
+        expected = payroll_totals(*attendance_counters_reference(self.emp, *period), "650.00",
+                                  overtime_pay="120.50", allowance=300)
+        result = compute_payroll(self.emp, *period, "650.00", overtime_pay="120.50", allowance=300)
+        self.assertEqual(result, expected)
+        self.assertEqual(result["days_worked"], 5)
+        self.assertEqual(result["late_undertime"], payroll_totals(0, 85, 0)["late_undertime"])
+
+
+@skipUnless(connection.vendor == "postgresql", "query plans are only checked on PostgreSQL")
+class HotQueryIndexTests(TestCase):
+    """The dashboard / time-in / payslip queries must be answerable from an index."""
+
+    def setUp(self):
+        self.user = User.objects.create_user("ana", password="x")
+        self.emp = Employee.objects.create(user=self.user, full_name="Ana Cruz", date_hired=date(2024, 1, 1))
+
+    def assertUsesIndex(self, qs, index_name=None):
+        with connection.cursor() as cur:
+            # tiny test tables would otherwise always be seq-scanned
+            cur.execute("SET LOCAL enable_seqscan = off")
+        plan = qs.explain()
+        self.assertIn("Index", plan, plan)
+        if index_name:
+            self.assertIn(index_name, plan, plan)
+
+    def test_attendance_employee_date(self):
+        self.assertUsesIndex(
+            Attendance.objects.filter(employee=self.emp, date=date(2025, 3, 3)), "uniq_attendance_employee_date"
+        )
+
+    def test_attendance_by_date(self):
+        self.assertUsesIndex(Attendance.objects.filter(date=date(2025, 3, 3)))
+
+    def test_payslip_latest_for_employee(self):
+        self.assertUsesIndex(
+            Payslip.objects.filter(employee=self.emp).order_by("-period_to")[:1], "payslip_emp_period_to_idx"
+        )
+
+    def test_leaves_on_date(self):
+        today = date(2025, 3, 3)
+        self.assertUsesIndex(
+            LeaveRequest.objects.filter(status="Approved", start_date__lte=today, end_date__gte=today),
+            "leave_status_dates_idx",
+        )
+
+    def test_unread_notifications(self):
+        self.assertUsesIndex(
+            AppNotification.objects.filter(user=self.user, read=False), "notif_user_read_created_idx"
+        )
+
+    def test_audit_log_feed(self):
+        self.assertUsesIndex(AuditLog.objects.order_by("-timestamp")[:10], "auditlog_timestamp_id_idx")
+
+
+@mock.patch("api.push_notifications._backoff", lambda attempt: 0)
+class PushTransportTests(TestCase):
+    tokens = [f"ExponentPushToken[t{i:04d}]" for i in range(250)]
+
+    def test_batches_concurrently_against_stub(self):
+        with ExpoStubServer() as stub:
+            result = send_push_notification(self.tokens + ["not-a-token"], "Hi", "Body", endpoint=stub.url)
+        self.assertEqual(stub.requests, 3)
+        self.assertEqual(sorted(result["success"]), sorted(self.tokens))
+        self.assertEqual(result["failed"], [{"token": "not-a-token", "error": "invalid_token_format"}])
+
+    def test_retries_server_errors(self):
+        with ExpoStubServer(fail_first=1) as stub:
+            result = send_push_notification(self.tokens[:5], "Hi", "Body", endpoint=stub.url)
+        self.assertTrue(result["ok"])
+        self.assertEqual(stub.requests, 2)
+
+
+class NotificationOutboxTests(TestCase):
+    def setUp(self):
+        self.users = [User.objects.create(username=f"u{i}") for i in range(3)]
+        for u in self.users:
+            PushToken.objects.create(user=u, expo_push_token=f"ExponentPushToken[{u.username}]")
+
+    def test_enqueue_claim_deliver(self):
+        ids = [u.id for u in self.users]
+        self.assertEqual(enqueue_notification(ids, "Hi", "Body", in_app=True), {"push": 3, "in_app": 3})
+        rows = claim_batch()
+        self.assertEqual(len(rows), 6)
+        self.assertEqual(claim_batch(), [])  # already claimed
+        with ExpoStubServer(error_tokens={"ExponentPushToken[u0]"}) as stub:
+            counts = deliver_batch(rows, endpoint=stub.url)
+        self.assertEqual(counts, {"sent": 5, "retry": 0, "failed": 1, "pruned": 1})
+        self.assertFalse(PushToken.objects.filter(user=self.users[0]).exists())
+        self.assertEqual(AppNotification.objects.count(), 3)
+        dead = NotificationOutbox.objects.get(token="ExponentPushToken[u0]")
+        self.assertEqual((dead.status, dead.error), (NotificationOutbox.FAILED, "DeviceNotRegistered"))
+        self.assertFalse(NotificationOutbox.objects.filter(channel="push", status="Sent", ticket_id="").exists())
+
+    def test_transport_failure_is_rescheduled(self):
+        enqueue_notification([self.users[0].id], "Hi", "Body")
+        with ExpoStubServer(fail_first=1) as stub:
+            counts = deliver_batch(claim_batch(), endpoint=stub.url)
+        self.assertEqual(counts["retry"], 1)
+        row = NotificationOutbox.objects.get()
+        self.assertEqual((row.status, row.attempts), (NotificationOutbox.PENDING, 1))
+        self.assertEqual(claim_batch(), [])  # not due until its backoff passes
+
+    def test_receipts_settle_rows_and_prune_dead_tokens(self):
+        enqueue_notification([u.id for u in self.users], "Hi", "Body")
+        with ExpoStubServer(dead_tokens={"ExponentPushToken[u1]"}) as stub:
+            deliver_batch(claim_batch(), endpoint=stub.url)
+            self.assertEqual(poll_receipts(endpoint=stub.receipts_url)["checked"], 0)  # too early
+            NotificationOutbox.objects.update(sent_at=timezone.now() - timedelta(hours=1))
+            counts = poll_receipts(endpoint=stub.receipts_url)
+        self.assertEqual(counts, {"checked": 3, "delivered": 2, "failed": 1, "pruned": 1, "expired": 0})
+        stats = delivery_stats()
+        self.assertEqual((stats["delivered"], stats["failed"], stats["pruned_tokens"], stats["live_tokens"]), (2, 1, 1, 2))
+
+    def test_receipts_are_fetched_outside_a_transaction_and_expire(self):
+        enqueue_notification([u.id for u in self.users], "Hi", "Body")
+        with ExpoStubServer() as stub:
+            deliver_batch(claim_batch(), endpoint=stub.url)
+        rows = list(NotificationOutbox.objects.order_by("pk"))
+        NotificationOutbox.objects.filter(pk=rows[0].pk).update(sent_at=timezone.now() - timedelta(days=2))
+        NotificationOutbox.objects.exclude(pk=rows[0].pk).update(sent_at=timezone.now() - timedelta(hours=1))
+
+        depth = len(connection.atomic_blocks)  # the test case's own transaction
+
+        def no_receipts_yet(ids, endpoint=None):
+            self.assertEqual(len(connection.atomic_blocks), depth)  # no row locks held during the HTTP call
+            return {}
+        with mock.patch("api.outbox.get_receipts", side_effect=no_receipts_yet) as fetch:
+            counts = poll_receipts()
+            self.assertEqual((counts["checked"], counts["expired"]), (2, 1))
+            self.assertEqual(poll_receipts()["checked"], 0)  # still leased to the first poll
+        self.assertEqual(fetch.call_count, 1)
+        self.assertEqual(NotificationOutbox.objects.get(pk=rows[0].pk).error, "receipt_expired")
+        self.assertEqual(NotificationOutbox.objects.filter(status=NotificationOutbox.SENT).count(), 2)
+
+
+class BroadcastTests(TestCase):
+    def setUp(self):
+        ops, hr = Department.objects.create(name="Ops"), Department.objects.create(name="HR")
+        for i, (dept, role) in enumerate([(ops, "staff"), (ops, "manager"), (hr, "hr")]):
+            user = User.objects.create(username=f"e{i}")
+            Employee.objects.create(user=user, full_name=user.username, date_hired=date(2024, 1, 1),
+                                    department=dept, role=role)
+            for device in ("phone", "tablet"):
+                PushToken.objects.create(user=user, expo_push_token=f"ExponentPushToken[{user.username}-{device}]",
+                                         device_id=device)
+        PushToken.objects.create(user=User.objects.create(username="no-employee"),
+                                 expo_push_token="ExponentPushToken[other]")
+        self.ops = ops
+
+    def test_recipients_by_department_and_role(self):
+        self.assertEqual(broadcast_recipients().count(), 6)
+        self.assertEqual(broadcast_recipients(department_id=self.ops.id).count(), 4)
+        self.assertEqual(broadcast_recipients(department_id=self.ops.id, role="Manager").count(), 2)
+
+    def test_broadcast_queues_every_device_once(self):
+        with self.assertNumQueries(2):  # recipient query + one INSERT page
+            self.assertEqual(enqueue_broadcast("Hi", "All hands"), 6)
+        self.assertEqual(NotificationOutbox.objects.values("token").distinct().count(), 6)
+
+
+    def test_endpoint_validates_the_audience(self):
+        from rest_framework.test import APIClient
+        admin = User.objects.create(username="broadcaster", is_staff=True)
+        admin.groups.add(Group.objects.get_or_create(name="Admin")[0])
+        client = APIClient(SERVER_NAME="localhost")
+        client.force_authenticate(admin)
+        for body in ({"body": "Hi", "department": "ops"}, {"body": "Hi", "department": "1; drop"},
+                     {"body": "Hi", "role": "ceo"}, {"body": "Hi"}, {"department": str(self.ops.id)},
+                     {"body": "Hi", "all": "false"}, {"body": "Hi", "all": "yes"}, {"body": "Hi", "all": [1]}):
+            with self.subTest(body=body):
+                self.assertEqual(client.post("/api/admin/push-broadcast/", body, format="json").status_code, 400)
+        r = client.post("/api/admin/push-broadcast/", {"body": "Hi", "department": str(self.ops.id)}, format="json")
+        self.assertEqual((r.status_code, r.data["queued"]), (202, 4))
+        for flag in (True, "true", "1"):
+            r = client.post("/api/admin/push-broadcast/", {"body": "Hi", "all": flag}, format="json")
+            self.assertEqual((r.status_code, r.data["queued"]), (202, 6), flag)
+
+
+class AnnouncementFanoutTests(TestCase):
+    def setUp(self):
+        for i in range(25):
+            user = User.objects.create(username=f"a{i}")
+            Employee.objects.create(user=user, full_name=user.username, date_hired=date(2024, 1, 1))
+            if i % 2:
+                PushToken.objects.create(user=user, expo_push_token=f"ExponentPushToken[a{i}]")
+        User.objects.create(username="no-employee")
+        self.ann = Announcement.objects.create(title="Holiday", message="Office closed Friday")
+
+    def test_fanout_is_chunked_and_complete(self):
+        ann = claim_announcement()
+        self.assertEqual((ann.pk, ann.recipients_total), (self.ann.pk, 25))
+        with CaptureQueriesContext(connection) as ctx:
+            fanout_announcement(ann, chunk=10)
+        statements = [q for q in ctx.captured_queries if "SAVEPOINT" not in q["sql"]]
+        self.assertEqual(len(statements), 3 * 5 + 1 + 1)  # 5 per chunk, empty probe, final save
+        ann.refresh_from_db()
+        self.assertEqual((ann.fanout_status, ann.recipients_done), (Announcement.DONE, 25))
+        self.assertEqual(AppNotification.objects.filter(announcement=ann).count(), 25)
+        self.assertEqual(NotificationOutbox.objects.filter(channel="push").count(), 12)
+        self.assertIsNone(claim_announcement())
+
+    def test_long_fanout_heartbeats_so_it_is_not_reclaimed(self):
+        from . import outbox
+        ann = claim_announcement()
+        ann.fanout_started_at = timezone.now() - timedelta(seconds=outbox.CLAIM_TIMEOUT - 4)
+        Announcement.objects.filter(pk=ann.pk).update(fanout_started_at=ann.fanout_started_at)
+        reclaimed = []
+
+        def slow_chunk(*args, **kwargs):
+            # each chunk takes 3s: without a heartbeat the run looks dead by the second one
+            later = timezone.now() + timedelta(seconds=3 * (len(reclaimed) + 1))
+            with mock.patch.object(outbox.timezone, "now", return_value=later):
+                reclaimed.append(claim_announcement())
+            return 0
+        with mock.patch("api.outbox.enqueue_push", side_effect=slow_chunk):
+            fanout_announcement(ann, chunk=10)
+        self.assertEqual(reclaimed, [None, None, None])
+        ann.refresh_from_db()
+        self.assertEqual((ann.fanout_status, ann.recipients_done), (Announcement.DONE, 25))
+
+    def test_unread_counters_are_dropped_after_each_chunk_commits(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.addCleanup(cache.clear)
+        users = list(User.objects.filter(employee__isnull=False).order_by("pk"))
+        for user in (users[0], users[-1]):
+            self.assertEqual(unread_count(user.id), 0)
+        with self.captureOnCommitCallbacks() as callbacks:
+            fanout_announcement(claim_announcement(), chunk=10)
+        self.assertEqual(len(callbacks), 3)
+        self.assertEqual(unread_count(users[0].id), 0)  # still cached until the chunk commits
+        for callback in callbacks:
+            callback()
+        for user in (users[0], users[-1]):
+            self.assertEqual(unread_count(user.id), 1)
+
+    def test_retry_resumes_without_duplicates(self):
+        ann = claim_announcement()
+        with mock.patch("api.outbox.enqueue_push", side_effect=[1, RuntimeError("db went away")]), \
+                self.assertLogs("api.outbox", "ERROR"):
+            fanout_announcement(ann, chunk=10)
+        ann.refresh_from_db()
+        self.assertEqual((ann.fanout_status, ann.recipients_done), (Announcement.FAILED, 10))
+        ann.fanout_status = Announcement.PENDING
+        ann.save()
+        fanout_announcement(claim_announcement(), chunk=10)
+        ann.refresh_from_db()
+        self.assertEqual((ann.fanout_status, ann.recipients_done), (Announcement.DONE, 25))
+        self.assertEqual(AppNotification.objects.filter(announcement=ann).count(), 25)
+
+
+class UnreadCountTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="reader")
+        for i in range(4):
+            AppNotification.objects.create(user=self.user, title=f"n{i}", body="b")
+
+    def test_counter_is_cached_and_dropped_on_writes(self):
+        self.assertEqual(unread_count(self.user.id), 4)
+        with self.assertNumQueries(0):
+            self.assertEqual(unread_count(self.user.id), 4)
+        n = AppNotification.objects.first()
+        n.read = True
+        n.save()
+        self.assertEqual(unread_count(self.user.id), 3)
+        enqueue_notification([self.user.id], "In-app", "b", push=False, in_app=True)
+        deliver_batch(claim_batch())
+        self.assertEqual(unread_count(self.user.id), 4)
+
+    def test_bulk_mark_read(self):
+        from rest_framework.test import APIClient
+        client = APIClient(SERVER_NAME="localhost")
+        client.force_authenticate(self.user)
+        ids = list(AppNotification.objects.order_by("pk").values_list("pk", flat=True))
+        self.assertEqual(client.get("/api/notifications/unread_count/").data, {"unread": 4})
+        for bad in (f"{ids[0]}{ids[1]}", {str(ids[0]): 1}, [ids[0], "x"], [True]):
+            r = client.post("/api/notifications/mark_all_read/", {"ids": bad}, format="json")
+            self.assertEqual(r.status_code, 400, bad)
+        r = client.post("/api/notifications/mark_all_read/", {"ids": ids[:2]}, format="json")
+        self.assertEqual(r.data, {"updated": 2, "unread": 2})
+        r = client.post("/api/notifications/mark_all_read/", {}, format="json")
+        self.assertEqual(r.data, {"updated": 2, "unread": 0})
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create(username="auditor", is_staff=True)
+        AuditLog.objects.bulk_create([AuditLog(action=f"a{i}") for i in range(25)])
+        # Ties on the timestamp must be broken by id, never skipped or repeated
+        AuditLog.objects.update(timestamp=timezone.now())
+
+    def test_walks_forward_and_back_without_gaps(self):
+        from rest_framework.test import APIClient
+        client = APIClient(SERVER_NAME="localhost")
+        client.force_authenticate(self.admin)
+        expected = list(AuditLog.objects.order_by("-timestamp", "-id").values_list("id", flat=True))
+
+        seen, pages, url = [], [], "/api/audit-logs/?page_size=10"
+        while url:
+            data = client.get(url).data
+            self.assertIsNone(data["count"])  # the key stays for page-number clients; no COUNT(*) is run
+            pages.append(data)
+            seen += [r["id"] for r in data["results"]]
+            url = data["next"]
+        self.assertEqual(seen, expected)
+        self.assertEqual([len(p["results"]) for p in pages], [10, 10, 5])
+        self.assertIsNone(pages[0]["previous"])
+
+        back = client.get(pages[2]["previous"]).data
+        self.assertEqual([r["id"] for r in back["results"]], expected[10:20])
+        self.assertEqual(client.get("/api/audit-logs/?cursor=bogus").status_code, 404)
+
+
+class RoleResolutionTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="hr-admin")
+        self.user.groups.add(Group.objects.get_or_create(name="Admin")[0], Group.objects.get_or_create(name="HR")[0])
+
+    def group_queries(self, ctx):
+        return [q for q in ctx.captured_queries if "auth_user_groups" in q["sql"]]
+
+    def test_one_group_lookup_per_request(self):
+        from rest_framework.test import APIClient
+        client = APIClient(SERVER_NAME="localhost")
+        client.force_authenticate(self.user)
+        with CaptureQueriesContext(connection) as ctx:
+            # IsAdmin permission + IsHR action permission + role-scoped get_queryset
+            client.post("/api/leaves/0/approve/")
+        self.assertEqual(len(self.group_queries(ctx)), 1)
+
+    def test_group_changes_apply_to_the_next_request(self):
+        self.assertEqual(group_names(User.objects.get(pk=self.user.pk)), {"Admin", "HR"})
+        Group.objects.get(name="HR").user_set.remove(self.user)
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(group_names(User.objects.get(pk=self.user.pk)), {"Admin"})
+        self.assertEqual(len(self.group_queries(ctx)), 1)  # read fresh, never from a shared cache
+        self.assertEqual(group_names(self.user), {"Admin"})
+        self.user.groups.clear()
+        self.assertEqual(group_names(self.user), frozenset())  # memo dropped on the changed instance
+
+
+class ListQueryCountTests(TestCase):
+    def setUp(self):
+        from rest_framework.test import APIClient
+        self.admin = User.objects.create(username="lists", is_staff=True)
+        self.admin.groups.add(Group.objects.get_or_create(name="Admin")[0])
+        self.client = APIClient(SERVER_NAME="localhost")
+        self.client.force_authenticate(self.admin)
+        self.made = 0
+
+    def add_employees(self, n):
+        """n employees, each in its own department, with a payroll, a payslip and a leave of a distinct type."""
+        for _ in range(n):
+            self.made += 1
+            dept = Department.objects.create(name=f"D{self.made}")
+            emp = Employee.objects.create(full_name=f"E{self.made}", date_hired=date(2024, 1, 1), department=dept)
+            LeaveRequest.objects.create(
+                employee=emp, start_date=date(2025, 1, 6), end_date=date(2025, 1, 7), reason="x",
+                leave_type=LeaveType.objects.create(name=f"T{self.made}"), approved_by=self.admin,
+            )
+            Payslip.objects.create(employee=emp, period_from=date(2025, 1, 1), period_to=date(2025, 1, 15))
+            Payroll.objects.create(employee=emp, pay_period="2025-01")
+
+    def test_list_endpoints_have_no_n_plus_one(self):
+        for url in ("/api/leaves/", "/api/payslips/", "/api/payrolls/", "/api/employees/",
+                    "/api/admin/leaves/", "/api/admin/employees/"):
+            with self.subTest(url=url):
+                Department.objects.all().delete()
+                LeaveType.objects.all().delete()
+                Employee.objects.all().delete()
+                assert_constant_queries(self, self.client, url, self.add_employees)
+
+    def test_admin_lists_are_paginated(self):
+        self.add_employees(12)
+        data = self.client.get("/api/admin/leaves/?page_size=5").data
+        self.assertEqual((data["count"], len(data["results"])), (12, 5))
+        self.assertEqual(data["results"][0]["employee_name"], "E12")
+        self.assertEqual(data["results"][0]["leave_type_name"], "T12")
+        self.assertIsNotNone(data["next"])
+
+
+class JWTClaimsTests(TestCase):
+    def setUp(self):
+        from rest_framework.test import APIClient
+        self.user = User.objects.create_user(username="punch", password="pw-12345", email="p@example.com")
+        self.user.groups.add(Group.objects.get_or_create(name="Employee")[0])
+        self.emp = Employee.objects.create(user=self.user, full_name="Punch", date_hired=date(2024, 1, 1), role="staff")
+        self.client = APIClient(SERVER_NAME="localhost")
+        tokens = self.client.post("/api/token/", {"username": "punch", "password": "pw-12345"}, format="json").data
+        self.refresh = tokens["refresh"]
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens['access']}")
+
+    def test_claims_replace_identity_lookups(self):
+        from rest_framework_simplejwt.tokens import AccessToken
+        claims = AccessToken(self.client._credentials["HTTP_AUTHORIZATION"].split()[1])
+        self.assertEqual((claims["employee_id"], claims["role"], claims["groups"]), (self.emp.id, "staff", ["Employee"]))
+
+        with CaptureQueriesContext(connection) as ctx:
+            r = self.client.post("/api/attendance/time-in/", {}, format="json")
+        self.assertEqual(r.status_code, 201, r.data)
+        tables = " ".join(q["sql"] for q in ctx.captured_queries)
+        self.assertEqual(tables.count('FROM "auth_user" WHERE'), 1)  # the active-account check, by pk
+        self.assertNotIn('FROM "api_employee" WHERE "api_employee"."user_id"', tables)
+        self.assertNotIn("auth_user_groups", tables)
+
+    def test_lazy_user_fields_and_refresh(self):
+        r = self.client.get("/api/profile/")
+        self.assertEqual(r.status_code, 200)
+        self.user.groups.clear()
+        self.user.groups.add(Group.objects.get_or_create(name="HR")[0])
+        from rest_framework_simplejwt.tokens import AccessToken
+        access = self.client.post("/api/token/refresh/", {"refresh": self.refresh}, format="json").data["access"]
+        self.assertEqual(AccessToken(access)["groups"], ["HR"])
+
+    def test_demoted_or_deactivated_users_lose_access_before_the_token_expires(self):
+        self.user.is_staff = True
+        self.user.save()
+        tokens = self.client.post("/api/token/", {"username": "punch", "password": "pw-12345"}, format="json").data
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens['access']}")
+        self.assertEqual(self.client.get("/api/admin/dashboard-stats/").status_code, 200)
+
+        User.objects.filter(pk=self.user.pk).update(is_staff=False)  # demoted; token still carries is_staff
+        self.assertEqual(self.client.get("/api/admin/dashboard-stats/").status_code, 403)
+        r = self.client.post("/api/change-password/", {"old_password": "pw-12345", "new_password": "pw-67890"}, format="json")
+        self.assertEqual(r.status_code, 200, r.data)
+        self.assertFalse(User.objects.get(pk=self.user.pk).is_staff)  # save() wrote nothing stale back
+
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        r = self.client.post("/api/change-password/", {"old_password": "pw-67890", "new_password": "pw-00000"}, format="json")
+        self.assertEqual(r.status_code, 401)
+        self.assertTrue(User.objects.get(pk=self.user.pk).check_password("pw-67890"))
+
+
+@mock.patch("api.schedules.SHIFT_START", "08:00")
+class CheckInTests(TestCase):
+    def setUp(self):
+        self.emp = Employee.objects.create(full_name="Early Bird", date_hired=date(2024, 1, 1))
+
+    def at(self, hh, mm):
+        return timezone.make_aware(datetime(2025, 3, 3, hh, mm, 30))
+
+    def test_status_and_late_minutes_computed_at_write(self):
+        with mock.patch("api.schedules.GRACE_MINUTES", 5):
+            att = check_in(self.emp.id, self.at(8, 17))
+            self.assertEqual((att.time_in, att.status, att.late_minutes), (time(8, 17, 30), "Late", 17))
+            other = Employee.objects.create(full_name="On Time", date_hired=date(2024, 1, 1))
+            self.assertEqual(check_in(other.id, self.at(8, 4)).status, "Present")
+
+    def test_second_check_in_is_rejected_without_a_duplicate(self):
+        self.assertIsNotNone(check_in(self.emp.id, self.at(7, 55)))
+        self.assertIsNone(check_in(self.emp.id, self.at(8, 30)))
+        att = Attendance.objects.get(employee=self.emp)
+        self.assertEqual((att.time_in, att.late_minutes), (time(7, 55, 30), 0))
+
+    def test_fills_a_row_created_without_time_in(self):
+        Attendance.objects.create(employee=self.emp, date=date(2025, 3, 3), status="Absent")
+        att = check_in(self.emp.id, self.at(9, 0))
+        self.assertEqual(Attendance.objects.filter(employee=self.emp).count(), 1)
+        self.assertEqual((att.status, att.late_minutes), ("Late", 60))
+
+
+class PunchSyncTests(TestCase):
+    def setUp(self):
+        from rest_framework.test import APIClient
+        user = User.objects.create(username="field")
+        self.emp = Employee.objects.create(user=user, full_name="Field Tech", date_hired=date(2024, 1, 1))
+        self.client = APIClient(SERVER_NAME="localhost")
+        self.client.force_authenticate(user)
+        self.day = timezone.localdate() - timedelta(days=1)
+
+    def punch(self, key, kind, hh, mm, **extra):
+        at = timezone.make_aware(datetime.combine(self.day, time(hh, mm)))
+        return {"key": key, "type": kind, "timestamp": at.isoformat(), **extra}
+
+    def sync(self, *punches):
+        r = self.client.post("/api/attendance/sync/", {"punches": list(punches)}, format="json")
+        self.assertEqual(r.status_code, 200, r.data)
+        return [(x["key"], x["result"], x["duplicate"]) for x in r.data["results"]]
+
+    @mock.patch("api.schedules.SHIFT_START", "08:00")
+    def test_batch_applies_in_timestamp_order_and_is_idempotent(self):
+        batch = [
+            self.punch("o1", "out", 17, 5, latitude=14.5, longitude=121.0, photo="uploads/o1.jpg"),
+            self.punch("i2", "in", 8, 30),
+            self.punch("i1", "in", 8, 10),  # the earliest time-in wins
+            self.punch("i1", "in", 8, 10),  # same key twice in one batch
+        ]
+        self.assertEqual(self.sync(*batch), [
+            ("o1", "applied", False), ("i2", "superseded", False), ("i1", "applied", False), ("i1", "applied", True),
+        ])
+        att = Attendance.objects.get(employee=self.emp, date=self.day)
+        self.assertEqual((att.time_in, att.time_out, att.status, att.late_minutes), (time(8, 10), time(17, 5), "Late", 10))
+
+        # Re-sending the whole batch changes nothing and reports the stored results
+        self.assertEqual([r[2] for r in self.sync(*batch)], [True] * 4)
+        self.assertEqual(self.emp.punches.count(), 3)
+
+    @mock.patch("api.schedules.SHIFT_START", "08:00")
+    def test_offline_time_in_never_replaces_a_server_time_in(self):
+        check_in(self.emp.id, timezone.make_aware(datetime.combine(self.day, time(8, 20))))
+        r = self.client.post("/api/attendance/sync/", {"punches": [self.punch("i1", "in", 7, 50)]}, format="json")
+        self.assertEqual(r.data["results"][0]["result"], "superseded")
+        self.assertIn("HR", r.data["results"][0]["error"])
+        att = Attendance.objects.get(employee=self.emp, date=self.day)
+        self.assertEqual((att.time_in, att.late_minutes), (time(8, 20), 20))
+
+        # a time-in set by an earlier sync may still be moved earlier
+        self.day -= timedelta(days=1)
+        self.sync(self.punch("i2", "in", 8, 30))
+        self.assertEqual(self.sync(self.punch("i3", "in", 8, 5)), [("i3", "applied", False)])
+        self.assertEqual(Attendance.objects.get(employee=self.emp, date=self.day).time_in, time(8, 5))
+
+    def test_invalid_punches_are_rejected_individually(self):
+        results = self.sync(self.punch("o", "in", 9, 0, latitude=91), {"type": "in"}, self.punch("x", "nap", 9, 0))
+        self.assertEqual([r[1] for r in results], ["rejected"] * 3)
+        self.assertFalse(Attendance.objects.filter(employee=self.emp).exists())
+
+    def test_time_out_synced_before_its_time_in_is_retried(self):
+        self.assertEqual(self.sync(self.punch("o1", "out", 17, 0)), [("o1", "retry", False)])
+        self.assertFalse(self.emp.punches.exists())  # not logged, so the same key can come back
+        self.assertEqual(self.sync(self.punch("i1", "in", 8, 0)), [("i1", "applied", False)])
+        self.assertEqual(self.sync(self.punch("o1", "out", 17, 0)), [("o1", "applied", False)])
+        att = Attendance.objects.get(employee=self.emp, date=self.day)
+        self.assertEqual((att.time_in, att.time_out), (time(8, 0), time(17, 0)))
+
+    def test_query_count_does_not_grow_with_batch(self):
+        Attendance.objects.create(employee=self.emp, date=self.day, time_in=time(8, 0))  # one day to update
+        def run(days, minute):
+            # each run updates the days synced before (earlier time-in) and inserts the rest
+            punches = []
+            for i in range(days):
+                self.day = timezone.localdate() - timedelta(days=i + 1)
+                punches += [self.punch(f"in{minute}.{i}", "in", 7, minute), self.punch(f"out{minute}.{i}", "out", 17, 0)]
+            with CaptureQueriesContext(connection) as ctx:
+                self.sync(*punches)
+            return len(ctx.captured_queries)
+        self.assertEqual(run(2, 59), run(6, 58))
+
+
+@mock.patch("api.schedules.SHIFT_START", "08:00")
+@mock.patch("api.schedules.SHIFT_END", "17:00")
+class ShiftScheduleTests(TestCase):
+    def setUp(self):
+        self.day_shift = Employee.objects.create(full_name="Day", date_hired=date(2024, 1, 1))
+        self.night_shift = Employee.objects.create(full_name="Night", date_hired=date(2024, 1, 1))
+        self.unassigned = Employee.objects.create(full_name="Default", date_hired=date(2024, 1, 1))
+        early = Shift.objects.create(name="Early", start_time=time(6, 0), end_time=time(14, 0), grace_minutes=10)
+        night = Shift.objects.create(name="Night", start_time=time(22, 0), end_time=time(6, 0))
+        ShiftAssignment.objects.create(employee=self.day_shift, shift=early, start_date=date(2025, 3, 1),
+                                       end_date=date(2025, 3, 4))
+        ShiftAssignment.objects.create(employee=self.night_shift, shift=night, start_date=date(2025, 1, 1))
+
+    def test_shift_resolution(self):
+        self.assertEqual(shift_for(self.day_shift.id, date(2025, 3, 4)).start, time(6, 0))
+        self.assertEqual(shift_for(self.day_shift.id, date(2025, 3, 5)).start, time(8, 0))  # assignment ended
+        night = shift_for(self.night_shift.id, date(2025, 3, 5))
+        self.assertEqual(lateness(time(22, 20), night), ("Late", 20))
+        self.assertEqual(lateness(time(21, 50), night), ("Present", 0))
+        self.assertEqual(undertime(time(5, 15), night), 45)
+        self.assertEqual(undertime(time(23, 0), night), 7 * 60)
+        self.assertEqual(undertime(time(17, 30), ShiftTimes(time(8, 0), time(17, 0))), 0)
+        # a time-out before the shift start means nothing was worked, not a wrap to the next day
+        self.assertEqual(undertime(time(7, 55), ShiftTimes(time(8, 0), time(17, 0))), 9 * 60)
+        self.assertEqual(undertime(time(23, 0), ShiftTimes(time(8, 0), time(17, 0))), 0)  # late overtime
+        self.assertEqual(undertime(time(21, 50), night), 8 * 60)
+        self.assertEqual(undertime(time(13, 0), night), 0)
+
+    def test_bulk_recompute_matches_scalar_rules(self):
+        rows = [
+            (self.day_shift, date(2025, 3, 3), time(6, 8), time(14, 0), "Present"),    # within grace
+            (self.day_shift, date(2025, 3, 4), time(6, 25), time(13, 0), "Present"),
+            (self.day_shift, date(2025, 3, 5), time(8, 25), time(16, 30), "Present"),  # back on the default shift
+            (self.night_shift, date(2025, 3, 3), time(22, 40), time(5, 0), "late"),
+            (self.night_shift, date(2025, 3, 4), time(21, 55), None, "Present"),
+            (self.unassigned, date(2025, 3, 3), time(9, 0), time(17, 0), "On Leave"),  # manual status kept
+            (self.unassigned, date(2025, 3, 5), time(7, 50), time(7, 55), "Present"),  # out before the shift began
+        ]
+        for emp, d, t_in, t_out, st in rows:
+            Attendance.objects.create(employee=emp, date=d, time_in=t_in, time_out=t_out, status=st)
+        Attendance.objects.create(employee=self.unassigned, date=date(2025, 3, 4), status="Absent", late_minutes=7)
+
+        with CaptureQueriesContext(connection) as ctx:
+            result = recompute_attendance(date(2025, 3, 1), date(2025, 3, 31))
+        self.assertEqual(result, {"checked": 7, "updated": 5})  # two rows were already right
+        reads = [q for q in ctx.captured_queries if q["sql"].startswith("SELECT")]
+        self.assertEqual(len(reads), 2)  # attendance rows + assignments, not one per row
+
+        for att in Attendance.objects.filter(time_in__isnull=False):
+            shift = shift_for(att.employee_id, att.date)
+            status, late = lateness(att.time_in, shift)
+            expected_under = undertime(att.time_out, shift) if att.time_out else 0
+            self.assertEqual((att.late_minutes, att.undertime_minutes), (late, expected_under), att)
+            if att.employee_id != self.unassigned.id:
+                self.assertEqual(att.status, status)
+        self.assertEqual(Attendance.objects.get(employee=self.unassigned, date=date(2025, 3, 3)).status, "On Leave")
+        self.assertEqual(Attendance.objects.get(employee=self.unassigned, date=date(2025, 3, 5)).undertime_minutes, 9 * 60)
+        self.assertEqual(Attendance.objects.get(employee=self.unassigned, time_in__isnull=True).late_minutes, 7)
+
+        # Nothing changed: the second run writes nothing
+        self.assertEqual(recompute_attendance(date(2025, 3, 1), date(2025, 3, 31))["updated"], 0)
+        # Payroll deducts late and undertime minutes together
+        self.assertEqual(attendance_counters(self.day_shift, date(2025, 3, 1), date(2025, 3, 31)), (3, 25 + 60 + 25 + 30))
+
+    def test_command_rejects_impossible_dates(self):
+        for args in (["--from", "2025-02-30"], ["--from", "2025-03-01", "--to", "2025-13-01"], ["--from", "March"]):
+            with self.subTest(args=args), self.assertRaisesMessage(CommandError, "must be YYYY-MM-DD"):
+                call_command("recompute_attendance", *args, stdout=io.StringIO())
+
+
+class QRTokenTests(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        from rest_framework.test import APIClient
+        cache.clear()  # PNGs cached by earlier tests
+        self.user = User.objects.create_user(username="scanner", password="pw-12345")
+        self.emp = Employee.objects.create(user=self.user, full_name="Scanner", date_hired=date(2024, 1, 1))
+        self.client = APIClient(SERVER_NAME="localhost")
+        self.client.force_authenticate(self.user)
+
+    def test_tokens_verify_without_db_and_expire(self):
+        now = timezone.now()
+        token = qr_tokens.make_token(qr_tokens.EMPLOYEE, self.emp.id, now)
+        with self.assertNumQueries(0):
+            self.assertEqual(qr_tokens.verify_token(token, now).subject, str(self.emp.id))
+        # Still valid one rotation later, not two
+        qr_tokens.verify_token(token, now + timedelta(seconds=qr_tokens.ROTATION))
+        with self.assertRaisesMessage(qr_tokens.QRTokenError, "expired"):
+            qr_tokens.verify_token(token, now + timedelta(seconds=2 * qr_tokens.ROTATION))
+        forged = token.replace(f"e:{self.emp.id}:", f"e:{self.emp.id + 1}:")
+        for bad in (forged, f"{self.emp.id}|{now.date()}", ""):
+            with self.assertRaises(qr_tokens.QRTokenError):
+                qr_tokens.verify_token(bad, now)
+
+    def test_personal_and_kiosk_check_in(self):
+        r = self.client.get("/api/attendance/qr/")
+        self.assertEqual(r.status_code, 200)
+        self.assertLessEqual(r.data["expires_in"], qr_tokens.ROTATION)
+        with mock.patch("api.qr_tokens.qrcode.make") as render:  # PNG is cached for the window
+            self.assertEqual(self.client.get("/api/attendance/qr/").data["qr_code"], r.data["qr_code"])
+            render.assert_not_called()
+
+        other = Employee.objects.create(full_name="Other", date_hired=date(2024, 1, 1))
+        foreign = qr_tokens.make_token(qr_tokens.EMPLOYEE, other.id)
+        self.assertEqual(self.client.post("/api/attendance/qr/checkin/", {"qr_data": foreign}).status_code, 403)
+
+        gate = Site.objects.create(name="Gate", latitude="14.500000", longitude="121.000000", radius_m=100)
+        gate.employees.add(self.emp)
+        url = f"/api/attendance/kiosk/{gate.id}/qr/"
+        self.assertEqual(self.client.get(url).status_code, 403)  # admins only
+        self.user.groups.add(Group.objects.get_or_create(name="Admin")[0])
+        self.assertEqual(self.client.get(f"/api/attendance/kiosk/{gate.id + 1}/qr/").status_code, 404)
+        kiosk = self.client.get(url).data["token"]
+        r = self.client.post("/api/attendance/qr-checkin/", {"qr_data": kiosk})
+        self.assertEqual(r.status_code, 200, r.data)
+        self.assertIn("time_in", r.data)
+        att = Attendance.objects.get(employee=self.emp)
+        self.assertEqual((att.site_id, att.within_geofence), (gate.id, True))
+
+
+class GeofenceTests(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.addCleanup(cache.clear)  # cached fences outlive the rolled-back sites
+        self.emp = Employee.objects.create(full_name="Site Worker", date_hired=date(2024, 1, 1))
+        self.roamer = Employee.objects.create(full_name="No Sites", date_hired=date(2024, 1, 1))
+        self.office = Site.objects.create(name="Office", latitude="14.500000", longitude="121.000000", radius_m=200)
+        self.yard = Site.objects.create(
+            name="Yard", latitude="14.600000", longitude="121.100000",
+            polygon=[[14.598, 121.098], [14.598, 121.102], [14.602, 121.102], [14.602, 121.098]],
+        )
+        closed = Site.objects.create(name="Closed", latitude="14.500000", longitude="121.000000", radius_m=5000, is_active=False)
+        for site in (self.office, self.yard, closed):
+            site.employees.add(self.emp)
+
+    def test_point_checks_use_cached_fences(self):
+        fences_for(self.emp.id)
+        with self.assertNumQueries(0):
+            self.assertEqual(check_point(self.emp.id, 14.5005, 121.0), (self.office.id, True))
+            self.assertEqual(check_point(self.emp.id, 14.6015, 121.1015), (self.yard.id, True))
+            self.assertEqual(check_point(self.emp.id, 14.5025, 121.0), (None, False))  # ~280 m out
+            self.assertEqual(check_point(self.emp.id, None, None), (None, None))
+        self.assertEqual(check_point(self.roamer.id, 14.5005, 121.0), (None, None))
+        self.office.employees.remove(self.emp)  # drops the cached fences
+        self.assertEqual(check_point(self.emp.id, 14.5005, 121.0), (None, False))
+
+    def test_bulk_revalidation_matches_point_checks(self):
+        day = date(2025, 3, 3)
+        points = [(14.5005, 121.0), (14.5025, 121.0), (14.6015, 121.1015), (14.6025, 121.1), (14.5, 121.0)]
+        for i, (lat, lng) in enumerate(points):
+            Attendance.objects.create(employee=self.emp, date=day + timedelta(days=i), latitude=lat, longitude=lng)
+        Attendance.objects.create(employee=self.emp, date=day - timedelta(days=1))  # no coordinates
+        Attendance.objects.create(employee=self.roamer, date=day, latitude=14.5, longitude=121.0)
+
+        result = revalidate_attendance(day - timedelta(days=1), day + timedelta(days=40))
+        self.assertEqual(result, {"checked": 6, "updated": 5, "outside": 2})
+        for att in Attendance.objects.all():
+            self.assertEqual((att.site_id, att.within_geofence), check_point(att.employee_id, att.latitude, att.longitude), att)
+
+        self.office.radius_m = 300
+        self.office.save()
+        self.assertEqual(revalidate_attendance(day, day + timedelta(days=40))["updated"], 1)
+        self.assertEqual(Attendance.objects.get(date=day + timedelta(days=1)).site_id, self.office.id)
+
+    def test_time_in_records_site_and_can_enforce(self):
+        from rest_framework.test import APIClient
+        user = User.objects.create(username="worker")
+        self.emp.user = user
+        self.emp.save()
+        client = APIClient(SERVER_NAME="localhost")
+        client.force_authenticate(user)
+        with mock.patch("api.geofence.ENFORCE", True):
+            for body in ({"latitude": 14.51, "longitude": 121.0}, {}, {"latitude": 14.5001}):
+                r = client.post("/api/attendance/time-in/", body, format="json")
+                self.assertEqual(r.status_code, 400, body)
+            personal = qr_tokens.make_token(qr_tokens.EMPLOYEE, self.emp.id)
+            r = client.post("/api/attendance/qr/checkin/", {"qr_data": personal}, format="json")
+            self.assertEqual(r.status_code, 400)  # no location
+            r = client.post("/api/attendance/sync/", {"punches": [{
+                "key": "k1", "type": "in", "timestamp": timezone.now().isoformat(),
+            }]}, format="json")
+            self.assertEqual(r.data["results"][0]["result"], "rejected")
+            self.assertFalse(Attendance.objects.filter(employee=self.emp).exists())
+
+            r = client.post("/api/attendance/time-in/", {"latitude": 14.5001, "longitude": 121.0001}, format="json")
+        self.assertEqual(r.status_code, 201, r.data)
+        att = Attendance.objects.get(employee=self.emp)
+        self.assertEqual((att.site_id, att.within_geofence), (self.office.id, True))
+
+    def test_kiosk_qr_only_places_assigned_employees_at_its_site(self):
+        from rest_framework.test import APIClient
+        client = APIClient(SERVER_NAME="localhost")
+        for emp in (self.emp, self.roamer):
+            emp.user = User.objects.create(username=f"kiosk-{emp.pk}")
+            emp.save()
+        depot = Site.objects.create(name="Depot", latitude="15.000000", longitude="121.000000", radius_m=100)
+        office_kiosk = qr_tokens.make_token(qr_tokens.KIOSK, self.office.id)
+        with mock.patch("api.geofence.ENFORCE", True):
+            client.force_authenticate(self.emp.user)
+            r = client.post("/api/attendance/qr/checkin/", {"qr_data": qr_tokens.make_token(qr_tokens.KIOSK, depot.id)},
+                            format="json")
+            self.assertEqual(r.status_code, 400)  # a forwarded code from a site they don't work at
+            r = client.post("/api/attendance/qr/checkin/", {"qr_data": office_kiosk}, format="json")
+            self.assertEqual(r.status_code, 200, r.data)
+
+            client.force_authenticate(self.roamer.user)
+            r = client.post("/api/attendance/qr/checkin/", {"qr_data": office_kiosk}, format="json")
+            self.assertEqual(r.status_code, 400)
+        att = Attendance.objects.get(employee=self.emp)
+        self.assertEqual((att.site_id, att.within_geofence), (self.office.id, True))
+        self.assertFalse(Attendance.objects.filter(employee=self.roamer).exists())
+
+        r = client.post("/api/attendance/qr/checkin/", {"qr_data": office_kiosk}, format="json")
+        self.assertEqual(r.status_code, 200, r.data)  # not enforced: recorded, not refused
+        self.assertIsNone(Attendance.objects.get(employee=self.roamer).within_geofence)
+
+    def test_command_rejects_impossible_dates(self):
+        for args in (["--from", "2025-02-30"], ["--from", "2025-03-01", "--to", "2025-13-01"], ["--from", "March"]):
+            with self.subTest(args=args), self.assertRaisesMessage(CommandError, "must be YYYY-MM-DD"):
+                call_command("revalidate_geofences", *args, stdout=io.StringIO())
+
+
+class ExportJobQueueTests(TestCase):
+    def setUp(self):
+        from rest_framework.test import APIClient
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.user = User.objects.create(username="exporter")
+        self.emp = Employee.objects.create(user=self.user, full_name="Exporter", date_hired=date(2024, 1, 1))
+        Attendance.objects.create(employee=self.emp, date=date(2025, 3, 3), time_in=time(8, 0), status="Present")
+        self.client = APIClient(SERVER_NAME="localhost")
+        self.client.force_authenticate(self.user)
+
+    def test_submit_claim_run_status_and_download(self):
+        r = self.client.post("/api/exports/", {"kind": "attendance_csv"}, format="json")
+        self.assertEqual(r.status_code, 202, r.data)
+        job_id = r.data["id"]
+        self.assertEqual(self.client.get(f"/api/exports/{job_id}/download/").status_code, 409)  # still pending
+
+        job = jobs.claim_next_job()
+        self.assertEqual((job.pk, job.status, job.attempts), (job_id, ExportJob.RUNNING, 1))
+        self.assertIsNone(jobs.claim_next_job())  # nothing else queued
+        self.assertEqual(jobs.run_job(job).status, ExportJob.DONE)
+
+        status_data = self.client.get(f"/api/exports/{job_id}/").data
+        self.assertEqual(status_data["status"], ExportJob.DONE)
+        self.assertTrue(status_data["download_url"].endswith(f"/api/exports/{job_id}/download/"))
+        r = self.client.get(f"/api/exports/{job_id}/download/")
+        self.assertEqual(r.status_code, 200)
+        body = b"".join(r.streaming_content).decode()
+        self.assertIn("Exporter,2025-03-03,08:00", body)
+
+        other = User.objects.create(username="nosy")
+        self.client.force_authenticate(other)
+        self.assertEqual(self.client.get(f"/api/exports/{job_id}/").status_code, 404)
+
+    def test_exhausted_jobs_fail_without_hiding_the_rest_of_the_queue(self):
+        stale = timezone.now() - timedelta(seconds=jobs.JOB_TIMEOUT + 60)
+        dead = ExportJob.objects.create(requested_by=self.user, kind="attendance_csv", status=ExportJob.RUNNING,
+                                        started_at=stale, attempts=jobs.MAX_ATTEMPTS)
+        also_dead = ExportJob.objects.create(requested_by=self.user, kind="attendance_csv", attempts=jobs.MAX_ATTEMPTS)
+        waiting = ExportJob.objects.create(requested_by=self.user, kind="attendance_csv")
+
+        self.assertEqual(jobs.claim_next_job().pk, waiting.pk)
+        for job in (dead, also_dead):
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.error), (ExportJob.FAILED, f"Gave up after {jobs.MAX_ATTEMPTS} attempts"))
+
+    def test_failing_job_is_retried_then_given_up(self):
+        job = ExportJob.objects.create(requested_by=self.user, kind="payslip_pdf", params={"payslip_id": 999})
+        for attempt in range(1, jobs.MAX_ATTEMPTS + 1):
+            claimed = jobs.claim_next_job()
+            self.assertEqual((claimed.pk, claimed.attempts), (job.pk, attempt))
+            with self.assertLogs("api.jobs", level="ERROR"):
+                jobs.run_job(claimed)
+            job.refresh_from_db()
+            last = attempt == jobs.MAX_ATTEMPTS
+            self.assertEqual(job.status, ExportJob.FAILED if last else ExportJob.PENDING)
+            self.assertEqual(job.finished_at is not None, last)
+            self.assertTrue(job.error)
+        self.assertIsNone(jobs.claim_next_job())
+
+
+class StreamingExportTests(TestCase):
+    def setUp(self):
+        from rest_framework.test import APIClient
+        ops = Department.objects.create(name="Ops")
+        self.admin = User.objects.create(username="hr", is_staff=True)
+        self.ana = Employee.objects.create(full_name="Ana", department=ops, date_hired=date(2024, 1, 1))
+        self.ben = Employee.objects.create(full_name="Ben", date_hired=date(2024, 1, 1))
+        for day in range(1, 4):
+            for emp in (self.ana, self.ben):
+                Attendance.objects.create(employee=emp, date=date(2025, 3, day), time_in=time(8, 0), status="Present")
+        Payslip.objects.create(employee=self.ana, period_from=date(2025, 3, 1), period_to=date(2025, 3, 15),
+                               gross_pay=1000, net_pay=900)
+        self.client = APIClient(SERVER_NAME="localhost")
+        self.client.force_authenticate(self.admin)
+
+    def test_iter_csv_yields_fixed_size_chunks(self):
+        chunks = list(iter_csv(["n"], ([i] for i in range(7)), rows_per_yield=3))
+        self.assertEqual([c.decode().count("\r\n") for c in chunks], [3, 3, 2])  # header counts towards the first
+        self.assertEqual(b"".join(chunks).decode().split("\r\n")[:3], ["n", "0", "1"])
+
+    def test_csv_export_streams_filtered_rows(self):
+        r = self.client.get("/api/attendance/export/csv/",
+                            {"date_from": "2025-03-02", "department": str(self.ana.department_id)})
+        self.assertEqual(r.status_code, 200)
+        self.assertTrue(r.streaming)
+        lines = b"".join(r.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], ",".join(ATTENDANCE_HEADER))
+        self.assertEqual([line.split(",")[:2] for line in lines[1:]], [["Ana", "2025-03-02"], ["Ana", "2025-03-03"]])
+
+    def test_excel_exports_are_spooled_to_a_temporary_file(self):
+        for url in ("/api/attendance/export/excel/", "/api/admin/payslips/export/excel/"):
+            spooled, make_spool = [], tempfile.TemporaryFile
+            with mock.patch("api.exports.tempfile.TemporaryFile",
+                            side_effect=lambda: spooled.append(make_spool()) or spooled[-1]):
+                r = self.client.get(url)
+            self.assertEqual(r.status_code, 200)
+            self.assertEqual(r["Content-Type"], XLSX_CONTENT_TYPE)
+            self.assertTrue(b"".join(r.streaming_content).startswith(b"PK"))  # zip container
+            r.close()
+            self.assertEqual([f.closed for f in spooled], [True])
+
+    def test_write_xlsx_keeps_types_and_column_formats(self):
+        import openpyxl
+        rows = ((f"E{i}", date(2025, 3, i), time(8, i), None if i == 2 else Decimal(f"{i}.25")) for i in range(1, 4))
+        buf = io.BytesIO()
+        write_xlsx(buf, "Report", ["Name", "Date", "In", "Pay"], rows, [None, DATE_FORMAT, TIME_FORMAT, MONEY_FORMAT])
+        ws = openpyxl.load_workbook(io.BytesIO(buf.getvalue()))["Report"]
+        cells = list(ws.iter_rows(min_row=2))
+        self.assertEqual([c.value for c in next(ws.iter_rows(max_row=1))], ["Name", "Date", "In", "Pay"])
+        self.assertEqual([[c.value for c in row] for row in cells], [
+            ["E1", datetime(2025, 3, 1), time(8, 1), 1.25],
+            ["E2", datetime(2025, 3, 2), time(8, 2), None],
+            ["E3", datetime(2025, 3, 3), time(8, 3), 3.25],
+        ])
+        # each row keeps its own format although write_xlsx reuses one styled cell per column
+        for row in cells:
+            self.assertEqual([c.number_format for c in row[:3]], ["General", DATE_FORMAT, TIME_FORMAT])
+        self.assertEqual([row[3].number_format for row in cells], [MONEY_FORMAT, "General", MONEY_FORMAT])
+
+    def test_excel_export_content(self):
+        import openpyxl
+        r = self.client.get("/api/admin/payslips/export/excel/")
+        ws = openpyxl.load_workbook(io.BytesIO(b"".join(r.streaming_content)))["Payslips"]
+        self.assertEqual([list(row) for row in ws.iter_rows(values_only=True)], [
+            ["Employee Name", "Period From", "Period To", "Gross Pay", "Net Pay"],
+            ["Ana", datetime(2025, 3, 1), datetime(2025, 3, 15), 1000, 900],
+        ])
+
+    def test_invalid_filters_are_rejected(self):
+        for params in ({"date_from": "2025-02-30"}, {"date_to": "2025-13-01"}, {"date_from": "03/01/2025"},
+                       {"date_from": "2025-03-02", "date_to": "2025-03-01"}, {"department": "ops"}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get("/api/attendance/export/csv/", params).status_code, 400)
+                self.assertEqual(self.client.get("/api/admin/payslips/export/excel/", params).status_code, 400)
+
+
+class BulkPayslipPdfTests(TestCase):
+    def setUp(self):
+        from rest_framework.test import APIClient
+        self.ops = Department.objects.create(name="Ops")
+        for i in range(payslip_pdf.PARALLEL_THRESHOLD + 5):
+            emp = Employee.objects.create(full_name=f"Worker {i:02d}", department=self.ops if i % 2 else None,
+                                          date_hired=date(2024, 1, 1))
+            Payslip.objects.create(employee=emp, period_from=date(2025, 3, 1), period_to=date(2025, 3, 15),
+                                   gross_pay=1000 + i, net_pay=900 + i)
+        self.admin = User.objects.create(username="payroll", is_staff=True)
+        self.client = APIClient(SERVER_NAME="localhost")
+        self.client.force_authenticate(self.admin)
+
+    @mock.patch.object(payslip_pdf, "CHUNK", 4)  # several chunks, so ordering across workers is exercised
+    def test_process_pool_output_matches_serial_rendering(self):
+        from pypdf import PdfReader
+        payslips = payslip_pdf.payslips_for_period(date(2025, 3, 1), date(2025, 3, 31))
+        serial, pooled = io.BytesIO(), io.BytesIO()
+        self.assertEqual(payslip_pdf.write_payslips_pdf(serial, payslips, workers=1), len(payslips))
+        with mock.patch.object(payslip_pdf.connections, "close_all") as close_all:
+            self.assertEqual(payslip_pdf.write_payslips_pdf(pooled, payslips, workers=2), len(payslips))
+        close_all.assert_not_called()  # the parent keeps its connection; only workers drop theirs
+        texts = [[page.extract_text() for page in PdfReader(buf).pages] for buf in (serial, pooled)]
+        self.assertEqual(texts[0], texts[1])
+        self.assertEqual(len(texts[1]), len(payslips))
+        self.assertIn("Worker 00", texts[1][0])  # pages keep the query order
+
+        pooled_zip = io.BytesIO()
+        self.assertEqual(payslip_pdf.write_payslips_zip(pooled_zip, payslips, workers=2), len(payslips))
+        with zipfile.ZipFile(pooled_zip) as zf:
+            self.assertEqual(zf.namelist(), [payslip_pdf.payslip_filename(ps) for ps in payslips])
+            self.assertTrue(all(zf.read(name).startswith(b"%PDF") for name in zf.namelist()))
+
+    def test_bulk_endpoint_filters_by_department(self):
+        r = self.client.get("/api/admin/payslips/pdf/bulk/",
+                            {"period_from": "2025-03-01", "period_to": "2025-03-31", "department": self.ops.pk, "type": "zip"})
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r["Content-Type"], "application/zip")
+        with zipfile.ZipFile(io.BytesIO(b"".join(r.streaming_content))) as zf:
+            self.assertEqual(len(zf.namelist()), Employee.objects.filter(department=self.ops).count())
+
+    def test_invalid_periods_are_rejected(self):
+        for params in ({"period_from": "2025-02-30", "period_to": "2025-03-31"},
+                       {"period_from": "2025-03-01"},
+                       {"period_from": "2025-03-31", "period_to": "2025-03-01"},
+                       {"period_from": "2025-03-01", "period_to": "2025-03-31", "department": "ops"},
+                       {"period_from": "2025-03-01", "period_to": "2025-03-31", "type": "docx"}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get("/api/admin/payslips/pdf/bulk/", params).status_code, 400)
+        r = self.client.post("/api/exports/", {"kind": "payslips_zip", "period_from": "2025-03-01",
+                                                "period_to": "2025-04-31"}, format="json")
+        self.assertEqual(r.status_code, 400)
+
+    def test_employee_pdf_rejects_impossible_dates(self):
+        from rest_framework.test import APIRequestFactory, force_authenticate
+        from .views import export_payslips_pdf_employee
+        emp = Employee.objects.first()
+        request = APIRequestFactory().get("/", {"period_from": "2025-02-30"})
+        force_authenticate(request, self.admin)
+        self.assertEqual(export_payslips_pdf_employee(request, employee_id=emp.pk).status_code, 400)
+        request = APIRequestFactory().get("/", {"period_from": "2025-03-01"})
+        force_authenticate(request, self.admin)
+        self.assertEqual(export_payslips_pdf_employee(request, employee_id=emp.pk)["Content-Type"], "application/pdf")
+
+
+class PayrollRunTests(TestCase):
+    PERIOD = (date(2025, 3, 1), date(2025, 3, 15))
+
+    def setUp(self):
+        from rest_framework.test import APIClient
+        self.ops = Department.objects.create(name="Ops")
+        self.ana = Employee.objects.create(full_name="Ana", department=self.ops, date_hired=date(2024, 1, 1), daily_rate=650)
+        self.ben = Employee.objects.create(full_name="Ben", department=self.ops, date_hired=date(2024, 1, 1), daily_rate=700)
+        self.cy = Employee.objects.create(full_name="Cy", date_hired=date(2024, 1, 1), daily_rate=800)  # no attendance
+        for day, status, late in [(3, "Present", 0), (4, "Late", 12), (5, "Absent", 0), (6, "present", 7), (20, "Present", 30)]:
+            Attendance.objects.create(employee=self.ana, date=date(2025, 3, day), status=status, late_minutes=late)
+        Attendance.objects.create(employee=self.ben, date=date(2025, 3, 3), status="Late", late_minutes=45)
+        self.admin = User.objects.create(username="payroll-admin", is_staff=True)
+        self.client = APIClient(SERVER_NAME="localhost")
+        self.client.force_authenticate(self.admin)
+
+    def test_payslips_match_per_employee_computation(self):
+        summary = run_payroll(*self.PERIOD)
+        self.assertEqual((summary["employees"], summary["created"], summary["skipped"]), (3, 3, []))
+        for emp in (self.ana, self.ben, self.cy):
+            expected = compute_payroll(emp, *self.PERIOD, emp.daily_rate)
+            ps = Payslip.objects.get(employee=emp, period_from=self.PERIOD[0], period_to=self.PERIOD[1])
+            for field in ("days_worked", "late_undertime", "gross_pay", "total_deductions", "net_pay"):
+                self.assertEqual(getattr(ps, field), expected[field], (emp.full_name, field))
+        self.assertEqual(summary["net_pay_total"], sum(Payslip.objects.values_list("net_pay", flat=True)))
+
+    def test_rerun_is_idempotent_and_filters_scope(self):
+        self.assertEqual(run_payroll(*self.PERIOD, department_id=self.ops.pk)["created"], 2)
+        again = run_payroll(*self.PERIOD)
+        self.assertEqual((again["created"], sorted(again["skipped"])), (1, sorted([self.ana.pk, self.ben.pk])))
+        self.assertEqual(run_payroll(*self.PERIOD, employee_ids=[self.cy.pk])["created"], 0)
+        self.assertEqual(Payslip.objects.count(), 3)
+        self.assertEqual(run_payroll(*self.PERIOD, employee_ids=[self.ana.pk], skip_existing=False)["created"], 1)
+
+    def test_endpoint_validates_input(self):
+        url = "/api/admin/payroll-run/"
+        period = {"period_from": "2025-03-01", "period_to": "2025-03-15"}
+        for body in ({"period_from": "2025-02-30", "period_to": "2025-03-15"}, {"period_from": "2025-03-01"},
+                     {"period_from": "2025-03-15", "period_to": "2025-03-01"},
+                     {**period, "employee_ids": "1,2"}, {**period, "employee_ids": [self.ana.pk, "x"]},
+                     {**period, "department_id": "ops"}):
+            with self.subTest(body=body):
+                self.assertEqual(self.client.post(url, body, format="json").status_code, 400)
+        self.assertFalse(Payslip.objects.exists())
+
+        r = self.client.post(url, {**period, "employee_ids": [str(self.ana.pk), self.cy.pk]}, format="json")
+        self.assertEqual((r.status_code, r.data["created"]), (201, 2))
+        r = self.client.post(url, {**period, "department_id": str(self.ops.pk)}, format="json")
+        self.assertEqual((r.status_code, r.data["created"], r.data["skipped"]), (201, 1, [self.ana.pk]))
+
+    def test_command(self):
+        out = io.StringIO()
+        call_command("run_payroll", "2025-03-01", "2025-03-15", "--employee", str(self.ben.pk), stdout=out)
+        self.assertIn("1 payslips created, 0 skipped", out.getvalue())
+        call_command("run_payroll", "2025-03-01", "2025-03-15", stdout=out)
+        self.assertIn("2 payslips created, 1 skipped", out.getvalue())
+        with self.assertRaises(CommandError):
+            call_command("run_payroll", "2025-02-30", "2025-03-15", stdout=out)
+
+
+class AttendanceTrendTests(TestCase):
+    def setUp(self):
+        from rest_framework.test import APIClient
+        self.today = timezone.now().date()
+        ops = Department.objects.create(name="Ops")
+        self.ops_id = ops.pk
+        ana = Employee.objects.create(full_name="Ana", department=ops, date_hired=date(2024, 1, 1))
+        ben = Employee.objects.create(full_name="Ben", date_hired=date(2024, 1, 1))
+        for emp, days_ago, status in [(ana, 0, "Present"), (ben, 0, "Late"), (ana, 2, "present"),
+                                      (ben, 2, "Present"), (ana, 40, "Present")]:
+            Attendance.objects.create(employee=emp, date=self.today - timedelta(days=days_ago), status=status)
+        self.client = APIClient(SERVER_NAME="localhost")
+        self.client.force_authenticate(User.objects.create(username="trend", is_staff=True))
+
+    def trend(self, **params):
+        r = self.client.get("/api/admin/attendance-trend/", params)
+        self.assertEqual(r.status_code, 200, r.data)
+        return [(row["date"], row["count"]) for row in r.data]
+
+    def day(self, days_ago):
+        return str(self.today - timedelta(days=days_ago))
+
+    def test_counts_come_from_one_grouped_query_and_missing_days_are_zero(self):
+        with CaptureQueriesContext(connection) as ctx:
+            data = self.trend(days=5)
+        self.assertEqual(sum(Attendance._meta.db_table in q["sql"] for q in ctx.captured_queries), 1)
+        self.assertEqual(data, [(self.day(4), 0), (self.day(3), 0), (self.day(2), 2), (self.day(1), 0), (self.day(0), 2)])
+        self.assertEqual(len(self.trend()), 30)
+        self.assertEqual(sum(count for _, count in self.trend(days=10_000)), 5)  # clamped to TREND_MAX_DAYS
+
+    def test_filters(self):
+        self.assertEqual(self.trend(days=3, department=self.ops_id), [(self.day(2), 1), (self.day(1), 0), (self.day(0), 1)])
+        self.assertEqual(self.trend(days=3, status="PRESENT"), [(self.day(2), 2), (self.day(1), 0), (self.day(0), 1)])
+        for params in ({"days": "week"}, {"department": "ops"}):
+            self.assertEqual(self.client.get("/api/admin/attendance-trend/", params).status_code, 400)
+
+
+class DashboardStatsTests(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.today = timezone.localdate()
+        self.ana = Employee.objects.create(full_name="Ana", date_hired=date(2024, 1, 1), daily_rate=500)
+        ben = Employee.objects.create(full_name="Ben", date_hired=date(2024, 1, 1))
+        Attendance.objects.create(employee=self.ana, date=self.today, status="Present")
+        Attendance.objects.create(employee=ben, date=self.today, status="Late")
+        LeaveRequest.objects.create(employee=ben, start_date=self.today, end_date=self.today, reason="x", status="Approved")
+        LeaveRequest.objects.create(employee=ben, start_date=self.today, end_date=self.today, reason="y")
+
+    def test_counters_come_from_one_query_then_the_cache(self):
+        with self.assertNumQueries(1):
+            stats = get_dashboard_stats()
+        self.assertEqual(stats, {"employee_count": 2, "present_today": 1, "on_leave_today": 1,
+                                 "pending_leaves": 1, "payroll_count": 0})
+        with self.assertNumQueries(0):
+            self.assertEqual(get_dashboard_stats(), stats)
+
+    def test_writes_drop_the_cached_counters(self):
+        get_dashboard_stats()
+        Attendance.objects.filter(employee=self.ana).delete()  # queryset delete still sends post_delete per row
+        self.assertEqual(get_dashboard_stats()["present_today"], 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            run_payroll(self.today, self.today)  # bulk_create: invalidated on commit
+        self.assertEqual(get_dashboard_stats()["payroll_count"], 2)
+
+
+class PayslipPdfCacheTests(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        from rest_framework.test import APIClient
+        cache.clear()
+        self.addCleanup(cache.clear)
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir, ignore_errors=True)
+        patcher = mock.patch.object(payslip_pdf, "CACHE_DIR", cache_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.cache_dir = cache_dir
+        emp = Employee.objects.create(full_name="Ana", date_hired=date(2024, 1, 1))
+        self.ps = Payslip.objects.create(employee=emp, period_from=date(2025, 3, 1), period_to=date(2025, 3, 15),
+                                         gross_pay=1000, net_pay=900)
+        self.admin = User.objects.create(username="pdf-admin", is_staff=True)
+        self.admin.groups.add(Group.objects.get_or_create(name="Admin")[0])
+        self.client = APIClient(SERVER_NAME="localhost")
+        self.client.force_authenticate(self.admin)
+        self.url = f"/api/admin/payslips/{self.ps.pk}/pdf/"
+
+    def payslip(self):
+        return Payslip.objects.select_related("employee__department").get(pk=self.ps.pk)
+
+    def test_renders_once_per_payslip_version(self):
+        with mock.patch.object(payslip_pdf, "write_payslip_pdf", wraps=payslip_pdf.write_payslip_pdf) as render:
+            path, fingerprint = payslip_pdf.cached_payslip_pdf(self.payslip())
+            self.assertEqual(payslip_pdf.cached_payslip_pdf(self.payslip()), (path, fingerprint))
+            self.assertEqual(render.call_count, 1)
+            with open(path, "rb") as fh:
+                self.assertTrue(fh.read().startswith(b"%PDF"))
+
+            Payslip.objects.filter(pk=self.ps.pk).update(net_pay=950)
+            new_path, new_fingerprint = payslip_pdf.cached_payslip_pdf(self.payslip())
+            self.assertEqual(render.call_count, 2)
+        self.assertNotEqual(new_fingerprint, fingerprint)
+        self.assertEqual(os.listdir(self.cache_dir), [os.path.basename(new_path)])  # older render dropped
+
+        Employee.objects.filter(pk=self.ps.employee_id).update(full_name="Ana Cruz")  # printed on the slip too
+        self.assertNotEqual(payslip_pdf.cached_payslip_pdf(self.payslip())[1], new_fingerprint)
+
+    def test_etag_and_not_modified(self):
+        r = self.client.get(self.url)
+        self.assertEqual(r.status_code, 200)
+        self.assertTrue(b"".join(r.streaming_content).startswith(b"%PDF"))
+        etag = r["ETag"]
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=r["Last-Modified"]).status_code, 304)
+
+        r = self.client.patch(f"/api/payslips/{self.ps.pk}/", {"net_pay": "950.00"}, format="json")
+        self.assertEqual(r.status_code, 200, r.data)
+        self.assertEqual(os.listdir(self.cache_dir), [])  # perform_update dropped the render
+        r = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(r.status_code, 200)
+        self.assertNotEqual(r["ETag"], etag)
+        r.close()
+
+        self.client.delete(f"/api/payslips/{self.ps.pk}/")
+        self.assertEqual(os.listdir(self.cache_dir), [])
@@ -3,16 +3,19 @@ from rest_framework.routers import DefaultRouter
 from django.contrib.auth import views as auth_views
 from .views import (
     hello_world, my_profile, register_user, change_password,
-    generate_attendance_qr, qr_attendance_checkin, time_in, time_out,
-    export_attendance_csv, export_attendance_excel, save_push_token, send_push_notification,
+    generate_attendance_qr, kiosk_attendance_qr, qr_attendance_checkin, time_in, time_out, sync_attendance_punches,
+    export_attendance_csv, export_attendance_excel, save_push_token,
+    submit_export, export_job_status, export_job_download, send_push_notification,
+    broadcast_push, push_delivery_stats,
     admin_dashboard_stats, attendance_trend, dashboard_stats,
     admin_list_employees, admin_list_leaves, admin_decide_leave,
     admin_list_users, admin_demote_user, admin_reset_password,
     accept_invite,
-    admin_create_payslip, export_payslips_csv, export_payslips_excel, export_payslip_pdf_single,
+    admin_create_payslip, admin_run_payroll, export_payslips_csv, export_payslips_excel, export_payslip_pdf_single,
+    export_payslips_pdf_bulk,
     EmployeePhotoUploadView,
     UserViewSet, EmployeeViewSet, PayrollViewSet, PayslipViewSet, AttendanceViewSet,
-    DepartmentViewSet, LeaveTypeViewSet, LeaveRequestViewSet,
+    DepartmentViewSet, LeaveTypeViewSet, LeaveRequestViewSet, ShiftViewSet, ShiftAssignmentViewSet, SiteViewSet,
     AnnouncementViewSet, NotificationViewSet, AuditLogViewSet,
     UserInvitationViewSet, AuditLogList
 )
@@ -25,6 +28,9 @@ router.register(r'payslips', PayslipViewSet)
 router.register(r'attendances', AttendanceViewSet, basename='attendances')
 router.register(r'departments', DepartmentViewSet)
 router.register(r'leave-types', LeaveTypeViewSet)
+router.register(r'shifts', ShiftViewSet)
+router.register(r'shift-assignments', ShiftAssignmentViewSet)
+router.register(r'sites', SiteViewSet)
 router.register(r'leaves', LeaveRequestViewSet, basename='leaves')
 router.register(r'announcements', AnnouncementViewSet)
 router.register(r'notifications', NotificationViewSet, basename='notification')
@@ -41,14 +47,24 @@ urlpatterns = [
     # attendance
     path('attendance/qr/', generate_attendance_qr),
     path('attendance/qr/checkin/', qr_attendance_checkin),
+    path('attendance/qr-checkin/', qr_attendance_checkin),  # path the mobile app posts to
+    path('attendance/kiosk/<int:site_id>/qr/', kiosk_attendance_qr),
     path('attendance/time-in/', time_in),
     path('attendance/time-out/', time_out),
+    path('attendance/sync/', sync_attendance_punches),
     path('attendance/export/csv/', export_attendance_csv),
     path('attendance/export/excel/', export_attendance_excel),
 
+    # async exports
+    path('exports/', submit_export),
+    path('exports/<int:job_id>/', export_job_status),
+    path('exports/<int:job_id>/download/', export_job_download, name='export_job_download'),
+
     # push
     path('save-push-token/', save_push_token),
     path('admin/send-push/', send_push_notification),
+    path('admin/push-broadcast/', broadcast_push),
+    path('admin/push-stats/', push_delivery_stats),
 
     # admin stats & lists
     path('admin/dashboard-stats/', admin_dashboard_stats),
@@ -78,9 +94,11 @@ urlpatterns = [
 
     # payslips
     path('admin/create-payslip/', admin_create_payslip),
+    path('admin/payroll-run/', admin_run_payroll),
     path('admin/payslips/export/csv/', export_payslips_csv),
     path('admin/payslips/export/excel/', export_payslips_excel),
     path('admin/payslips/<int:payslip_id>/pdf/', export_payslip_pdf_single),
+    path('admin/payslips/pdf/bulk/', export_payslips_pdf_bulk),
 
     path('', include(router.urls)),
 ]
\ No newline at end of file
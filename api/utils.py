@@ -1,16 +1,17 @@
 import logging
 from decimal import Decimal, ROUND_HALF_UP
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Iterable, Optional, Tuple
 
-import requests
+import pandas as pd
 from django.contrib.auth.models import User
+from django.db.models import Count, F, Q, Sum, Value
+from django.db.models.functions import Coalesce
 
 from .models import Attendance, AuditLog
+from .push_notifications import send_push_notification
 
 logger = logging.getLogger(__name__)
 
-EXPO_PUSH_URL = "https://exp.host/--/api/v2/push/send"
-
 def _to_decimal(value: Any, default="0") -> Decimal:
     try:
         if value is None:
@@ -26,19 +27,10 @@ def _q(value: Decimal) -> Decimal:
 
 # ---- Push ----
 def send_expo_push(token: str, title: str, body: str, data: Optional[Dict[str, Any]] = None, timeout: int = 10) -> Dict[str, Any]:
-    payload = {"to": token, "sound": "default", "title": title, "body": body, "data": data or {}, "priority": "high"}
-    headers = {"Accept": "application/json", "Content-Type": "application/json"}
-    try:
-        r = requests.post(EXPO_PUSH_URL, json=payload, headers=headers, timeout=timeout)
-        try:
-            raw = r.json()
-        except Exception:
-            raw = {"_text": r.text}
-        ok = r.status_code == 200 and not raw.get("errors")
-        return {"ok": ok, "raw": raw}
-    except requests.RequestException as e:
-        logger.exception("Expo push failed: %s", e)
-        return {"ok": False, "raw": {"error": str(e)}}
+    """Single-token send over the shared push transport (api.push_notifications)."""
+    result = send_push_notification([token], title, body, data=data, timeout=timeout)
+    raw = result["responses"][-1] if result["responses"] else {"errors": result["failed"]}
+    return {"ok": result["ok"], "raw": raw}
 
 # ---- Audit log ----
 def log_action(user: Optional[User], action: str, details: Optional[Dict[str, Any]] = None) -> None:
@@ -48,10 +40,15 @@ def log_action(user: Optional[User], action: str, details: Optional[Dict[str, An
         logger.exception("Failed to write AuditLog")
 
 # ---- Payroll ----
-def compute_payroll(
-    employee,
-    period_from,
-    period_to,
+# A day counts as worked when the employee timed in, or when the status was
+# set to Present/Late by hand (case-insensitive).
+WORKED_DAY = Q(time_in__isnull=False) | Q(status__iexact="present") | Q(status__iexact="late")
+# Minutes deducted per day: late arrival plus leaving before the shift end
+LATE_UNDERTIME = F("late_minutes") + F("undertime_minutes")
+
+def payroll_totals(
+    days_worked: int,
+    total_late_mins: int,
     daily_rate: Any,
     *,
     overtime_pay: Any = 0,
@@ -62,25 +59,13 @@ def compute_payroll(
     phic: Any = 200,
     tax: Any = 0,
 ) -> Dict[str, Any]:
+    """Turn attendance counters into payslip amounts (no DB access)."""
     daily_rate = _to_decimal(daily_rate)
     overtime_pay = _to_decimal(overtime_pay)
     allowance = _to_decimal(allowance)
     late_rate_per_minute = _to_decimal(late_rate_per_minute)
     sss = _to_decimal(sss); hdmf = _to_decimal(hdmf); phic = _to_decimal(phic); tax = _to_decimal(tax)
 
-    qs = Attendance.objects.filter(employee=employee, date__gte=period_from, date__lte=period_to)
-
-    days_worked = 0
-    total_late_mins = 0
-    for att in qs:
-        worked = bool(att.time_in) or (att.status or "").lower() in {"present", "late"}
-        if worked:
-            days_worked += 1
-        try:
-            total_late_mins += int(getattr(att, "late_minutes", 0) or 0)
-        except (TypeError, ValueError):
-            pass
-
     late_undertime = _q(_to_decimal(total_late_mins) * late_rate_per_minute)
     gross_pay = _q(_to_decimal(days_worked) * daily_rate + overtime_pay + allowance)
     total_deductions = _q(late_undertime + sss + hdmf + phic + tax)
@@ -97,3 +82,78 @@ def compute_payroll(
         # loans/CA defaulted to 0; you can override when creating the Payslip
         "sss_loan": _to_decimal(0), "hdmf_loan": _to_decimal(0), "cash_advance": _to_decimal(0), "sss_mpf": _to_decimal(0),
     }
+
+def attendance_counters(employee, period_from, period_to) -> Tuple[int, int]:
+    """(days_worked, total late + undertime minutes) for one employee, in a single aggregate query."""
+    agg = (
+        Attendance.objects
+        .filter(employee=employee, date__gte=period_from, date__lte=period_to)
+        .aggregate(
+            days_worked=Count("id", filter=WORKED_DAY),
+            late_minutes=Coalesce(Sum(LATE_UNDERTIME), Value(0)),
+        )
+    )
+    return agg["days_worked"], agg["late_minutes"]
+
+def attendance_counters_reference(employee, period_from, period_to) -> Tuple[int, int]:
+    """Row-by-row version of attendance_counters, kept as the reference for equivalence tests."""
+    qs = Attendance.objects.filter(employee=employee, date__gte=period_from, date__lte=period_to)
+
+    days_worked = 0
+    total_late_mins = 0
+    for att in qs:
+        worked = bool(att.time_in) or (att.status or "").lower() in {"present", "late"}
+        if worked:
+            days_worked += 1
+        try:
+            total_late_mins += int(getattr(att, "late_minutes", 0) or 0) + int(att.undertime_minutes or 0)
+        except (TypeError, ValueError):
+            pass
+    return days_worked, total_late_mins
+
+def compute_payroll(
+    employee,
+    period_from,
+    period_to,
+    daily_rate: Any,
+    *,
+    overtime_pay: Any = 0,
+    allowance: Any = 0,
+    late_rate_per_minute: Any = 10,
+    sss: Any = 400,
+    hdmf: Any = 100,
+    phic: Any = 200,
+    tax: Any = 0,
+) -> Dict[str, Any]:
+    days_worked, total_late_mins = attendance_counters(employee, period_from, period_to)
+    return payroll_totals(
+        days_worked, total_late_mins, daily_rate,
+        overtime_pay=overtime_pay, allowance=allowance, late_rate_per_minute=late_rate_per_minute,
+        sss=sss, hdmf=hdmf, phic=phic, tax=tax,
+    )
+
+
+# ---- Bulk writes ----
+def update_changed(model, frame, fields: Iterable[str], batch_size: int = 1000) -> int:
+    """
+    Write recomputed columns back as UPDATE ... SET col = v WHERE id IN (...),
+    one statement per distinct new value (and per batch_size ids). `frame` is
+    a pandas DataFrame with "id", each field and a boolean "<field>_changed".
+    Derived columns take few distinct values however many rows there are, and
+    unlike bulk_update there is no per-row CASE expression to build.
+
+    Returns the number of distinct rows written.
+    """
+    written = set()
+    for field in fields:
+        rows = frame.loc[frame[f"{field}_changed"], ["id", field]]
+        for value, ids in rows.groupby(field, dropna=False)["id"]:
+            ids = ids.tolist()
+            written.update(ids)
+            if pd.isna(value):  # NaN/NA: the column becomes NULL
+                value = None
+            elif hasattr(value, "item"):
+                value = value.item()
+            for i in range(0, len(ids), batch_size):
+                model.objects.filter(id__in=ids[i:i + batch_size]).update(**{field: value})
+    return len(written)
@@ -1,10 +1,11 @@
-from django.http import HttpResponse, JsonResponse
+from django.http import FileResponse, HttpResponse, JsonResponse
 from django.urls import reverse
 from django.conf import settings
 
 from rest_framework import status, generics, permissions, filters, viewsets
 from rest_framework.decorators import api_view, permission_classes, action
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
+from rest_framework.pagination import PageNumberPagination
 from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.response import Response
 from rest_framework.views import APIView
@@ -13,14 +14,13 @@ from django.contrib.auth.models import User
 from django.contrib.auth.tokens import default_token_generator
 from django.contrib.auth.hashers import make_password
 
+from django.db.models import Count
 from django.utils import timezone
-from datetime import datetime, timedelta, date
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from datetime import timedelta
 
-from io import BytesIO
-import base64
-import csv
-import openpyxl
-import qrcode
 import os
 
 from reportlab.pdfgen import canvas
@@ -28,18 +28,43 @@ from reportlab.lib.pagesizes import A4
 from django.core.mail import send_mail
 from django.template.loader import render_to_string
 
-from .utils import compute_payroll, send_expo_push, log_action
+from .utils import compute_payroll, log_action
+from .payroll import run_payroll
+from .dashboard import get_dashboard_stats
+from .exports import (
+    ExportFilterError, parse_export_filters, csv_streaming_response, EXPORT_FILTER_KEYS,
+    attendance_export_rows, payslip_export_rows, ATTENDANCE_HEADER, PAYSLIP_HEADER,
+    xlsx_response, spooled_response, ATTENDANCE_XLSX_FORMATS, PAYSLIP_XLSX_FORMATS,
+)
+from .payslip_pdf import (
+    payslip_filename, payslips_for_period, write_payslips_pdf, write_payslips_zip,
+    cached_payslip_pdf, invalidate_payslip_pdf,
+)
+from .jobs import enqueue_export, artifact_filename
+from .outbox import enqueue_notification, enqueue_broadcast, delivery_stats
+from .notifications import unread_count, invalidate_unread_count
+from .pagination import KeysetPagination
+from .querysets import QueryProfileMixin, EMPLOYEE, PAYROLL, PAYSLIP, LEAVE_REQUEST
 from .permissions import IsAdmin, IsHR, IsEmployee
+from .roles import Roles, has_role
+from .authentication import employee_id_for
+from .attendance import check_in, parse_coordinate
+from .schedules import shift_for, undertime
+from .punch_sync import sync_punches, PunchSyncError
+from . import qr_tokens
+from .geofence import validate_kiosk_punch, validate_punch
 
 from .models import (
     Employee, Payroll, Attendance, Payslip, Department, LeaveType, LeaveRequest,
-    Announcement, AppNotification, AuditLog, PushToken, UserInvitation
+    Announcement, AppNotification, AuditLog, PushToken, UserInvitation, ExportJob, ROLE_CHOICES,
+    Shift, ShiftAssignment, Site,
 )
 from .serializers import (
     EmployeeSerializer, PayrollSerializer, AttendanceSerializer, PayslipSerializer,
     DepartmentSerializer, LeaveTypeSerializer, LeaveRequestSerializer,
     AnnouncementSerializer, NotificationSerializer, AuditLogSerializer,
-    RegisterSerializer, UserInvitationSerializer, PushTokenSerializer
+    RegisterSerializer, UserInvitationSerializer, PushTokenSerializer, ExportJobSerializer,
+    ShiftSerializer, ShiftAssignmentSerializer, SiteSerializer,
 )
 
 
@@ -66,26 +91,37 @@ def register_user(request):
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 # --- Admin Employee & Leave List ---
+def _paginated(request, queryset, serializer_class):
+    """One page of `queryset` in the default page-number envelope."""
+    paginator = PageNumberPagination()
+    paginator.page_size_query_param = 'page_size'
+    paginator.max_page_size = 100
+    page = paginator.paginate_queryset(queryset, request)
+    serializer = serializer_class(page, many=True, context={'request': request})
+    return paginator.get_paginated_response(serializer.data)
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def admin_list_employees(request):
     if not request.user.is_staff:
         return Response({'error': 'Forbidden'}, status=403)
-    employees = Employee.objects.all()
-    serializer = EmployeeSerializer(employees, many=True)
-    return Response(serializer.data)
+    employees = EMPLOYEE.apply(Employee.objects.order_by('full_name', 'id'))
+    return _paginated(request, employees, EmployeeSerializer)
 
 class AuditLogList(generics.ListAPIView):
     queryset = AuditLog.objects.all()
     serializer_class = AuditLogSerializer
     permission_classes = [IsAdminUser]
+    filter_backends = [filters.SearchFilter]
+    search_fields = ['action', 'user__username']
+    pagination_class = KeysetPagination
+    keyset_ordering = ('-timestamp', '-id')
 
 @api_view(['GET'])
 @permission_classes([IsAdmin])
 def admin_list_leaves(request):
-    leaves = LeaveRequest.objects.all().order_by('-date_requested')
-    serializer = LeaveRequestSerializer(leaves, many=True)
-    return Response(serializer.data)
+    leaves = LEAVE_REQUEST.apply(LeaveRequest.objects.order_by('-date_requested', '-id'))
+    return _paginated(request, leaves, LeaveRequestSerializer)
 
 # --- Admin Approve/Reject Leave ---
 @api_view(['POST'])
@@ -114,14 +150,7 @@ def admin_decide_leave(request, pk):
 @api_view(['GET'])
 @permission_classes([IsAdminUser])
 def admin_dashboard_stats(request):
-    today = date.today()
-    return Response({
-        'employee_count': Employee.objects.count(),
-        'present_today': Attendance.objects.filter(date=today, status__iexact='Present').count(),
-        'on_leave_today': LeaveRequest.objects.filter(start_date__lte=today, end_date__gte=today, status__iexact='Approved').count(),
-        'pending_leaves': LeaveRequest.objects.filter(status__iexact='Pending').count(),
-        'payroll_count': Payroll.objects.count(),
-    })
+    return Response(get_dashboard_stats())
 
 # --- Change Password ---
 @api_view(['POST'])
@@ -148,136 +177,310 @@ def send_push_notification(request):
     data = request.data.get('data', {})
     if not user_id or not body:
         return Response({'error': 'Missing user_id or body'}, status=400)
-    try:
-        push_token = PushToken.objects.get(user__id=user_id)
-    except PushToken.DoesNotExist:
+    if not PushToken.objects.filter(user__id=user_id).exists():
         return Response({'error': 'User has no push token'}, status=404)
-    result = send_expo_push(push_token.expo_push_token, title, body, data)
-    return Response({'result': result})
+    # Delivery happens in `manage.py notification_worker`, never inside this request
+    queued = enqueue_notification([user_id], title, body, data=data)
+    return Response({'status': 'queued', 'queued': queued['push']}, status=202)
+
+# --- Push broadcast (department / role / everyone) ---
+@api_view(['POST'])
+@permission_classes([IsAdmin])
+def broadcast_push(request):
+    title = request.data.get('title', 'Notification')
+    body = request.data.get('body', '')
+    data = request.data.get('data', {})
+    department = request.data.get('department')
+    role = request.data.get('role')
+    if not body:
+        return Response({'error': 'Missing body'}, status=400)
+    send_all = str(request.data.get('all', 'false')).lower()
+    if send_all not in ('true', '1', 'false', '0'):
+        return Response({'error': 'all must be true or false'}, status=400)
+    if not (department or role or send_all in ('true', '1')):
+        return Response({'error': 'Pick a department, a role or all=true'}, status=400)
+    if role and str(role).lower() not in dict(ROLE_CHOICES):
+        return Response({'error': f"Unknown role: {role}"}, status=400)
+    if department and not str(department).isdigit():
+        return Response({'error': 'department must be a department id'}, status=400)
+    queued = enqueue_broadcast(title, body, data=data, department_id=int(department) if department else None, role=role)
+    return Response({'status': 'queued', 'queued': queued}, status=202)
+
+# --- Push delivery stats (outbox + receipts) ---
+@api_view(['GET'])
+@permission_classes([IsAdmin])
+def push_delivery_stats(request):
+    return Response(delivery_stats())
+
+# --- Attendance Trend (last N days, zero-filled) ---
+TREND_MAX_DAYS = 366
 
-# --- Attendance Trend (last 30 days) ---
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def attendance_trend(request):
+    try:
+        days = int(request.query_params.get('days', 30))
+    except (TypeError, ValueError):
+        return Response({'error': 'days must be an integer'}, status=400)
+    days = max(1, min(days, TREND_MAX_DAYS))
+
     today = timezone.now().date()
-    days = 30
+    start = today - timedelta(days=days - 1)
+    qs = Attendance.objects.filter(date__gte=start, date__lte=today)
+    department = request.query_params.get('department')
+    if department:
+        if not department.isdigit():
+            return Response({'error': 'department must be a department id'}, status=400)
+        qs = qs.filter(employee__department_id=department)
+    status_val = request.query_params.get('status')
+    if status_val:
+        qs = qs.filter(status__iexact=status_val)
+
+    counts = dict(qs.order_by().values_list('date').annotate(count=Count('id')))
     data = []
     for i in range(days):
-        day = today - timedelta(days=i)
-        count = Attendance.objects.filter(date=day).count()
-        data.append({'date': day.strftime('%Y-%m-%d'), 'count': count})
-    return Response(list(reversed(data)))
+        day = start + timedelta(days=i)
+        data.append({'date': day.strftime('%Y-%m-%d'), 'count': counts.get(day, 0)})
+    return Response(data)
+
+# --- Attendance QR (signed, rotating; see api/qr_tokens.py) ---
+def _qr_response(token):
+    return Response({
+        'qr_code': qr_tokens.qr_png_base64(token),
+        'token': token,
+        'expires_in': qr_tokens.seconds_left(),
+    })
 
-# --- Attendance QR Generation (base64 PNG) ---
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def generate_attendance_qr(request):
-    employee = Employee.objects.filter(user=request.user).first()
-    if not employee:
+    employee_id = employee_id_for(request.user)
+    if not employee_id:
         return Response({'error': 'Employee not found'}, status=404)
-    today = timezone.localdate()
-    qr_data = f"{employee.id}|{today.strftime('%Y-%m-%d')}"
-    img = qrcode.make(qr_data)
-    buf = BytesIO()
-    img.save(buf, format='PNG')
-    return Response({'qr_code': base64.b64encode(buf.getvalue()).decode()})
+    return _qr_response(qr_tokens.make_token(qr_tokens.EMPLOYEE, employee_id))
+
+@api_view(['GET'])
+@permission_classes([IsAdmin])
+def kiosk_attendance_qr(request, site_id):
+    """One rotating QR for a Site's kiosk screen, scanned by the employees assigned to that site."""
+    if not Site.objects.filter(pk=site_id, is_active=True).exists():
+        return Response({'error': 'Site not found'}, status=404)
+    return _qr_response(qr_tokens.make_token(qr_tokens.KIOSK, site_id))
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def qr_attendance_checkin(request):
-    employee = Employee.objects.filter(user=request.user).first()
-    if not employee:
+    employee_id = employee_id_for(request.user)
+    if not employee_id:
         return Response({'error': 'Employee not found'}, status=404)
     qr_data = request.data.get('qr_data')
     if not qr_data:
         return Response({'error': 'No QR data provided'}, status=400)
     try:
-        emp_id_str, date_str = qr_data.split('|')
-        qr_emp_id = int(emp_id_str)
-        qr_date = datetime.strptime(date_str, '%Y-%m-%d').date()
-    except Exception:
-        return Response({'error': 'Invalid QR code data'}, status=400)
-    if qr_emp_id != employee.id or qr_date != timezone.localdate():
-        return Response({'error': 'QR code not valid for this user or today'}, status=403)
-
-    today = timezone.localdate()
-    att, _ = Attendance.objects.get_or_create(employee=employee, date=today)
-    if att.time_in:
+        token = qr_tokens.verify_token(qr_data)  # signature + window only, no DB read
+    except qr_tokens.QRTokenError as e:
+        return Response({'error': str(e)}, status=400)
+    if token.kind == qr_tokens.EMPLOYEE and token.subject != str(employee_id):
+        return Response({'error': 'QR code not valid for this user'}, status=403)
+    try:
+        latitude = parse_coordinate(request.data.get('latitude'), 90)
+        longitude = parse_coordinate(request.data.get('longitude'), 180)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=400)
+    if token.kind == qr_tokens.KIOSK:
+        if not token.subject.isdigit():
+            return Response({'error': 'Invalid QR code.'}, status=400)
+        fence, refusal = validate_kiosk_punch(employee_id, int(token.subject), latitude, longitude)
+    else:
+        fence, refusal = validate_punch(employee_id, latitude, longitude)
+    if refusal:
+        return Response({'error': refusal}, status=400)
+
+    att = check_in(employee_id, latitude=latitude, longitude=longitude, geofence=fence)
+    if att is None:
         return Response({'message': 'Already timed in for today.'})
-    now = timezone.localtime().time()
-    att.time_in = now
-    att.save()
-    return Response({'message': 'Time-in recorded via QR!', 'time_in': str(now)})
+    return Response({'message': 'Time-in recorded via QR!', 'time_in': str(att.time_in)})
 
 # --- Time In/Out API ---
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def time_in(request):
-    employee = Employee.objects.filter(user=request.user).first()
-    if not employee:
+    employee_id = employee_id_for(request.user)
+    if not employee_id:
         return Response({"detail": "No employee record found."}, status=400)
-    now = timezone.localtime()
-    today_date = now.date()
-    if Attendance.objects.filter(employee=employee, date=today_date, time_in__isnull=False).exists():
+    try:
+        latitude = parse_coordinate(request.data.get('latitude'), 90)
+        longitude = parse_coordinate(request.data.get('longitude'), 180)
+    except ValueError as e:
+        return Response({"detail": str(e)}, status=400)
+    fence, refusal = validate_punch(employee_id, latitude, longitude)
+    if refusal:
+        return Response({"detail": refusal}, status=400)
+    # One atomic upsert: no exists() pre-check, no duplicate rows under load
+    att = check_in(employee_id, latitude=latitude, longitude=longitude, geofence=fence)
+    if att is None:
         return Response({"detail": "You have already timed in for today."}, status=400)
-    serializer = AttendanceSerializer(data={
-        'employee': employee.id,
-        'date': today_date,
-        'time_in': now.time(),
-        'latitude': request.data.get('latitude'),
-        'longitude': request.data.get('longitude'),
-    })
-    serializer.is_valid(raise_exception=True)
-    serializer.save(employee=employee, date=today_date)
-    return Response(serializer.data, status=201)
+    return Response(AttendanceSerializer(att).data, status=201)
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def time_out(request):
-    employee = Employee.objects.filter(user=request.user).first()
-    if not employee:
+    employee_id = employee_id_for(request.user)
+    if not employee_id:
         return Response({"detail": "No employee record found."}, status=400)
+    try:
+        latitude = parse_coordinate(request.data.get('latitude'), 90)
+        longitude = parse_coordinate(request.data.get('longitude'), 180)
+    except ValueError as e:
+        return Response({"detail": str(e)}, status=400)
+    fence, refusal = validate_punch(employee_id, latitude, longitude)
+    if refusal:
+        return Response({"detail": refusal}, status=400)
     now = timezone.localtime()
     today_date = now.date()
-    att = Attendance.objects.filter(employee=employee, date=today_date).first()
+    att = Attendance.objects.filter(employee_id=employee_id, date=today_date).first()
     if not att or not att.time_in:
         return Response({"detail": "You need to time in first."}, status=400)
     if att.time_out:
         return Response({"detail": "You have already timed out for today."}, status=400)
     att.time_out = now.time()
-    if request.data.get('latitude') is not None: att.latitude = request.data.get('latitude')
-    if request.data.get('longitude') is not None: att.longitude = request.data.get('longitude')
+    att.undertime_minutes = undertime(att.time_out, shift_for(employee_id, today_date))
+    if latitude is not None and longitude is not None:
+        att.latitude, att.longitude = latitude, longitude
+        att.site_id, att.within_geofence = fence
     att.save()
     return Response(AttendanceSerializer(att).data)
 
+# --- Offline punch sync ---
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def sync_attendance_punches(request):
+    """
+    Body: {"punches": [{"key", "type": "in"|"out", "timestamp", "latitude"?, "longitude"?, "photo"?}]}
+    Returns one result per punch, in order; re-sent keys come back with "duplicate": true.
+    """
+    employee_id = employee_id_for(request.user)
+    if not employee_id:
+        return Response({"detail": "No employee record found."}, status=400)
+    try:
+        results = sync_punches(employee_id, request.data.get('punches'))
+    except PunchSyncError as e:
+        return Response({"detail": str(e)}, status=400)
+    return Response({'results': results})
+
 # --- Attendance Export (CSV/Excel) ---
+def _export_scope(request, params=None):
+    """(employee, filters) for an export: staff see everyone, others only their own rows."""
+    filters = parse_export_filters(request.query_params if params is None else params)
+    if request.user.is_staff:
+        return None, filters
+    employee_id = employee_id_for(request.user)
+    employee = Employee.objects.filter(pk=employee_id).first() if employee_id else None
+    if not employee:
+        raise ExportFilterError('No employee record found.')
+    return employee, filters
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def export_attendance_csv(request):
-    employee = Employee.objects.filter(user=request.user).first()
-    qs = Attendance.objects.filter(employee=employee)
-    resp = HttpResponse(content_type='text/csv')
-    resp['Content-Disposition'] = f'attachment; filename="attendance_{employee.full_name}.csv"'
-    w = csv.writer(resp)
-    w.writerow(['Date', 'Time In', 'Time Out', 'Status', 'Latitude', 'Longitude'])
-    for a in qs:
-        w.writerow([a.date, a.time_in, a.time_out, a.status, a.latitude, a.longitude])
-    return resp
+    try:
+        employee, filters = _export_scope(request)
+    except ExportFilterError as e:
+        return Response({'error': str(e)}, status=400)
+    filename = f"attendance_{employee.full_name}.csv" if employee else "attendance.csv"
+    return csv_streaming_response(ATTENDANCE_HEADER, attendance_export_rows(employee, filters), filename)
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def export_attendance_excel(request):
-    employee = Employee.objects.filter(user=request.user).first()
-    qs = Attendance.objects.filter(employee=employee)
-    wb = openpyxl.Workbook()
-    ws = wb.active; ws.title = "Attendance"
-    ws.append(["Date", "Time In", "Time Out", "Status", "Latitude", "Longitude"])
-    for a in qs:
-        ws.append([str(a.date), str(a.time_in), str(a.time_out or ""), a.status, a.latitude, a.longitude])
-    resp = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    resp['Content-Disposition'] = 'attachment; filename=attendance_report.xlsx'
-    wb.save(resp)
-    return resp
+    try:
+        employee, filters = _export_scope(request)
+    except ExportFilterError as e:
+        return Response({'error': str(e)}, status=400)
+    return xlsx_response(
+        "Attendance", ATTENDANCE_HEADER, attendance_export_rows(employee, filters),
+        ATTENDANCE_XLSX_FORMATS, "attendance_report.xlsx",
+    )
+
+def _parse_day(raw):
+    """parse_date for request input: None for malformed and for impossible dates such as 2025-02-30."""
+    try:
+        return parse_date(str(raw or ''))
+    except ValueError:
+        return None
+
+def _bulk_payslip_params(data):
+    """Validated {'period_from', 'period_to', 'department'} for bulk payslip rendering, or (None, error)."""
+    period_from = _parse_day(data.get('period_from'))
+    period_to = _parse_day(data.get('period_to'))
+    if not (period_from and period_to):
+        return None, 'period_from and period_to (YYYY-MM-DD) are required'
+    if period_from > period_to:
+        return None, 'period_from must be on or before period_to'
+    department = str(data.get('department') or '')
+    if department and not department.isdigit():
+        return None, 'department must be a department id'
+    return {'period_from': str(period_from), 'period_to': str(period_to), 'department': int(department) if department else None}, None
+
+# --- Async exports (queued, run by `manage.py export_worker`) ---
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def submit_export(request):
+    kind = request.data.get('kind')
+    if kind not in dict(ExportJob.KIND_CHOICES):
+        return Response({'error': f"kind must be one of: {', '.join(dict(ExportJob.KIND_CHOICES))}"}, status=400)
+
+    if kind == 'payslip_pdf':
+        if not request.user.is_staff:
+            return Response({'error': 'Forbidden'}, status=403)
+        payslip_id = str(request.data.get('payslip_id') or '')
+        if not payslip_id.isdigit() or not Payslip.objects.filter(pk=payslip_id).exists():
+            return Response({'error': 'Payslip not found'}, status=404)
+        params = {'payslip_id': int(payslip_id)}
+    elif kind in ('payslips_pdf', 'payslips_zip'):
+        if not request.user.is_staff:
+            return Response({'error': 'Forbidden'}, status=403)
+        params, error = _bulk_payslip_params(request.data)
+        if error:
+            return Response({'error': error}, status=400)
+    else:
+        raw = {k: request.data.get(k) for k in EXPORT_FILTER_KEYS if request.data.get(k) not in (None, '')}
+        try:
+            employee, _ = _export_scope(request, raw)
+        except ExportFilterError as e:
+            return Response({'error': str(e)}, status=400)
+        params = {k: str(v) for k, v in raw.items()}
+        if employee:
+            params['employee_id'] = employee.id
+
+    job = enqueue_export(request.user, kind, params)
+    return Response(ExportJobSerializer(job, context={'request': request}).data, status=202)
+
+def _own_export_job(request, job_id):
+    jobs = ExportJob.objects.all() if request.user.is_staff else ExportJob.objects.filter(requested_by=request.user)
+    return jobs.filter(pk=job_id).first()
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def export_job_status(request, job_id):
+    job = _own_export_job(request, job_id)
+    if not job:
+        return Response({'error': 'Export job not found'}, status=404)
+    return Response(ExportJobSerializer(job, context={'request': request}).data)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def export_job_download(request, job_id):
+    job = _own_export_job(request, job_id)
+    if not job:
+        return Response({'error': 'Export job not found'}, status=404)
+    if job.status != ExportJob.DONE or not job.file:
+        return Response({'error': f'Export is {job.status.lower()}', 'status': job.status}, status=409)
+    try:
+        fh = job.file.open('rb')
+    except FileNotFoundError:
+        return Response({'error': 'Export file has expired'}, status=410)
+    return FileResponse(fh, as_attachment=True, filename=artifact_filename(job))
 
 # --- PUSH TOKEN save ---
 @api_view(['POST'])
@@ -286,7 +489,18 @@ def save_push_token(request):
     token = request.data.get('expo_push_token')
     if not token:
         return Response({'error': 'No token'}, status=400)
-    PushToken.objects.update_or_create(user=request.user, defaults={'expo_push_token': token})
+    device_id = (request.data.get('device_id') or '')[:100]
+    platform = (request.data.get('platform') or '').lower()
+    if platform not in dict(PushToken.PLATFORM_CHOICES):
+        platform = ''
+    # One row per device: a token moves to whoever registered it last, and a
+    # device that got a fresh token drops its old one.
+    PushToken.objects.update_or_create(
+        expo_push_token=token,
+        defaults={'user': request.user, 'device_id': device_id, 'platform': platform, 'last_seen': timezone.now()},
+    )
+    if device_id:
+        PushToken.objects.filter(user=request.user, device_id=device_id).exclude(expo_push_token=token).delete()
     return Response({'status': 'saved'})
 
 # --- Simple HR Only Endpoint ---
@@ -317,9 +531,10 @@ class UserViewSet(viewsets.ModelViewSet):
     ordering_fields = ['username', 'email']
     ordering = ['username']
 
-class EmployeeViewSet(viewsets.ModelViewSet):
+class EmployeeViewSet(QueryProfileMixin, viewsets.ModelViewSet):
     queryset = Employee.objects.all()
     serializer_class = EmployeeSerializer
+    query_profile = EMPLOYEE
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['full_name', 'email', 'position']
@@ -329,7 +544,7 @@ class EmployeeViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         u = self.request.user
-        if u.groups.filter(name='Admin').exists() or u.groups.filter(name='HR').exists():
+        if has_role(u, Roles.ADMIN, Roles.HR):
             return Employee.objects.all()
         return Employee.objects.filter(user=u)
 
@@ -343,9 +558,10 @@ class EmployeeViewSet(viewsets.ModelViewSet):
         employee.save()
         return Response({'status': 'Profile photo updated', 'photo_url': employee.profile_photo.url})
 
-class PayrollViewSet(viewsets.ModelViewSet):
+class PayrollViewSet(QueryProfileMixin, viewsets.ModelViewSet):
     queryset = Payroll.objects.all()
     serializer_class = PayrollSerializer
+    query_profile = PAYROLL
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['employee__full_name', 'pay_period']
@@ -354,13 +570,14 @@ class PayrollViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         u = self.request.user
-        if u.groups.filter(name='Admin').exists() or u.groups.filter(name='HR').exists():
+        if has_role(u, Roles.ADMIN, Roles.HR):
             return Payroll.objects.all()
         return Payroll.objects.filter(employee__user=u)
 
-class PayslipViewSet(viewsets.ModelViewSet):
+class PayslipViewSet(QueryProfileMixin, viewsets.ModelViewSet):
     queryset = Payslip.objects.all()
     serializer_class = PayslipSerializer
+    query_profile = PAYSLIP
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['employee__full_name']
@@ -369,22 +586,33 @@ class PayslipViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         u = self.request.user
-        if u.groups.filter(name='Admin').exists() or u.groups.filter(name='HR').exists():
+        if has_role(u, Roles.ADMIN, Roles.HR):
             return Payslip.objects.all()
         return Payslip.objects.filter(employee__user=u)
 
+    def perform_update(self, serializer):
+        payslip = serializer.save()
+        invalidate_payslip_pdf(payslip.pk)
+
+    def perform_destroy(self, instance):
+        payslip_id = instance.pk
+        instance.delete()
+        invalidate_payslip_pdf(payslip_id)
+
 class AttendanceViewSet(viewsets.ModelViewSet):
     queryset = Attendance.objects.all()
     serializer_class = AttendanceSerializer
     permission_classes = [permissions.IsAuthenticated]
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [filters.SearchFilter]
     search_fields = ['employee__full_name', 'date']
-    ordering_fields = ['date', 'employee__full_name']
-    ordering = ['-date']
+
+    # Newest first, paged by (date, id) cursor instead of OFFSET
+    pagination_class = KeysetPagination
+    keyset_ordering = ('-date', '-id')
 
     def get_queryset(self):
-        emp = Employee.objects.filter(user=self.request.user).first()
-        return Attendance.objects.filter(employee=emp) if emp else Attendance.objects.none()
+        employee_id = employee_id_for(self.request.user)
+        return Attendance.objects.filter(employee_id=employee_id) if employee_id else Attendance.objects.none()
 
 class DepartmentViewSet(viewsets.ModelViewSet):
     queryset = Department.objects.all()
@@ -395,6 +623,33 @@ class DepartmentViewSet(viewsets.ModelViewSet):
     ordering_fields = ['name']
     ordering = ['name']
 
+class ShiftViewSet(viewsets.ModelViewSet):
+    queryset = Shift.objects.all()
+    serializer_class = ShiftSerializer
+    permission_classes = [IsAdmin]
+    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
+    search_fields = ['name']
+    ordering_fields = ['name', 'start_time']
+    ordering = ['start_time']
+
+class ShiftAssignmentViewSet(viewsets.ModelViewSet):
+    queryset = ShiftAssignment.objects.select_related('shift')
+    serializer_class = ShiftAssignmentSerializer
+    permission_classes = [IsAdmin]
+    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
+    search_fields = ['employee__full_name', 'shift__name']
+    ordering_fields = ['start_date']
+    ordering = ['-start_date']
+
+class SiteViewSet(viewsets.ModelViewSet):
+    queryset = Site.objects.prefetch_related('employees')
+    serializer_class = SiteSerializer
+    permission_classes = [IsAdmin]
+    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
+    search_fields = ['name']
+    ordering_fields = ['name']
+    ordering = ['name']
+
 class LeaveTypeViewSet(viewsets.ModelViewSet):
     queryset = LeaveType.objects.all()
     serializer_class = LeaveTypeSerializer
@@ -404,9 +659,10 @@ class LeaveTypeViewSet(viewsets.ModelViewSet):
     ordering_fields = ['name']
     ordering = ['name']
 
-class LeaveRequestViewSet(viewsets.ModelViewSet):
+class LeaveRequestViewSet(QueryProfileMixin, viewsets.ModelViewSet):
     queryset = LeaveRequest.objects.all()
     serializer_class = LeaveRequestSerializer
+    query_profile = LEAVE_REQUEST
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['employee__full_name', 'status']
@@ -415,10 +671,9 @@ class LeaveRequestViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         u = self.request.user
-        if u.groups.filter(name='Admin').exists() or u.groups.filter(name='HR').exists():
+        if has_role(u, Roles.ADMIN, Roles.HR):
             return LeaveRequest.objects.all()
-        emp = Employee.objects.filter(user=u).first()
-        return LeaveRequest.objects.filter(employee=emp)
+        return LeaveRequest.objects.filter(employee_id=employee_id_for(u))
 
     @action(detail=True, methods=['post'], permission_classes=[IsHR])
     def approve(self, request, pk=None):
@@ -451,33 +706,85 @@ class AnnouncementViewSet(viewsets.ModelViewSet):
     ordering_fields = ['created_at', 'title']
     ordering = ['-created_at']
 
+    def perform_create(self, serializer):
+        # Saved as Pending; notification_worker fans it out off the request thread
+        serializer.save(created_by=self.request.user)
+
+    @action(detail=True, methods=['get'])
+    def progress(self, request, pk=None):
+        a = self.get_object()
+        return Response({
+            'status': a.fanout_status,
+            'recipients_total': a.recipients_total,
+            'recipients_done': a.recipients_done,
+            'started_at': a.fanout_started_at,
+            'finished_at': a.fanout_finished_at,
+            'error': a.fanout_error,
+        })
+
+    @action(detail=True, methods=['post'], permission_classes=[IsAdmin])
+    def retry(self, request, pk=None):
+        a = self.get_object()
+        if a.fanout_status != Announcement.FAILED:
+            return Response({'error': f"Fan-out is {a.fanout_status}"}, status=409)
+        # Keeps the cursor, so users notified before the failure are skipped
+        a.fanout_status = Announcement.PENDING
+        a.save(update_fields=['fanout_status'])
+        return Response({'status': a.fanout_status}, status=202)
+
 class NotificationViewSet(viewsets.ModelViewSet):
     queryset = AppNotification.objects.all()
     serializer_class = NotificationSerializer
     permission_classes = [permissions.IsAuthenticated]
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [filters.SearchFilter]
     search_fields = ['title', 'body']
-    ordering_fields = ['created_at']
-    ordering = ['-created_at']
+    pagination_class = KeysetPagination
+    keyset_ordering = ('-created_at', '-id')
 
     def get_queryset(self):
         return AppNotification.objects.filter(user=self.request.user)
 
     @action(detail=True, methods=['post'])
     def mark_read(self, request, pk=None):
-        n = self.get_object()
-        n.read = True
-        n.save()
+        if not self.get_queryset().filter(pk=pk).update(read=True):
+            return Response({'error': 'Not found'}, status=404)
+        invalidate_unread_count([request.user.id])
         return Response({'status': 'read'})
 
+    @action(detail=False, methods=['get'])
+    def unread_count(self, request):
+        return Response({'unread': unread_count(request.user.id)})
+
+    @action(detail=False, methods=['post'])
+    def mark_all_read(self, request):
+        """Mark unread notifications read; optionally only `ids` and/or those created up to `before`."""
+        qs = self.get_queryset().filter(read=False)
+        ids = request.data.get('ids')
+        if ids is not None:
+            # a string or dict would iterate as characters / keys: "12" is not [1, 2]
+            if not isinstance(ids, list) or not all(str(i).isdigit() for i in ids):
+                return Response({'error': 'ids must be a list of integers'}, status=400)
+            qs = qs.filter(pk__in=[int(i) for i in ids])
+        before = request.data.get('before')
+        if before:
+            before_dt = parse_datetime(str(before))
+            if before_dt is None:
+                return Response({'error': 'before must be an ISO 8601 timestamp'}, status=400)
+            if timezone.is_naive(before_dt):
+                before_dt = timezone.make_aware(before_dt)
+            qs = qs.filter(created_at__lte=before_dt)
+        updated = qs.update(read=True)
+        invalidate_unread_count([request.user.id])
+        return Response({'updated': updated, 'unread': unread_count(request.user.id)})
+
 class AuditLogViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = AuditLog.objects.all().order_by('-timestamp')
     serializer_class = AuditLogSerializer
     permission_classes = [permissions.IsAdminUser]
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [filters.SearchFilter]
     search_fields = ['action', 'user__username']
-    ordering_fields = ['timestamp']
-    ordering = ['-timestamp']
+    pagination_class = KeysetPagination
+    keyset_ordering = ('-timestamp', '-id')
 
 class UserInvitationViewSet(viewsets.ModelViewSet):
     queryset = UserInvitation.objects.all()
@@ -501,14 +808,7 @@ class PushTokenViewSet(viewsets.ModelViewSet):
 @api_view(['GET'])
 @permission_classes([IsAdminUser])
 def dashboard_stats(request):
-    today = timezone.localdate()
-    return Response({
-        'employee_count': Employee.objects.count(),
-        'present_today': Attendance.objects.filter(date=today, status__iexact='Present').count(),
-        'on_leave_today': LeaveRequest.objects.filter(start_date__lte=today, end_date__gte=today, status__iexact='Approved').count(),
-        'pending_leaves': LeaveRequest.objects.filter(status__iexact='Pending').count(),
-        'payroll_count': Payslip.objects.count(),
-    })
+    return Response(get_dashboard_stats())
 
 # --- Admin: Create Payslip from Attendance ---
 @api_view(['POST'])
@@ -564,62 +864,34 @@ def admin_create_payslip(request):
     )
     return Response({'status': 'Payslip generated', 'payslip_id': ps.id})
 
-# --- Payslip PDF (ReportLab: single) ---
-@api_view(['GET'])
+# --- Admin: Payroll run (all employees in scope, one pass) ---
+@api_view(['POST'])
 @permission_classes([IsAdminUser])
-def export_payslip_pdf_single(request, payslip_id):
-    try:
-        ps = Payslip.objects.select_related('employee').get(pk=payslip_id)
-    except Payslip.DoesNotExist:
-        return Response({'error': 'Payslip not found'}, status=404)
-
-    response = HttpResponse(content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="payslip_{ps.employee.full_name}_{ps.period_from}.pdf"'
-    p = canvas.Canvas(response, pagesize=A4)
-    w, h = A4
-
-    # Left column
-    y = h - 60; left = 50
-    p.setFont("Helvetica-Bold", 14); p.drawString(left, y, "Terralogix Payslip"); y -= 24
-    p.setFont("Helvetica", 10)
-    for line in [
-        f"FROM: {ps.period_from}",
-        f"TO: {ps.period_to}",
-        f"NAME: {ps.name_snapshot or ps.employee.full_name}",
-        f"ID NO: {ps.employee_id_no or ''}",
-        f"POSITION: {ps.position_snapshot or ps.employee.position}",
-        f"BASIC SALARY RATE: {ps.daily_rate}",
-        f"NO. OF DAYS WORKED: {ps.days_worked}",
-        f"REGULAR HOLIDAYS: {ps.regular_holidays}",
-    ]:
-        p.drawString(left, y, line); y -= 14
-
-    # Right column
-    right = 330; y = h - 60
-    for line in [
-        f"GROSS PAY: {ps.gross_pay}",
-        f"OT: {ps.overtime_pay}",
-        f"ALLOWANCE: {ps.allowance}",
-        "",
-        "DEDUCTIONS",
-        f"LATE/UNDERTIME: {ps.late_undertime}",
-        f"SSS: {ps.sss}",
-        f"SSS MPF: {ps.sss_mpf}",
-        f"HDMF: {ps.hdmf}",
-        f"PHIC: {ps.phic}",
-        f"TAX: {ps.tax}",
-        f"SSS LOAN: {ps.sss_loan}",
-        f"HDMF LOAN: {ps.hdmf_loan}",
-        f"CA: {ps.cash_advance}",
-        f"TOTAL DEDUCTIONS: {ps.total_deductions}",
-        "",
-        f"NET PAY: {ps.net_pay}",
-    ]:
-        if line == "": y -= 6
-        else: p.drawString(right, y, line); y -= 14
-
-    p.showPage(); p.save()
-    return response
+def admin_run_payroll(request):
+    period_from = _parse_day(request.data.get('period_from'))
+    period_to = _parse_day(request.data.get('period_to'))
+    if not (period_from and period_to):
+        return Response({'error': 'period_from and period_to (YYYY-MM-DD) are required'}, status=400)
+    if period_from > period_to:
+        return Response({'error': 'period_from must be on or before period_to'}, status=400)
+
+    employee_ids = request.data.get('employee_ids')
+    if employee_ids is not None:
+        if not isinstance(employee_ids, (list, tuple)) or not all(str(i).isdigit() for i in employee_ids):
+            return Response({'error': 'employee_ids must be a list of employee ids'}, status=400)
+        employee_ids = [int(i) for i in employee_ids]
+    department_id = str(request.data.get('department_id') or '')
+    if department_id and not department_id.isdigit():
+        return Response({'error': 'department_id must be a department id'}, status=400)
+
+    summary = run_payroll(
+        period_from, period_to,
+        department_id=int(department_id) if department_id else None,
+        employee_ids=employee_ids,
+        skip_existing=str(request.data.get('skip_existing', 'true')).lower() in ['true', '1', 't'],
+    )
+    log_action(request.user, 'payroll_run', {k: str(v) for k, v in summary.items() if k != 'skipped'})
+    return Response(summary, status=201)
 
 @api_view(['GET'])
 @permission_classes([IsAdminUser])
@@ -663,30 +935,23 @@ def admin_reset_password(request, user_id):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def export_payslips_csv(request):
-    queryset = Payslip.objects.all()  # Example, you can filter as needed
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="payslips.csv"'
-    writer = csv.writer(response)
-    writer.writerow(['Employee Name', 'Period From', 'Period To', 'Gross Pay', 'Net Pay'])  # Add your fields
-    for payslip in queryset:
-        writer.writerow([payslip.employee.full_name, payslip.period_from, payslip.period_to, payslip.gross_pay, payslip.net_pay])
-    return response
+    try:
+        employee, filters = _export_scope(request)
+    except ExportFilterError as e:
+        return Response({'error': str(e)}, status=400)
+    return csv_streaming_response(PAYSLIP_HEADER, payslip_export_rows(employee, filters), "payslips.csv")
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def export_payslips_excel(request):
-    employee = Employee.objects.filter(user=request.user).first()
-    qs = Payslip.objects.filter(employee=employee)
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Payslips"
-    ws.append(["Employee Name", "Period From", "Period To", "Gross Pay", "Net Pay"])  # Add your fields here
-    for payslip in qs:
-        ws.append([payslip.employee.full_name, payslip.period_from, payslip.period_to, payslip.gross_pay, payslip.net_pay])
-    resp = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    resp['Content-Disposition'] = 'attachment; filename=payslips_report.xlsx'
-    wb.save(resp)
-    return resp
+    try:
+        employee, filters = _export_scope(request)
+    except ExportFilterError as e:
+        return Response({'error': str(e)}, status=400)
+    return xlsx_response(
+        "Payslips", PAYSLIP_HEADER, payslip_export_rows(employee, filters),
+        PAYSLIP_XLSX_FORMATS, "payslips_report.xlsx",
+    )
 
 
 class EmployeePhotoUploadView(APIView):
@@ -715,19 +980,38 @@ def export_payslips_pdf_employee(request, employee_id):
     except Employee.DoesNotExist:
         return Response({'error': 'Employee not found'}, status=404)
 
-    # Logic to generate the payslip PDF for the employee
-    response = HttpResponse(content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="payslip_{employee.full_name}.pdf"'
-
-    # Use the canvas or any PDF generation method here
-    p = canvas.Canvas(response, pagesize=A4)
-    p.drawString(100, 750, f"Payslip for {employee.full_name}")
-    # Add more logic to populate the payslip content
-
-    p.showPage()
-    p.save()
+    period = {}
+    for name in ('period_from', 'period_to'):
+        raw = request.query_params.get(name)
+        period[name] = _parse_day(raw) if raw else None
+        if raw and period[name] is None:
+            return Response({'error': f'{name} must be YYYY-MM-DD'}, status=400)
+
+    payslips = payslips_for_period(period['period_from'], period['period_to'], employee_id=employee.id)
+    if not payslips:
+        return Response({'error': 'No payslips for this employee'}, status=404)
+    return spooled_response(
+        lambda fh: write_payslips_pdf(fh, payslips), f"payslips_{employee.full_name}.pdf", 'application/pdf'
+    )
 
-    return response    
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def export_payslips_pdf_bulk(request):
+    params, error = _bulk_payslip_params(request.query_params)
+    if error:
+        return Response({'error': error}, status=400)
+    # `format` is reserved by DRF content negotiation
+    fmt = request.query_params.get('type', 'pdf')
+    if fmt not in ('pdf', 'zip'):
+        return Response({'error': 'type must be pdf or zip'}, status=400)
+
+    payslips = payslips_for_period(params['period_from'], params['period_to'], department_id=params['department'])
+    if not payslips:
+        return Response({'error': 'No payslips in this period'}, status=404)
+    name = f"payslips_{params['period_from']}_to_{params['period_to']}"
+    if fmt == 'zip':
+        return spooled_response(lambda fh: write_payslips_zip(fh, payslips), f"{name}.zip", 'application/zip')
+    return spooled_response(lambda fh: write_payslips_pdf(fh, payslips), f"{name}.pdf", 'application/pdf')
 
 @api_view(['GET'])
 @permission_classes([IsAdminUser])
@@ -754,133 +1038,27 @@ def export_payslip_pdf_by_period(request, employee_id, period):
 @api_view(['GET'])
 @permission_classes([IsAdminUser])
 def export_payslip_pdf_single(request, payslip_id=None, employee_id=None):
+    payslips = Payslip.objects.select_related('employee__department')
     try:
         if payslip_id:
-            ps = Payslip.objects.select_related('employee').get(pk=payslip_id)
+            ps = payslips.get(pk=payslip_id)
         elif employee_id:
             # Get latest payslip for employee
-            ps = Payslip.objects.filter(employee_id=employee_id).latest('period_to')
+            ps = payslips.filter(employee_id=employee_id).latest('period_to')
         else:
             return Response({'error': 'Missing identifier'}, status=400)
     except Payslip.DoesNotExist:
         return Response({'error': 'Payslip not found'}, status=404)
 
-    # Create HTTP response with PDF
-    response = HttpResponse(content_type='application/pdf')
-    filename = f"payslip_{ps.employee.full_name}_{ps.period_from}.pdf"
-    response['Content-Disposition'] = f'attachment; filename="{filename}"'
-    
-    # Create PDF canvas
-    p = canvas.Canvas(response, pagesize=A4)
-    width, height = A4
-    
-    # ===== HEADER SECTION =====
-    p.setFont("Helvetica-Bold", 16)
-    p.drawCentredString(width/2, height-50, "TERRALOGIX HR")
-    p.setFont("Helvetica-Bold", 14)
-    p.drawCentredString(width/2, height-80, "EMPLOYEE PAYSLIP")
-    
-    # ===== COMPANY & EMPLOYEE INFO =====
-    p.setFont("Helvetica", 10)
-    p.drawString(50, height-110, f"Generated on: {timezone.now().strftime('%Y-%m-%d %H:%M')}")
-    p.drawString(width-200, height-110, "Terralogix Inc.")
-    
-    # Employee info box
-    p.rect(50, height-180, width-100, 60)
-    p.setFont("Helvetica-Bold", 12)
-    p.drawString(60, height-140, "EMPLOYEE INFORMATION")
-    p.setFont("Helvetica", 10)
-    
-    employee_info = [
-        ("Name:", ps.name_snapshot or ps.employee.full_name),
-        ("ID No:", ps.employee_id_no or "N/A"),
-        ("Position:", ps.position_snapshot or ps.employee.position or "N/A"),
-        ("Department:", ps.employee.department.name if ps.employee.department else "N/A")
-    ]
-    
-    y_pos = height-160
-    for label, value in employee_info:
-        p.drawString(60, y_pos, label)
-        p.drawString(120, y_pos, value)
-        y_pos -= 20
-
-    # ===== PAY PERIOD SECTION =====
-    p.setFont("Helvetica-Bold", 12)
-    p.drawString(50, height-250, "PAY PERIOD")
-    p.setFont("Helvetica", 10)
-    p.drawString(50, height-270, f"From: {ps.period_from}")
-    p.drawString(200, height-270, f"To: {ps.period_to}")
-    p.drawString(350, height-270, f"Pay Date: {ps.issued_date}")
-
-    # ===== EARNINGS SECTION =====
-    p.setFont("Helvetica-Bold", 12)
-    p.drawString(50, height-310, "EARNINGS")
-    p.setFont("Helvetica", 10)
-    
-    earnings = [
-        ("Basic Salary", f"{ps.daily_rate} × {ps.days_worked} days", ps.daily_rate * ps.days_worked),
-        ("Overtime Pay", "", ps.overtime_pay),
-        ("Allowance", "", ps.allowance),
-        ("Holiday Pay", f"{ps.regular_holidays} days", 0),  # Add actual calculation if available
-    ]
-    
-    y_pos = height-330
-    for item, description, amount in earnings:
-        p.drawString(60, y_pos, item)
-        p.drawString(200, y_pos, description)
-        p.drawString(450, y_pos, f"₱{amount:,.2f}")
-        y_pos -= 20
-    
-    # Gross Pay
-    p.setFont("Helvetica-Bold", 10)
-    p.drawString(400, y_pos-10, "--------------")
-    p.drawString(60, y_pos-30, "GROSS PAY")
-    p.drawString(450, y_pos-30, f"₱{ps.gross_pay:,.2f}")
-    p.drawString(400, y_pos-40, "==============")
-
-    # ===== DEDUCTIONS SECTION =====
-    p.setFont("Helvetica-Bold", 12)
-    p.drawString(50, y_pos-70, "DEDUCTIONS")
-    p.setFont("Helvetica", 10)
-    
-    deductions = [
-        ("Late/Undertime", "", ps.late_undertime),
-        ("SSS Contribution", "", ps.sss),
-        ("SSS Loan", "", ps.sss_loan),
-        ("HDMF Contribution", "", ps.hdmf),
-        ("HDMF Loan", "", ps.hdmf_loan),
-        ("PHIC Contribution", "", ps.phic),
-        ("Withholding Tax", "", ps.tax),
-        ("Cash Advance", "", ps.cash_advance),
-    ]
-    
-    y_pos -= 90
-    for item, description, amount in deductions:
-        p.drawString(60, y_pos, item)
-        p.drawString(450, y_pos, f"₱{amount:,.2f}")
-        y_pos -= 20
-
-    # Total Deductions
-    p.setFont("Helvetica-Bold", 10)
-    p.drawString(400, y_pos-10, "--------------")
-    p.drawString(60, y_pos-30, "TOTAL DEDUCTIONS")
-    p.drawString(450, y_pos-30, f"₱{ps.total_deductions:,.2f}")
-    p.drawString(400, y_pos-40, "==============")
-
-    # ===== NET PAY SECTION =====
-    p.setFont("Helvetica-Bold", 14)
-    p.drawString(60, y_pos-70, "NET PAY")
-    p.drawString(450, y_pos-70, f"₱{ps.net_pay:,.2f}")
-    p.setLineWidth(2)
-    p.line(60, y_pos-75, 500, y_pos-75)
-
-    # ===== FOOTER =====
-    p.setFont("Helvetica", 8)
-    p.drawCentredString(width/2, 50, "This is a computer-generated document and does not require a signature")
-    p.drawCentredString(width/2, 35, "Terralogix HR System | https://terralogixhr.com")
-
-    # Finalize PDF
-    p.showPage()
-    p.save()
+    path, fingerprint = cached_payslip_pdf(ps)
+    etag = f'"{fingerprint}"'
+    last_modified = int(os.path.getmtime(path))  # whole seconds, as If-Modified-Since carries
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if not_modified is not None:
+        return not_modified
+
+    response = FileResponse(open(path, 'rb'), as_attachment=True, filename=payslip_filename(ps), content_type='application/pdf')
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Cache-Control'] = 'private, no-cache'
     return response
-# (Optional) All-payslips-for-employee and by-period endpoints can stay as in your file if you need them.
\ No newline at end of file
@@ -140,7 +140,7 @@ REST_FRAMEWORK = {
         "rest_framework.filters.OrderingFilter",
     ],
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "api.authentication.ClaimsJWTAuthentication",  # identity claims, no per-request user query
     ),
     "DEFAULT_SCHEMA_CLASS": "rest_framework.schemas.openapi.AutoSchema",
 }
@@ -152,11 +152,57 @@ SIMPLE_JWT = {
     "REFRESH_TOKEN_LIFETIME": timedelta(days=14),
     "ROTATE_REFRESH_TOKENS": True,
     "BLACKLIST_AFTER_ROTATION": True,
+    # Tokens carry employee_id / role / groups claims (api/authentication.py)
+    "TOKEN_OBTAIN_SERIALIZER": "api.authentication.ClaimsTokenObtainPairSerializer",
+    "TOKEN_REFRESH_SERIALIZER": "api.authentication.ClaimsTokenRefreshSerializer",
     # If you must keep your prior very-long tokens, replace the above with:
     # "ACCESS_TOKEN_LIFETIME": timedelta(days=100*365),
     # "REFRESH_TOKEN_LIFETIME": timedelta(days=100*3650),
 }
 
+# Cache: shared by the web and worker processes when REDIS_URL is set, so the
+# invalidations in api/signals.py reach every process. Without it each process
+# keeps its own LocMemCache and sees another process's writes only once its
+# cached entry expires (the TTLs below).
+REDIS_URL = os.getenv("REDIS_URL")
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+            "KEY_PREFIX": "terralogix",
+        }
+    }
+# Dashboard counters are cached briefly and dropped on writes (see api/signals.py).
+DASHBOARD_STATS_CACHE_TTL = int(os.getenv("DASHBOARD_STATS_CACHE_TTL", 60))  # seconds
+# Per-user unread notification counts (api/notifications.py) are dropped on every
+# write; without REDIS_URL other processes can show a stale badge for this long.
+UNREAD_COUNT_CACHE_TTL = int(os.getenv("UNREAD_COUNT_CACHE_TTL", 30))  # seconds
+
+# Async exports (ExportJob queue, see api/jobs.py)
+EXPORT_RETENTION_DAYS = int(os.getenv("EXPORT_RETENTION_DAYS", 7))
+EXPORT_JOB_TIMEOUT = int(os.getenv("EXPORT_JOB_TIMEOUT", 30 * 60))  # seconds
+
+# Rendered payslip PDFs, keyed by payslip content (see api/payslip_pdf.py)
+PAYSLIP_PDF_CACHE_DIR = os.getenv("PAYSLIP_PDF_CACHE_DIR", str(BASE_DIR / "cache" / "payslip_pdf"))
+
+# Expo push transport (api/push_notifications.py)
+EXPO_PUSH_URL = os.getenv("EXPO_PUSH_URL", "https://exp.host/--/api/v2/push/send")
+EXPO_PUSH_CONCURRENCY = int(os.getenv("EXPO_PUSH_CONCURRENCY", 6))
+EXPO_RECEIPTS_URL = os.getenv("EXPO_RECEIPTS_URL", "https://exp.host/--/api/v2/push/getReceipts")
+PUSH_RECEIPT_DELAY = int(os.getenv("PUSH_RECEIPT_DELAY", 15 * 60))  # seconds after sending before receipts are fetched
+
+# Default shift for employees without a ShiftAssignment; drives Attendance.status,
+# late_minutes and undertime_minutes (api/schedules.py)
+ATTENDANCE_SHIFT_START = os.getenv("ATTENDANCE_SHIFT_START", "08:00")  # local time, HH:MM
+ATTENDANCE_SHIFT_END = os.getenv("ATTENDANCE_SHIFT_END", "17:00")
+ATTENDANCE_GRACE_MINUTES = int(os.getenv("ATTENDANCE_GRACE_MINUTES", 0))
+ATTENDANCE_QR_ROTATION = int(os.getenv("ATTENDANCE_QR_ROTATION", 120))  # seconds a QR code is shown for
+GEOFENCE_ENFORCE = os.getenv("GEOFENCE_ENFORCE", "False").lower() in ["true", "1", "t"]  # refuse punches off site
+# Offline punch sync (api/punch_sync.py)
+PUNCH_SYNC_MAX_BATCH = int(os.getenv("PUNCH_SYNC_MAX_BATCH", 200))
+PUNCH_SYNC_MAX_AGE_DAYS = int(os.getenv("PUNCH_SYNC_MAX_AGE_DAYS", 7))  # older punches go through HR
+
 # Email
 EMAIL_BACKEND = "django.core.mail.backends.smtp.EmailBackend"
 EMAIL_HOST = os.getenv("EMAIL_HOST")
@@ -171,6 +171,18 @@ export async function postTimeOut(location = {}) {
   });
 }
 
+/**
+ * Offline punches, all in one request:
+ * [{ key, type: "in"|"out", timestamp, latitude, longitude, photo }]
+ * -> { results: [{ key, result, duplicate, attendance, error? }] }
+ */
+export async function syncPunches(punches) {
+  return fetchWithAuth(`${API_BASE_URL}/attendance/sync/`, {
+    method: "POST",
+    body: JSON.stringify({ punches }),
+  });
+}
+
 /** Offline helpers (local only) */
 export async function addPendingAttendance(action) {
   const raw = await AsyncStorage.getItem("pendingAttendance");
@@ -61,8 +61,9 @@ export default function AdminDashboardScreen({ navigation }) {
       ]);
 
       setStats(statsRes);
-      setEmployees(Array.isArray(empRes) ? empRes : []);
-      setLeaves(Array.isArray(leaveRes) ? leaveRes : []);
+      // Admin lists are paginated; the dashboard shows the first page
+      setEmployees(empRes?.results ?? (Array.isArray(empRes) ? empRes : []));
+      setLeaves(leaveRes?.results ?? (Array.isArray(leaveRes) ? leaveRes : []));
       setAttendanceTrend(trendRes || {});
     } catch (e) {
       Alert.alert("Error", e?.message || "Failed to load dashboard data.");
@@ -307,7 +308,7 @@ export default function AdminDashboardScreen({ navigation }) {
           leaves.map((lv) => (
             <View key={lv.id} style={[styles.row, styles.leaveRow]}>
               <View style={{ flex: 1 }}>
-                <Text style={styles.leaveName}>{lv.employee.full_name}</Text>
+                <Text style={styles.leaveName}>{lv.employee_name}</Text>
                 <Text>Status: {lv.status}</Text>
                 <Text>
                   Date: {lv.start_date} to {lv.end_date}
@@ -25,6 +25,7 @@ export default function AttendanceQRScreen() {
   const [error, setError] = useState(null);
 
   const cancelSrcRef = useRef(null);
+  const rotateTimerRef = useRef(null);
 
   const fetchQR = useCallback(
     async (isRefresh = false) => {
@@ -56,6 +57,12 @@ export default function AttendanceQRScreen() {
           throw new Error("QR code not found in response.");
         }
         setQr(code);
+        // Codes rotate server-side; fetch the next one as this one expires
+        clearTimeout(rotateTimerRef.current);
+        const expiresIn = Number(res?.data?.expires_in);
+        if (expiresIn > 0) {
+          rotateTimerRef.current = setTimeout(() => fetchQR(true), expiresIn * 1000);
+        }
       } catch (e) {
         if (!axios.isCancel(e)) {
           setQr(null);
@@ -76,6 +83,7 @@ export default function AttendanceQRScreen() {
   useEffect(() => {
     fetchQR(false);
     return () => {
+      clearTimeout(rotateTimerRef.current);
       cancelSrcRef.current?.cancel?.("Component unmounted");
     };
   }, [fetchQR]);
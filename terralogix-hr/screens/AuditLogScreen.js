@@ -20,7 +20,7 @@ export default function AuditLogScreen() {
   const [items, setItems] = useState([]);
   const [loading, setLoading] = useState(true);       // first load
   const [refreshing, setRefreshing] = useState(false); // pull-to-refresh
-  const [page, setPage] = useState(1);
+  const nextUrlRef = useRef(null); // cursor link from the last page (a ref, so load() stays stable)
   const [hasNext, setHasNext] = useState(true);
   const [error, setError] = useState(null);
 
@@ -71,7 +71,7 @@ export default function AuditLogScreen() {
 
       if (reset) {
         setLoading(true);
-        setPage(1);
+        nextUrlRef.current = null;
         setError(null);
       }
 
@@ -79,11 +79,14 @@ export default function AuditLogScreen() {
         cancelRef.current?.cancel?.("New audit-logs request");
         cancelRef.current = axios.CancelToken.source();
 
-        // If your API supports ?page & ?search, pass them. If not, backend will ignore.
-        const res = await client.get("/audit-logs/", {
-          params: { page: reset ? 1 : page, search: query || undefined },
-          cancelToken: cancelRef.current.token,
-        });
+        // Cursor-paginated: the first page takes the search, later pages follow `next` as-is.
+        const res =
+          reset || !nextUrlRef.current
+            ? await client.get("/audit-logs/", {
+                params: { search: query || undefined },
+                cancelToken: cancelRef.current.token,
+              })
+            : await client.get(nextUrlRef.current, { cancelToken: cancelRef.current.token });
 
         const { results, next } = normalize(res.data);
 
@@ -98,8 +101,8 @@ export default function AuditLogScreen() {
             return Array.from(map.values());
           });
         }
+        nextUrlRef.current = next;
         setHasNext(Boolean(next));
-        if (!reset) setPage((p) => p + 1);
       } catch (e) {
         if (!axios.isCancel(e)) {
           setError(e?.response?.data?.detail || e?.message || "Failed to load audit logs");
@@ -109,7 +112,7 @@ export default function AuditLogScreen() {
         if (reset) setLoading(false);
       }
     },
-    [client, page, query, token]
+    [client, query, token]
   );
 
   // initial + when query changes
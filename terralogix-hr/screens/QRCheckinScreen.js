@@ -2,6 +2,7 @@
 import React, { useCallback, useEffect, useMemo, useRef, useState } from "react";
 import { View, Text, TouchableOpacity, ActivityIndicator, Alert, Linking, StyleSheet } from "react-native";
 import { BarCodeScanner } from "expo-barcode-scanner";
+import * as Location from "expo-location";
 import axios from "axios";
 import { useAuth } from "../AuthContext";
 import { API_BASE_URL } from "../api";
@@ -46,6 +47,24 @@ export default function QRCheckinScreen() {
     });
   }, [token]);
 
+  // Location is optional for a kiosk code at one of the employee's own sites
+  // (the code proves presence there); other scans are checked against the
+  // employee's work sites when the server enforces them
+  const currentCoords = async () => {
+    try {
+      const { status } = await Location.requestForegroundPermissionsAsync();
+      if (status !== "granted") return {};
+      const { coords } = await Location.getCurrentPositionAsync({
+        accuracy: Location.Accuracy.Balanced,
+        maximumAge: 15_000,
+        timeout: 15_000,
+      });
+      return { latitude: coords.latitude, longitude: coords.longitude };
+    } catch (e) {
+      return {};
+    }
+  };
+
   const handleBarCodeScanned = useCallback(
     async ({ data, type }) => {
       // basic throttle to prevent duplicate hits (e.g., iOS rapid re-fire)
@@ -66,7 +85,7 @@ export default function QRCheckinScreen() {
 
         const res = await client.post(
           "/attendance/qr-checkin/",
-          { qr_data: data },
+          { qr_data: data, ...(await currentCoords()) },
           { cancelToken: cancelRef.current.token }
         );
 
@@ -1,6 +1,6 @@
 import AsyncStorage from '@react-native-async-storage/async-storage';
 import NetInfo from '@react-native-community/netinfo';
-import { postTimeIn, postTimeOut, createLeave } from '../api';
+import { syncPunches, createLeave } from '../api';
 
 export async function clearPendingAttendance() {
   await AsyncStorage.removeItem("pendingAttendance");
@@ -10,29 +10,84 @@ export async function clearPendingLeave() {
   await AsyncStorage.removeItem("pendingLeave");
 }
 
+function newPunchKey() {
+  return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 12)}`;
+}
+
 export async function queueAction(type, data) {
   const key = type === 'attendance' ? 'pendingAttendance' : 'pendingLeave';
   let queue = JSON.parse(await AsyncStorage.getItem(key) || '[]');
+  if (type === 'attendance') {
+    // Stamp the punch now: the server records this time, not the sync time,
+    // and the key lets a retried sync be recognised instead of applied twice
+    data = { key: newPunchKey(), timestamp: new Date().toISOString(), ...data };
+  }
   queue.push(data);
   await AsyncStorage.setItem(key, JSON.stringify(queue));
 }
 
+// Server-side PUNCH_SYNC_MAX_BATCH: larger syncs are refused outright
+const PUNCH_SYNC_MAX_BATCH = 200;
+
+function toPunch(item) {
+  const location = item.payload?.location || {};
+  return {
+    key: item.key,
+    type: item.type,
+    timestamp: item.timestamp,
+    latitude: location.latitude,
+    longitude: location.longitude,
+    photo: item.payload?.photo,
+  };
+}
+
+async function readAttendanceQueue() {
+  const raw = await AsyncStorage.getItem('pendingAttendance');
+  return raw ? JSON.parse(raw) : [];
+}
+
+// Punches queued by older app versions carry no key; give them one (and
+// persist it) before the first send so a retry re-sends the same key
+async function stampAttendanceQueue() {
+  const queue = await readAttendanceQueue();
+  if (queue.every(item => item.key && item.timestamp)) return queue;
+  const stamped = queue.map(item => ({
+    ...item,
+    key: item.key || newPunchKey(),
+    timestamp: item.timestamp || new Date().toISOString(),
+  }));
+  await AsyncStorage.setItem('pendingAttendance', JSON.stringify(stamped));
+  return stamped;
+}
+
+// Drop only the punches that were sent: anything queued while the request
+// was in flight stays for the next sync
+async function removeSyncedPunches(keys) {
+  const queue = await readAttendanceQueue();
+  await AsyncStorage.setItem('pendingAttendance', JSON.stringify(queue.filter(item => !keys.has(item.key))));
+}
+
 export async function processQueue() {
   const net = await NetInfo.fetch();
   if (!net.isConnected) return;
 
-  // Attendance
-  let attRaw = await AsyncStorage.getItem('pendingAttendance');
-  let attQueue = attRaw ? JSON.parse(attRaw) : [];
-  let attSuccess = [];
-  for (let i = 0; i < attQueue.length; i++) {
+  // Attendance: synced in batches of at most PUNCH_SYNC_MAX_BATCH. A punch
+  // with a final result (applied, superseded or rejected) is removed; one
+  // answered "retry" (a time-out that reached the server before its time-in)
+  // stays queued and is sent again, same key, next time. A failed sync keeps
+  // the rest for the next attempt.
+  const attQueue = await stampAttendanceQueue();
+  for (let i = 0; i < attQueue.length; i += PUNCH_SYNC_MAX_BATCH) {
+    const batch = attQueue.slice(i, i + PUNCH_SYNC_MAX_BATCH);
+    let res;
     try {
-      if (attQueue[i].type === 'in') await postTimeIn(attQueue[i].payload);
-      if (attQueue[i].type === 'out') await postTimeOut(attQueue[i].payload);
-      attSuccess.push(i);
-    } catch {}
+      res = await syncPunches(batch.map(toPunch));
+    } catch {
+      break;
+    }
+    const retry = new Set((res?.results || []).filter(r => r.result === 'retry').map(r => r.key));
+    await removeSyncedPunches(new Set(batch.map(item => item.key).filter(key => !retry.has(key))));
   }
-  if (attSuccess.length) await clearPendingAttendance();
 
   // Leaves
   let leaveRaw = await AsyncStorage.getItem('pendingLeave');